@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for Gemini, Murf, AssemblyAI and Tavily used by the load tests.
+
+One FastAPI app serves every upstream on a single port:
+  - Gemini   POST /v1beta/models/{model}:generateContent | :streamGenerateContent (SSE)
+  - Murf     POST /v1/speech/generate, GET /v1/speech/voices, WS /v1/speech/stream-input,
+             GET /v1/audio/{name} (the generated audio files)
+  - AssemblyAI POST /v2/upload, POST /v2/transcript, GET /v2/transcript/{id}, WS /v3/ws
+  - Tavily   POST /search
+
+Latency and streaming behaviour come from an UpstreamProfile. Point main.py at
+it with the environment from upstream_env(), or run it standalone:
+
+    python bench/fake_upstreams.py --port 9100 --gemini-ttft 0.3
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import uvicorn
+
+
+class UpstreamProfile:
+    """Latency (seconds) and streaming shape of every fake upstream."""
+
+    def __init__(
+        self,
+        jitter: float = 0.2,
+        # Gemini
+        gemini_ttft: float = 0.35,
+        gemini_chunk_interval: float = 0.05,
+        gemini_words_per_chunk: int = 4,
+        gemini_reply: str = (
+            "Sure thing. Here is a short answer from the stand-in model. "
+            "It has a few sentences so the speech pipeline has work to do. "
+            "That should be enough for a benchmark."
+        ),
+        tool_call_rate: float = 0.0,
+        # Murf
+        murf_rest_latency: float = 0.6,
+        murf_ws_first_chunk: float = 0.25,
+        murf_ws_chunk_interval: float = 0.04,
+        murf_ws_chunks_per_segment: int = 4,
+        murf_chunk_bytes: int = 8192,
+        # AssemblyAI
+        aai_upload_latency: float = 0.1,
+        aai_transcribe_latency: float = 0.5,
+        aai_transcript: str = "what is the weather like today",
+        stt_utterance_seconds: float = 1.0,
+        stt_endpoint_delay: float = 0.3,
+        # Tavily
+        tavily_latency: float = 0.4,
+    ):
+        self.jitter = jitter
+        self.gemini_ttft = gemini_ttft
+        self.gemini_chunk_interval = gemini_chunk_interval
+        self.gemini_words_per_chunk = max(1, gemini_words_per_chunk)
+        self.gemini_reply = gemini_reply
+        self.tool_call_rate = tool_call_rate
+        self.murf_rest_latency = murf_rest_latency
+        self.murf_ws_first_chunk = murf_ws_first_chunk
+        self.murf_ws_chunk_interval = murf_ws_chunk_interval
+        self.murf_ws_chunks_per_segment = max(1, murf_ws_chunks_per_segment)
+        self.murf_chunk_bytes = murf_chunk_bytes
+        self.aai_upload_latency = aai_upload_latency
+        self.aai_transcribe_latency = aai_transcribe_latency
+        self.aai_transcript = aai_transcript
+        self.stt_utterance_seconds = stt_utterance_seconds
+        self.stt_endpoint_delay = stt_endpoint_delay
+        self.tavily_latency = tavily_latency
+
+    def delay(self, seconds: float) -> float:
+        """Apply +/- jitter to a configured latency."""
+        if seconds <= 0:
+            return 0.0
+        return max(0.0, seconds * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    async def sleep(self, seconds: float) -> None:
+        await asyncio.sleep(self.delay(seconds))
+
+    @classmethod
+    def add_arguments(cls, parser: argparse.ArgumentParser) -> None:
+        """Expose every numeric setting as a --kebab-case command line option."""
+        defaults = cls()
+        for name, value in vars(defaults).items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "UpstreamProfile":
+        names = vars(cls()).keys()
+        return cls(**{n: getattr(args, n) for n in names if hasattr(args, n)})
+
+
+def upstream_env(host: str, port: int) -> Dict[str, str]:
+    """Environment that points main.py at fakes served on host:port."""
+    http = f"http://{host}:{port}"
+    ws = f"ws://{host}:{port}"
+    return {
+        "GEMINI_BASE_URL": f"{http}/v1beta",
+        "MURF_BASE_URL": f"{http}/v1",
+        "MURF_WS_URL": f"{ws}/v1/speech/stream-input",
+        "TAVILY_BASE_URL": http,
+        "ASSEMBLYAI_BASE_URL": http,
+        "ASSEMBLYAI_STREAMING_HOST": ws,
+        "GEMINI_API_KEY": "bench-gemini",
+        "MURF_API_KEY": "bench-murf",
+        "ASSEMBLYAI_API_KEY": "bench-assemblyai",
+        "TAVILY_API_KEY": "bench-tavily",
+        "SIMULATE_CREDIT_EXHAUSTION": "false",
+    }
+
+
+def _gemini_candidate(parts: List[Dict[str, object]], finish: Optional[str] = None) -> Dict[str, object]:
+    candidate: Dict[str, object] = {"content": {"role": "model", "parts": parts}, "index": 0}
+    if finish:
+        candidate["finishReason"] = finish
+    return {"candidates": [candidate]}
+
+
+def _wants_tool_call(payload: Dict[str, object], profile: UpstreamProfile) -> bool:
+    """Ask for a web search when tools are offered and the last turn is not a tool response."""
+    if not payload.get("tools") or random.random() >= profile.tool_call_rate:
+        return False
+    contents = payload.get("contents") or []
+    last_parts = contents[-1].get("parts", []) if contents else []
+    return not any("functionResponse" in p for p in last_parts if isinstance(p, dict))
+
+
+def create_app(profile: Optional[UpstreamProfile] = None) -> FastAPI:
+    profile = profile or UpstreamProfile()
+    app = FastAPI(title="Fake upstreams")
+    app.state.profile = profile
+    app.state.requests = {}
+    transcripts: Dict[str, float] = {}
+
+    def count(name: str) -> None:
+        app.state.requests[name] = app.state.requests.get(name, 0) + 1
+
+    # ---- Gemini ----
+    @app.post("/v1beta/models/{target}")
+    async def gemini(target: str, request: Request):
+        payload = await request.json()
+        model, _, method = target.partition(":")
+        count(f"gemini.{method}")
+        if _wants_tool_call(payload, profile):
+            call = {"functionCall": {"name": "search_web", "args": {"query": "latest news"}}}
+            if method == "streamGenerateContent":
+                async def tool_stream():
+                    await profile.sleep(profile.gemini_ttft)
+                    yield f"data: {json.dumps(_gemini_candidate([call], 'STOP'))}\n\n"
+                return StreamingResponse(tool_stream(), media_type="text/event-stream")
+            await profile.sleep(profile.gemini_ttft)
+            return _gemini_candidate([call], "STOP")
+
+        words = profile.gemini_reply.split(" ")
+        step = profile.gemini_words_per_chunk
+        chunks = [" ".join(words[i:i + step]) + (" " if i + step < len(words) else "") for i in range(0, len(words), step)]
+        if method == "streamGenerateContent":
+            # Like the real API: SSE with ?alt=sse, otherwise one pretty-printed JSON array
+            sse = request.query_params.get("alt") == "sse"
+
+            async def text_stream():
+                await profile.sleep(profile.gemini_ttft)
+                for i, chunk in enumerate(chunks):
+                    if i:
+                        await profile.sleep(profile.gemini_chunk_interval)
+                    finish = "STOP" if i == len(chunks) - 1 else None
+                    item = _gemini_candidate([{"text": chunk}], finish)
+                    if sse:
+                        yield f"data: {json.dumps(item)}\n\n"
+                    else:
+                        yield ("[" if i == 0 else ",\r\n") + json.dumps(item, indent=2)
+                if not sse:
+                    yield "]"
+            return StreamingResponse(text_stream(), media_type="text/event-stream" if sse else "application/json")
+        # Blocking call: the whole reply after the full generation time
+        await profile.sleep(profile.gemini_ttft + profile.gemini_chunk_interval * (len(chunks) - 1))
+        return _gemini_candidate([{"text": profile.gemini_reply}], "STOP")
+
+    # ---- Murf ----
+    @app.post("/v1/speech/generate")
+    async def murf_generate(request: Request):
+        await request.body()
+        count("murf.generate")
+        await profile.sleep(profile.murf_rest_latency)
+        return {"audioFile": f"{request.base_url}v1/audio/{uuid.uuid4().hex}.wav", "encodedAudio": None}
+
+    @app.get("/v1/audio/{name}")
+    async def murf_audio_file(name: str):
+        count("murf.audio_file")
+        return Response(content=b"\0" * profile.murf_chunk_bytes, media_type="audio/wav")
+
+    @app.get("/v1/speech/voices")
+    async def murf_voices():
+        count("murf.voices")
+        return [
+            {"voiceId": v, "displayName": v, "locale": "en-US"}
+            for v in ("en-US-terrell", "en-US-davis", "en-US-jenny", "en-US-guy", "en-US-andrew", "en-US-aria")
+        ]
+
+    @app.websocket("/v1/speech/stream-input")
+    async def murf_stream(websocket: WebSocket):
+        await websocket.accept()
+        count("murf.stream_connections")
+        audio = base64.b64encode(b"\0" * profile.murf_chunk_bytes).decode("ascii")
+        # Audio for each context is produced in order, one synthesis task chained after the previous one
+        tails: Dict[str, asyncio.Task] = {}
+
+        async def synthesize(previous: Optional[asyncio.Task], context_id: str, final: bool) -> None:
+            if previous is not None:
+                await asyncio.gather(previous, return_exceptions=True)
+            if final:
+                await websocket.send_text(json.dumps({"isFinalAudio": True, "context_id": context_id}))
+                return
+            await profile.sleep(profile.murf_ws_first_chunk)
+            for i in range(profile.murf_ws_chunks_per_segment):
+                if i:
+                    await profile.sleep(profile.murf_ws_chunk_interval)
+                await websocket.send_text(json.dumps({"audio": audio, "context_id": context_id}))
+
+        try:
+            while True:
+                message = json.loads(await websocket.receive_text())
+                context_id = message.get("context_id", "default")
+                if "voice_config" in message:
+                    continue
+                if message.get("text"):
+                    count("murf.stream_segments")
+                    tails[context_id] = asyncio.create_task(synthesize(tails.get(context_id), context_id, False))
+                if message.get("end"):
+                    tails[context_id] = asyncio.create_task(synthesize(tails.get(context_id), context_id, True))
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            for task in tails.values():
+                task.cancel()
+
+    # ---- AssemblyAI (pre-recorded) ----
+    @app.post("/v2/upload")
+    async def aai_upload(request: Request):
+        body = await request.body()
+        count("assemblyai.upload")
+        await profile.sleep(profile.aai_upload_latency)
+        return {"upload_url": f"http://fake-assemblyai.invalid/uploads/{uuid.uuid4().hex}?bytes={len(body)}"}
+
+    @app.post("/v2/transcript")
+    async def aai_submit(request: Request):
+        body = await request.json()
+        count("assemblyai.transcript")
+        transcript_id = uuid.uuid4().hex
+        transcripts[transcript_id] = time.monotonic() + profile.delay(profile.aai_transcribe_latency)
+        return {"id": transcript_id, "status": "queued", "audio_url": body.get("audio_url", "")}
+
+    @app.get("/v2/transcript/{transcript_id}")
+    async def aai_poll(transcript_id: str):
+        ready_at = transcripts.get(transcript_id)
+        if ready_at is None:
+            return JSONResponse({"error": "Transcript not found"}, status_code=404)
+        # Hold the poll until the transcript is ready so the SDK never sleeps between polls
+        await asyncio.sleep(max(0.0, ready_at - time.monotonic()))
+        transcripts.pop(transcript_id, None)
+        return {"id": transcript_id, "status": "completed", "audio_url": "", "text": profile.aai_transcript}
+
+    # ---- AssemblyAI Universal Streaming ----
+    @app.websocket("/v3/ws")
+    async def aai_stream(websocket: WebSocket):
+        await websocket.accept()
+        count("assemblyai.stream_connections")
+        sample_rate = int(websocket.query_params.get("sample_rate", "16000"))
+        utterance_bytes = max(2, int(profile.stt_utterance_seconds * sample_rate * 2))
+        words = profile.aai_transcript.split()
+        state = {"received": 0, "turn_order": 0, "partial_sent": False}
+        pending: List[asyncio.Task] = []
+
+        def turn_message(transcript: str, end: bool, turn_order: int) -> str:
+            return json.dumps({
+                "type": "Turn",
+                "turn_order": turn_order,
+                "turn_is_formatted": end,
+                "end_of_turn": end,
+                "transcript": transcript,
+                "end_of_turn_confidence": 0.9 if end else 0.1,
+                "words": [],
+            })
+
+        async def end_turn(turn_order: int) -> None:
+            await profile.sleep(profile.stt_endpoint_delay)
+            await websocket.send_text(turn_message(profile.aai_transcript, True, turn_order))
+
+        await websocket.send_text(json.dumps({"type": "Begin", "id": uuid.uuid4().hex, "expires_at": int(time.time()) + 3600}))
+        try:
+            while True:
+                message = await websocket.receive()
+                if message.get("type") == "websocket.disconnect":
+                    break
+                data = message.get("bytes")
+                if data is not None:
+                    state["received"] += len(data)
+                    if not state["partial_sent"] and state["received"] >= utterance_bytes // 2:
+                        state["partial_sent"] = True
+                        partial = " ".join(words[: max(1, len(words) // 2)])
+                        await websocket.send_text(turn_message(partial, False, state["turn_order"]))
+                    if state["received"] >= utterance_bytes:
+                        pending.append(asyncio.create_task(end_turn(state["turn_order"])))
+                        state.update(received=0, partial_sent=False, turn_order=state["turn_order"] + 1)
+                    continue
+                text = message.get("text") or ""
+                if '"Terminate"' in text:
+                    await asyncio.gather(*pending, return_exceptions=True)
+                    await websocket.send_text(json.dumps({"type": "Termination", "audio_duration_seconds": 0, "session_duration_seconds": 0}))
+                    await websocket.close()
+                    break
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            for task in pending:
+                task.cancel()
+
+    # ---- Tavily ----
+    @app.post("/search")
+    async def tavily_search(request: Request):
+        body = await request.json()
+        count("tavily.search")
+        await profile.sleep(profile.tavily_latency)
+        query = body.get("query", "")
+        results = [
+            {"title": f"Result {i + 1} for {query}", "url": f"https://example.com/{i + 1}", "content": "Stand-in search result.", "score": 0.9 - i * 0.1}
+            for i in range(int(body.get("max_results", 3)))
+        ]
+        return {"query": query, "answer": f"Stand-in answer for {query}.", "results": results}
+
+    @app.get("/_stats")
+    async def stats():
+        return app.state.requests
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve fake Gemini/Murf/AssemblyAI/Tavily upstreams")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    UpstreamProfile.add_arguments(parser)
+    args = parser.parse_args()
+    print("Point the app at these fakes with:")
+    for key, value in upstream_env(args.host, args.port).items():
+        print(f"  export {key}={value}")
+    uvicorn.run(create_app(UpstreamProfile.from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
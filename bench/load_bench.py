@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test for the voice agent against local fake upstreams.
+
+Starts bench/fake_upstreams.py and the app (uvicorn main:app) as subprocesses,
+with the app pointed at the fakes through the *_BASE_URL settings. It then
+drives each scenario with N concurrent synthetic clients and reports
+throughput plus p50/p95/p99 latency per stage:
+
+  llm_query      POST /llm/query (JSON text → Gemini)
+  agent_chat     POST /agent/chat/{session_id} (audio → STT → Gemini + tools → Murf)
+  ws_transcribe  /ws/transcribe (framed protocol: PCM → streaming STT → Gemini → Murf audio)
+
+Server-side stage latencies are estimated from the /api/metrics histograms.
+
+    python bench/load_bench.py --clients 20 --duration 30
+    python bench/load_bench.py --scenarios ws_transcribe --clients 50 --gemini-ttft 0.8
+    python bench/load_bench.py --app-url http://127.0.0.1:8000   # app already running
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import wave
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import websockets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.fake_upstreams import UpstreamProfile, upstream_env  # noqa: E402
+from services.audio_frames import AUDIO_FRAME_TYPES, decode_frame, encode_frame  # noqa: E402
+from services.ws_protocol import (  # noqa: E402
+    WS_SUBPROTOCOL,
+    FRAME_TURN_END,
+    FRAME_ASSISTANT_TEXT,
+    FRAME_ERROR,
+    FRAME_AUDIO_COMPLETE,
+    FRAME_AUDIO_ERROR,
+    FRAME_CLIENT_AUDIO,
+    FRAME_CLIENT_DONE,
+)
+
+SCENARIOS = ("llm_query", "agent_chat", "ws_transcribe")
+SAMPLE_RATE = 16000
+CHUNK_MS = 20
+AUDIO_FRAMES = set(AUDIO_FRAME_TYPES.values())
+
+
+# ---------------- results ----------------
+class Results:
+    """Latency samples and error counts per (scenario, stage)."""
+
+    def __init__(self):
+        self.samples: Dict[Tuple[str, str], List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.error_examples: Dict[str, str] = {}
+        self.elapsed: Dict[str, float] = {}
+
+    def add(self, scenario: str, stage: str, seconds: float) -> None:
+        self.samples.setdefault((scenario, stage), []).append(seconds)
+
+    def error(self, scenario: str, detail: str) -> None:
+        self.errors[scenario] = self.errors.get(scenario, 0) + 1
+        self.error_examples.setdefault(scenario, detail[:200])
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Linear-interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+
+# ---------------- synthetic clients ----------------
+def make_wav(seconds: float) -> bytes:
+    """Silent 16 kHz mono PCM16 WAV clip."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(b"\0" * int(seconds * SAMPLE_RATE) * 2)
+    return buffer.getvalue()
+
+
+async def run_llm_query(client: httpx.AsyncClient, base_url: str, client_id: int, results: Results) -> None:
+    started = time.perf_counter()
+    response = await client.post(
+        f"{base_url}/llm/query", json={"text": f"Benchmark question {client_id}: how is the weather?"}
+    )
+    elapsed = time.perf_counter() - started
+    if response.status_code != 200 or not response.json().get("success"):
+        results.error("llm_query", f"{response.status_code} {response.text}")
+        return
+    results.add("llm_query", "total", elapsed)
+
+
+async def run_agent_chat(client: httpx.AsyncClient, base_url: str, client_id: int, results: Results, wav: bytes) -> None:
+    started = time.perf_counter()
+    response = await client.post(
+        f"{base_url}/agent/chat/bench-chat-{client_id}",
+        files={"file": ("speech.wav", wav, "audio/wav")},
+    )
+    elapsed = time.perf_counter() - started
+    if response.status_code != 200 or not response.json().get("success"):
+        results.error("agent_chat", f"{response.status_code} {response.text}")
+        return
+    results.add("agent_chat", "total", elapsed)
+
+
+async def run_ws_transcribe(
+    ws_url: str,
+    client_id: int,
+    results: Results,
+    utterance_seconds: float,
+    turns: int,
+    realtime: bool,
+    timeout: float,
+) -> None:
+    """One framed /ws/transcribe conversation; stages are timed from the end of each utterance."""
+    chunk = b"\0" * (SAMPLE_RATE * 2 * CHUNK_MS // 1000)
+    chunks_per_utterance = max(1, int(utterance_seconds * 1000 / CHUNK_MS))
+    started = time.perf_counter()
+    async with websockets.connect(
+        f"{ws_url}/ws/transcribe?session=bench-ws-{client_id}", subprotocols=[WS_SUBPROTOCOL], max_size=None
+    ) as ws:
+        results.add("ws_transcribe", "connect", time.perf_counter() - started)
+        seq = 0
+        for turn in range(1, turns + 1):
+            for _ in range(chunks_per_utterance):
+                await ws.send(encode_frame(FRAME_CLIENT_AUDIO, chunk, seq=seq))
+                seq += 1
+                if realtime:
+                    await asyncio.sleep(CHUNK_MS / 1000)
+            speech_end = time.perf_counter()
+            seen = set()
+            deadline = speech_end + timeout
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError(f"turn {turn} timed out")
+                message = await asyncio.wait_for(ws.recv(), remaining)
+                if isinstance(message, str):
+                    continue
+                frame = decode_frame(message)
+                if frame is None:
+                    continue
+                frame_type, turn_id, _seq, payload = frame
+                if frame_type in (FRAME_ERROR, FRAME_AUDIO_ERROR):
+                    raise RuntimeError(payload.decode("utf-8", "replace"))
+                if turn_id != turn:
+                    continue
+                now = time.perf_counter() - speech_end
+                if frame_type == FRAME_TURN_END:
+                    stage = "transcript"
+                elif frame_type == FRAME_ASSISTANT_TEXT:
+                    stage = "assistant_text"
+                elif frame_type in AUDIO_FRAMES:
+                    stage = "first_audio"
+                elif frame_type == FRAME_AUDIO_COMPLETE:
+                    stage = "audio_complete"
+                else:
+                    continue
+                if stage not in seen:
+                    seen.add(stage)
+                    results.add("ws_transcribe", stage, now)
+                if stage == "audio_complete":
+                    break
+        await ws.send(encode_frame(FRAME_CLIENT_DONE, b"", seq=seq))
+
+
+async def run_scenario(scenario: str, args: argparse.Namespace, base_url: str, results: Results) -> None:
+    """Closed loop: each client repeats the scenario until the duration or request budget is used up."""
+    ws_url = "ws" + base_url[len("http"):]
+    wav = make_wav(args.stt_utterance_seconds)
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    deadline = time.perf_counter() + args.duration
+
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        async def worker(client_id: int) -> None:
+            done = 0
+            while time.perf_counter() < deadline and (not args.requests or done < args.requests):
+                done += 1
+                try:
+                    if scenario == "llm_query":
+                        await run_llm_query(client, base_url, client_id, results)
+                    elif scenario == "agent_chat":
+                        await run_agent_chat(client, base_url, client_id, results, wav)
+                    else:
+                        await run_ws_transcribe(
+                            ws_url, client_id, results, args.stt_utterance_seconds,
+                            args.turns, not args.no_realtime, args.timeout,
+                        )
+                except Exception as exc:
+                    results.error(scenario, f"{type(exc).__name__}: {exc}")
+
+        started = time.perf_counter()
+        if args.ramp_up > 0:
+            async def delayed(client_id: int) -> None:
+                await asyncio.sleep(args.ramp_up * client_id / args.clients)
+                await worker(client_id)
+            await asyncio.gather(*(delayed(i) for i in range(args.clients)))
+        else:
+            await asyncio.gather(*(worker(i) for i in range(args.clients)))
+        results.elapsed[scenario] = time.perf_counter() - started
+
+
+# ---------------- server-side histograms ----------------
+_SAMPLE_RE = re.compile(r'^(\w+)_bucket\{(.*)\} (\S+)$')
+
+
+def parse_histograms(text: str) -> Dict[Tuple[str, str], Dict[float, float]]:
+    """{(metric, labels without le): {upper bound: cumulative count}} from Prometheus text."""
+    series: Dict[Tuple[str, str], Dict[float, float]] = {}
+    for line in text.splitlines():
+        match = _SAMPLE_RE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        pairs = [p for p in labels.split(",") if not p.startswith("le=")]
+        le = next(p for p in labels.split(",") if p.startswith("le="))[4:-1]
+        bound = float("inf") if le == "+Inf" else float(le)
+        series.setdefault((name, ",".join(pairs)), {})[bound] = float(value)
+    return series
+
+
+def histogram_quantile(buckets: Dict[float, float], q: float) -> Optional[float]:
+    """Estimate a quantile from cumulative buckets (same interpolation as Prometheus)."""
+    bounds = sorted(buckets)
+    total = buckets[bounds[-1]] if bounds else 0
+    if total <= 0:
+        return None
+    rank = q * total
+    previous_bound, previous_count = 0.0, 0.0
+    for bound in bounds:
+        count = buckets[bound]
+        if count >= rank:
+            if bound == float("inf"):
+                return previous_bound
+            if count == previous_count:
+                return bound
+            return previous_bound + (bound - previous_bound) * (rank - previous_count) / (count - previous_count)
+        previous_bound, previous_count = bound, count
+    return previous_bound
+
+
+def histogram_delta(before: Dict, after: Dict) -> Dict[Tuple[str, str], Dict[float, float]]:
+    delta = {}
+    for key, buckets in after.items():
+        base = before.get(key, {})
+        diff = {b: c - base.get(b, 0.0) for b, c in buckets.items()}
+        if max(diff.values(), default=0) > 0:
+            delta[key] = diff
+    return delta
+
+
+async def scrape_metrics(base_url: str) -> Dict[Tuple[str, str], Dict[float, float]]:
+    try:
+        async with httpx.AsyncClient(timeout=10) as client:
+            response = await client.get(f"{base_url}/api/metrics")
+            response.raise_for_status()
+            return parse_histograms(response.text)
+    except httpx.HTTPError as exc:
+        print(f"[BENCH] Could not scrape /api/metrics: {exc}")
+        return {}
+
+
+# ---------------- reporting ----------------
+def report(results: Results, server_stages: Dict[str, Dict], upstream_calls: Dict[str, int]) -> Dict[str, object]:
+    summary: Dict[str, object] = {"scenarios": {}, "server_stages": {}, "upstream_calls": upstream_calls}
+    header = f"{'scenario':<15}{'stage':<16}{'count':>7}{'rps':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print("\n" + header)
+    print("-" * len(header))
+    for scenario in SCENARIOS:
+        stages = [(stage, values) for (name, stage), values in results.samples.items() if name == scenario]
+        if not stages and scenario not in results.errors:
+            continue
+        elapsed = results.elapsed.get(scenario, 0.0) or 1e-9
+        scenario_summary: Dict[str, object] = {
+            "errors": results.errors.get(scenario, 0),
+            "elapsed_seconds": round(elapsed, 3),
+            "stages": {},
+        }
+        for stage, values in stages:
+            values = sorted(values)
+            row = {
+                "count": len(values),
+                "rps": len(values) / elapsed,
+                "p50": percentile(values, 0.50),
+                "p95": percentile(values, 0.95),
+                "p99": percentile(values, 0.99),
+                "max": values[-1],
+            }
+            scenario_summary["stages"][stage] = row
+            print(
+                f"{scenario:<15}{stage:<16}{row['count']:>7}{row['rps']:>8.1f}"
+                f"{row['p50'] * 1000:>10.1f}{row['p95'] * 1000:>10.1f}{row['p99'] * 1000:>10.1f}{row['max'] * 1000:>10.1f}"
+            )
+        if results.errors.get(scenario):
+            print(f"{scenario:<15}{'errors':<16}{results.errors[scenario]:>7}   e.g. {results.error_examples[scenario]}")
+        summary["scenarios"][scenario] = scenario_summary
+
+    if server_stages:
+        print(f"\n{'server stage (from /api/metrics)':<70}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for scenario, delta in server_stages.items():
+            print(f"[{scenario}]")
+            for (name, labels), buckets in sorted(delta.items()):
+                quantiles = [histogram_quantile(buckets, q) for q in (0.5, 0.95, 0.99)]
+                count = buckets.get(float("inf"), 0)
+                label = f"{name}{{{labels}}}" if labels else name
+                print(f"  {label:<68}{int(count):>7}" + "".join(f"{(v or 0) * 1000:>10.1f}" for v in quantiles))
+                summary["server_stages"].setdefault(scenario, {})[label] = {
+                    "count": count, "p50": quantiles[0], "p95": quantiles[1], "p99": quantiles[2],
+                }
+    if upstream_calls:
+        print("\nupstream calls: " + ", ".join(f"{k}={v}" for k, v in sorted(upstream_calls.items())))
+    return summary
+
+
+# ---------------- process management ----------------
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_up(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=2) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def profile_arguments(args: argparse.Namespace) -> List[str]:
+    """Forward the UpstreamProfile options to the fake upstream process."""
+    forwarded: List[str] = []
+    for name in vars(UpstreamProfile()):
+        if hasattr(args, name):
+            forwarded += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+    return forwarded
+
+
+async def main_async(args: argparse.Namespace) -> int:
+    processes: List[subprocess.Popen] = []
+    log = open(args.log, "ab") if args.log else subprocess.DEVNULL
+    upstream_url: Optional[str] = None
+    try:
+        if args.app_url:
+            base_url = args.app_url.rstrip("/")
+        else:
+            upstream_port, app_port = free_port(), free_port()
+            upstream_url = f"http://127.0.0.1:{upstream_port}"
+            processes.append(subprocess.Popen(
+                [sys.executable, os.path.join(ROOT, "bench", "fake_upstreams.py"), "--port", str(upstream_port)]
+                + profile_arguments(args),
+                cwd=ROOT, stdout=log, stderr=log,
+            ))
+            env = dict(os.environ, **upstream_env("127.0.0.1", upstream_port))
+            processes.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(app_port),
+                 "--workers", str(args.app_workers), "--log-level", "warning"],
+                cwd=ROOT, env=env, stdout=log, stderr=log,
+            ))
+            base_url = f"http://127.0.0.1:{app_port}"
+            await wait_until_up(f"{upstream_url}/_stats")
+        await wait_until_up(f"{base_url}/api/health")
+        print(f"[BENCH] app={base_url} upstreams={upstream_url or 'external'} clients={args.clients} duration={args.duration}s")
+
+        results = Results()
+        server_stages: Dict[str, Dict] = {}
+        for scenario in args.scenarios:
+            print(f"[BENCH] Running {scenario} ...")
+            before = await scrape_metrics(base_url)
+            await run_scenario(scenario, args, base_url, results)
+            server_stages[scenario] = histogram_delta(before, await scrape_metrics(base_url))
+
+        upstream_calls: Dict[str, int] = {}
+        if upstream_url:
+            async with httpx.AsyncClient(timeout=5) as client:
+                upstream_calls = (await client.get(f"{upstream_url}/_stats")).json()
+
+        summary = report(results, server_stages, upstream_calls)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2, default=str)
+            print(f"[BENCH] Wrote {args.json}")
+        return 1 if results.errors else 0
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if log is not subprocess.DEVNULL:
+            log.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the voice agent against fake upstreams")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        type=lambda s: [x.strip() for x in s.split(",") if x.strip()],
+                        help=f"Comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--clients", type=int, default=10, help="Concurrent synthetic clients per scenario")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds to run each scenario")
+    parser.add_argument("--requests", type=int, default=0, help="Stop each client after this many requests (0 = no limit)")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Seconds over which clients are started")
+    parser.add_argument("--turns", type=int, default=2, help="Voice turns per /ws/transcribe connection")
+    parser.add_argument("--no-realtime", action="store_true", help="Send microphone audio as fast as possible")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request / per-turn timeout in seconds")
+    parser.add_argument("--app-url", default="", help="Use an already running app instead of starting one")
+    parser.add_argument("--app-workers", type=int, default=1, help="uvicorn workers for the spawned app")
+    parser.add_argument("--log", default="", help="Append app and fake upstream output to this file")
+    parser.add_argument("--json", default="", help="Write the summary as JSON to this file")
+    UpstreamProfile.add_arguments(parser)
+    args = parser.parse_args()
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,97 @@
 from fastapi import FastAPI, Request, HTTPException, UploadFile, File, Form
 from fastapi import WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import uvicorn
 import os
-import requests
+import httpx
 import json
 from dotenv import load_dotenv
 from pydantic import BaseModel
 import assemblyai as aai
-import shutil
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, AsyncIterator, Callable, Tuple
 import asyncio
-import threading
+import time
 from datetime import datetime
+from contextlib import asynccontextmanager
 import websockets
 import base64
 from services.function_calling import FunctionCallingService, function_calling_service
 from services.web_search import web_search_service
+from services.weather import weather_service
+from services.sentence_chunker import SentenceChunker
+from services.gemini_stream import iter_gemini_stream, candidate_text, finish_reason
+from services.http_client import get_http_client, open_http_client, close_http_client, describe_http_error
+from services.session_store import session_store
+from services.llm_cache import llm_response_cache
+from services.upstreams import gemini_url, murf_url, ASSEMBLYAI_BASE_URL, ASSEMBLYAI_STREAMING_HOST
+from services.murf_stream import murf_pool, murf_context_id, MURF_STREAM_FORMAT, MURF_STREAM_SAMPLE_RATE
+from services.tts_cache import tts_audio_cache, clip_key, is_cacheable_sentence
+from services.voice_catalog import voice_catalog
+from services.recordings import recording_store, RecordingQuotaExceeded
+from services.stt import transcription_executor, TranscriptionQueueFull
+from services.admission import admission, AdmissionRejected
+from services.egress import egress, set_egress_context, key_fingerprint, PRIORITY_INTERACTIVE, PRIORITY_TEXT, PRIORITY_BACKGROUND
+from services.tracing import tracer, NOOP_SPAN
+from services.loop_monitor import loop_monitor
+from services.profiler import profiler, PROFILER_MAX_SECONDS
+from services.audio_frames import audio_frame_type, encode_frame
+from services.ws_protocol import WS_SUBPROTOCOL, MessageEncoder, decode_client_message
+from services.metrics import (
+    registry as metrics_registry,
+    LLM_GENERATION_SECONDS,
+    LLM_TIME_TO_FIRST_TOKEN_SECONDS,
+    TTS_TIME_TO_FIRST_CHUNK_SECONDS,
+    TTS_REQUEST_SECONDS,
+    VOICE_TURN_SECONDS,
+    WS_FRAMES,
+    WS_BYTES,
+    WS_ACTIVE_CONNECTIONS,
+    ACTIVE_SESSIONS,
+)
 
 load_dotenv()
 
-app = FastAPI(title="30 Days of AI - Day 26: Agent Special Skills - Web Search + Weather", version="1.0.0")
+# AssemblyAI SDK calls go to the configured base URL (real API or a local stand-in)
+aai.settings.base_url = ASSEMBLYAI_BASE_URL
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared resources on startup and release them on shutdown."""
+    await open_http_client()
+    # Day 42: Watch the event loop for blocking calls from the start
+    loop_monitor.start()
+    session_sweeper = asyncio.create_task(session_store.run_sweeper())
+    murf_reaper = asyncio.create_task(murf_pool.run_reaper())
+    voice_refresher = asyncio.create_task(voice_catalog.run_refresher())
+    recordings_sweeper = asyncio.create_task(recording_store.run_sweeper())
+    tts_prewarm = asyncio.create_task(prewarm_tts_phrases()) if TTS_PREWARM else None
+    try:
+        yield
+    finally:
+        session_sweeper.cancel()
+        murf_reaper.cancel()
+        voice_refresher.cancel()
+        recordings_sweeper.cancel()
+        if tts_prewarm is not None:
+            tts_prewarm.cancel()
+        for task in list(BACKGROUND_TASKS):
+            task.cancel()
+        await murf_pool.close()
+        transcription_executor.shutdown()
+        loop_monitor.stop()
+        await asyncio.to_thread(tracer.exporter.close)
+        await asyncio.to_thread(session_store.close)
+        await close_http_client()
+
+
+app = FastAPI(
+    title="30 Days of AI - Day 26: Agent Special Skills - Web Search + Weather",
+    version="1.0.0",
+    lifespan=lifespan,
+)
 
 # Mount static files (CSS, JS, images)
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -30,21 +99,23 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # Templates for HTML rendering
 templates = Jinja2Templates(directory="templates")
 
-# Uploads directory
-UPLOADS_DIR = "server/uploads"
-os.makedirs(UPLOADS_DIR, exist_ok=True)
+# Sessions gauge is read from the store at scrape time
+ACTIVE_SESSIONS.set_function(lambda: len(session_store))
+
+# Day 37: Uploads and /ws/audio recordings are written by services.recordings
+# (off-loop batched writes, disk quota, retention sweep) under RECORDINGS_DIR
 
 # Simulation flag: force backend to report credit exhaustion
 SIMULATE_CREDIT_EXHAUSTION = str(os.getenv("SIMULATE_CREDIT_EXHAUSTION", "true")).lower() in {"1", "true", "yes", "on"}
 
 # ------------------ In-memory chat history store (Day 10) ------------------
-# Structure: { session_id: [ {"role": "user"|"model", "text": "..."}, ... ] }
-CHAT_SESSIONS: Dict[str, List[Dict[str, str]]] = {}
+# Day 28: Chat history, persona and API keys live in a bounded session store
+# (idle-TTL + max-session eviction, capped per-session deque, prompt windowing).
+# History entries: {"role": "user"|"model", "text": "..."}
 
 # ------------------ Day 27: Per-session API key config ------------------
-# Store user-provided API keys by session id. Keys allowed:
+# User-provided API keys are stored per session id. Keys allowed:
 #   GEMINI_API_KEY, ASSEMBLYAI_API_KEY, MURF_API_KEY, TAVILY_API_KEY, GEMINI_MODEL, MURF_VOICE_ID
-USER_API_KEYS: Dict[str, Dict[str, str]] = {}
 
 ALLOWED_CONFIG_KEYS = {
     "GEMINI_API_KEY",
@@ -57,8 +128,8 @@ ALLOWED_CONFIG_KEYS = {
 
 def get_user_config(session_id: Optional[str], key: str, default: Optional[str] = None) -> Optional[str]:
     try:
-        if session_id and session_id in USER_API_KEYS:
-            value = USER_API_KEYS.get(session_id, {}).get(key)
+        if session_id:
+            value = session_store.get_api_keys(session_id).get(key)
             if value:
                 return value
     except Exception:
@@ -169,8 +240,7 @@ PERSONAS = {
     }
 }
 
-# Store persona selection per session
-SESSION_PERSONAS: Dict[str, str] = {}
+# Persona selection per session is kept in session_store (default: robot)
 
 
 # ------------------ Day 11: Global error handling + fallback ------------------
@@ -178,181 +248,370 @@ from fastapi.responses import JSONResponse
 
 FALLBACK_TEXT = "I'm having trouble connecting right now."
 
-# Static context ID for Murf websockets to avoid context limit errors
-MURF_CONTEXT_ID = "day20-voice-agent-context"
+# Day 28: Pipeline Gemini tokens into Murf sentence by sentence instead of waiting for the full reply
+STREAM_TTS_PIPELINE = str(os.getenv("STREAM_TTS_PIPELINE", "true")).lower() in {"1", "true", "yes", "on"}
+
+# Day 24: Persona voice IDs are validated against Murf's supported voices
+# Day 36: The voice list lives in an indexed catalog that is refreshed in the
+# background (services.voice_catalog), so resolution is a memoized lookup.
+def resolve_murf_voice_id(desired_voice_id: str) -> str:
+    """Validate desired voice id against the Murf voice catalog, falling back to env/default voice."""
+    return voice_catalog.resolve(desired_voice_id)
+
+
+# ------------------ Day 35: Cached TTS audio for repeated sentences ------------------
+# Audio is cached by (voice id, normalized sentence, format) in services.tts_cache.
+# Murf WebSocket chunks and REST audio files are different formats, so they are
+# cached under separate variants. Fixed phrases are synthesized at startup.
+TTS_PREWARM = str(os.getenv("TTS_PREWARM", "true")).lower() in {"1", "true", "yes", "on"}
+TTS_STREAM_VARIANT = f"stream-{MURF_STREAM_FORMAT}-{MURF_STREAM_SAMPLE_RATE}"
+TTS_REST_VARIANT = "rest"
+DEFAULT_MURF_VOICE_ID = os.getenv("MURF_VOICE_ID", "en-US-terrell")
+
+# Fire-and-forget tasks (cache fills); referenced here so they are not garbage collected
+BACKGROUND_TASKS: set = set()
+
+
+def spawn_background(coro) -> None:
+    task = asyncio.create_task(coro)
+    BACKGROUND_TASKS.add(task)
+    task.add_done_callback(BACKGROUND_TASKS.discard)
+
 
-# Day 24: Cache Murf supported voices to validate persona voice IDs
-MURF_VOICES_CACHE: List[Dict[str, object]] = []
+def persona_greeting(persona: Dict[str, object]) -> str:
+    """Acknowledgement line a persona opens the conversation with."""
+    return f"I understand! I am {persona['name']} and I'm ready to help you in character. How may I assist you today?"
 
-def fetch_murf_voices() -> List[Dict[str, object]]:
-    """Fetch and cache Murf supported voices. Returns empty list on error."""
-    global MURF_VOICES_CACHE
-    if MURF_VOICES_CACHE:
-        return MURF_VOICES_CACHE
+
+def tts_audio_url(key: str) -> str:
+    return f"/api/tts/audio/{key}"
+
+
+def cached_rest_audio_url(voice_id: str, text: str) -> Optional[str]:
+    """Local URL of a cached REST clip if it is already in memory (never blocks)."""
+    key = clip_key(voice_id, text, TTS_REST_VARIANT)
+    return tts_audio_url(key) if tts_audio_cache.get_cached(key) is not None else None
+
+
+def fallback_payload() -> Dict[str, object]:
+    """fallback_text for error responses, plus pre-synthesized audio when it is cached."""
+    payload: Dict[str, object] = {"fallback_text": FALLBACK_TEXT}
+    audio_url = cached_rest_audio_url(DEFAULT_MURF_VOICE_ID, FALLBACK_TEXT)
+    if audio_url:
+        payload["fallback_audio_url"] = audio_url
+    return payload
+
+
+async def store_murf_audio_file(voice_id: str, text: str, audio_url: str, phrase: bool = False) -> Optional[str]:
+    """Download a Murf REST audio file into the TTS cache. Returns the cache key.
+
+    Only short single sentences are kept unless phrase is True (fixed phrases).
+    """
     try:
-        murf_api_key = os.getenv("MURF_API_KEY")
-        if not murf_api_key:
-            return []
-        r = requests.get(
-            "https://api.murf.ai/v1/speech/voices",
+        response = await get_http_client().get(audio_url, timeout=60)
+        response.raise_for_status()
+    except httpx.HTTPError as exc:
+        print(f"[TTS_CACHE] Failed to download Murf audio: {describe_http_error('Murf', exc)}", flush=True)
+        return None
+    media_type = response.headers.get("content-type", "audio/wav").split(";")[0]
+    return await tts_audio_cache.put(voice_id, text, TTS_REST_VARIANT, [response.content], media_type, phrase=phrase)
+
+
+async def murf_generate_audio_url(
+    text: str, voice_id: str, murf_api_key: str, timeout: float = 60, cache_audio: bool = True
+) -> Tuple[Optional[str], Dict[str, object]]:
+    """Synthesize text with the Murf REST API, answering from the TTS cache when possible.
+
+    Returns (audio_url, Murf response). Cache hits return a local /api/tts/audio URL
+    without calling Murf; on a miss the Murf file is cached in the background
+    when text is a short single sentence (and cache_audio is True).
+    Raises httpx.HTTPError if the Murf call fails.
+    """
+    key = clip_key(voice_id, text, TTS_REST_VARIANT)
+    if await tts_audio_cache.get_by_key(key) is not None:
+        print(f"[TTS_CACHE] Hit for voice '{voice_id}': {text[:60]}", flush=True)
+        return tts_audio_url(key), {"cached": True}
+    with TTS_REQUEST_SECONDS.time(transport="rest"):
+        response = await egress.request(
+            "murf",
+            murf_api_key,
+            "POST",
+            murf_url("/speech/generate"),
+            json={"text": text, "voiceId": voice_id},
             headers={"api-key": murf_api_key, "Content-Type": "application/json"},
-            timeout=20,
+            timeout=timeout,
         )
-        r.raise_for_status()
-        data = r.json()
-        # Murf returns list of voices; support both top-level list and {"voices": [...]} formats
-        voices = data.get("voices") if isinstance(data, dict) else data
-        if isinstance(voices, list):
-            MURF_VOICES_CACHE = voices  # type: ignore[assignment]
-        elif isinstance(data, list):
-            MURF_VOICES_CACHE = data  # type: ignore[assignment]
-        else:
-            MURF_VOICES_CACHE = []
-    except Exception as e:
-        print(f"[MURF] Failed to fetch voices: {e}", flush=True)
-        MURF_VOICES_CACHE = []
-    return MURF_VOICES_CACHE
+    response.raise_for_status()
+    data = response.json()
+    audio_url = data.get("audioFile")
+    if audio_url and cache_audio and tts_audio_cache.enabled and is_cacheable_sentence(text):
+        spawn_background(store_murf_audio_file(voice_id, text, audio_url))
+    return audio_url, data
 
-def resolve_murf_voice_id(desired_voice_id: str) -> str:
-    """Validate desired voice id against Murf list, fallback to env/default valid voice.
-
-    Order of resolution:
-      1) If desired_voice_id exists in supported set → use it
-      2) If MURF_VOICE_ID env exists and valid → use it
-      3) Use 'en-US-terrell' if valid
-      4) Use first available en-US voice if any
-      5) Fall back to desired_voice_id (let API error surface if nothing else works)
-    """
-    voices = fetch_murf_voices()
-    def extract_id(v: Dict[str, object]) -> str:
-        # Voice objects may have 'voiceId' or 'id'
-        if isinstance(v.get("voiceId"), str):  # type: ignore[call-arg]
-            return str(v.get("voiceId"))
-        if isinstance(v.get("id"), str):  # type: ignore[call-arg]
-            return str(v.get("id"))
-        return ""
-
-    supported_ids = {extract_id(v) for v in voices if isinstance(v, dict)}
-
-    # If we couldn't fetch voices, still prefer env default or a known-safe default
-    if not supported_ids:
-        env_default = os.getenv("MURF_VOICE_ID", "")
-        if env_default:
-            print(f"[MURF] Voices unavailable. Using env default '{env_default}'.", flush=True)
-            return env_default
-        print("[MURF] Voices unavailable. Falling back to 'en-US-terrell'.", flush=True)
-        return "en-US-terrell"
-
-    if desired_voice_id in supported_ids:
-        return desired_voice_id
-
-    env_default = os.getenv("MURF_VOICE_ID", "")
-    if env_default and env_default in supported_ids:
-        print(f"[MURF] Desired voice '{desired_voice_id}' invalid. Using env default '{env_default}'.", flush=True)
-        return env_default
-
-    if "en-US-terrell" in supported_ids:
-        print(f"[MURF] Desired voice '{desired_voice_id}' invalid. Falling back to 'en-US-terrell'.", flush=True)
-        return "en-US-terrell"
-
-    # First available en-US voice if present
-    for v in voices:
-        if not isinstance(v, dict):
-            continue
-        lang = str(v.get("language", v.get("locale", ""))).lower()
-        vid = extract_id(v)
-        if vid and ("en-us" in lang or lang.startswith("en")):
-            print(f"[MURF] Fallback to first EN voice '{vid}'.", flush=True)
-            return vid
-
-    print(f"[MURF] No valid fallback found; using requested id '{desired_voice_id}' (may error).", flush=True)
-    return desired_voice_id
-
-async def stream_text_to_murf_websocket(text: str, websocket_client=None, client_loop=None, session_id: str = None) -> None:
+
+async def prewarm_tts_phrases() -> None:
+    """Synthesize persona greetings and the error fallback once, ahead of the first request."""
+    murf_api_key = os.getenv("MURF_API_KEY")
+    if not murf_api_key or not tts_audio_cache.enabled:
+        return
+    set_egress_context(None, PRIORITY_BACKGROUND)
+    try:
+        # Resolve persona voices against the real catalog, not the startup defaults
+        await voice_catalog.wait_ready(timeout=30)
+        voices: Dict[str, str] = {}
+        for persona in PERSONAS.values():
+            voices[persona["voice_id"]] = resolve_murf_voice_id(persona["voice_id"])
+        rest_phrases = [(DEFAULT_MURF_VOICE_ID, FALLBACK_TEXT)]
+        rest_phrases += [(voices[p["voice_id"]], persona_greeting(p)) for p in PERSONAS.values()]
+        stored = 0
+        for voice_id, text in rest_phrases:
+            if await tts_audio_cache.get(voice_id, text, TTS_REST_VARIANT) is not None:
+                continue
+            try:
+                audio_url, _ = await murf_generate_audio_url(text, voice_id, murf_api_key, cache_audio=False)
+            except httpx.HTTPError as exc:
+                print(f"[TTS_CACHE] Prewarm failed for '{text[:40]}': {describe_http_error('Murf', exc)}", flush=True)
+                continue
+            if audio_url and await store_murf_audio_file(voice_id, text, audio_url, phrase=True):
+                stored += 1
+        # WebSocket replies speak the fallback in the persona's voice
+        for voice_id in sorted(set(voices.values())):
+            if await tts_audio_cache.get(voice_id, FALLBACK_TEXT, TTS_STREAM_VARIANT) is None:
+                await stream_text_to_murf_websocket(FALLBACK_TEXT, voice_id=voice_id)
+                if tts_audio_cache.get_cached(clip_key(voice_id, FALLBACK_TEXT, TTS_STREAM_VARIANT)) is not None:
+                    stored += 1
+        print(f"[TTS_CACHE] Prewarm complete ({stored} phrases synthesized)", flush=True)
+    except asyncio.CancelledError:
+        raise
+    except Exception as exc:
+        print(f"[TTS_CACHE] Prewarm failed: {exc}", flush=True)
+
+async def stream_segments_to_murf_websocket(
+    segments: AsyncIterator[str],
+    send: Optional[Callable[[object], None]] = None,
+    session_id: str = None,
+    binary_audio: bool = False,
+    turn_id: int = 0,
+    voice_id: Optional[str] = None,
+) -> None:
     """
-    Stream text to Murf WebSocket API and receive base64 encoded audio.
+    Stream text segments to one Murf WebSocket context and relay base64 audio back.
     Day 21: Stream base64 audio chunks to client WebSocket in real-time.
     Day 24: Use persona-specific voice based on session.
+    Day 28: Each segment is sent with end=False as soon as it is ready, so Murf
+    starts synthesizing the first sentence while the LLM is still generating.
+    The iterator is always drained, even when TTS is unavailable or fails.
+    Day 30: Client messages go through `send`, which queues them for the
+    connection's writer task on the same event loop.
+    Day 31: With binary_audio, each chunk is decoded once and sent as a binary
+    frame (see services.audio_frames) and no per-reply audio buffer is kept.
+    Day 35: Leading segments found in the TTS audio cache are played straight
+    from the cache; Murf is only connected for the rest. Replies spoken as a
+    single segment are added to the cache. voice_id overrides the persona voice.
     """
+    async def drain_segments() -> None:
+        try:
+            async for _ in segments:
+                pass
+        except Exception as drain_exc:
+            print(f"[MURF] Failed while draining text segments: {drain_exc}", flush=True)
+
     murf_api_key = os.getenv("MURF_API_KEY")
     if not murf_api_key:
         print("[MURF] API key not configured, skipping TTS", flush=True)
+        await drain_segments()
         return
 
     # Day 24: Get persona-specific voice and resolve to a valid Murf voice id
-    persona_id = SESSION_PERSONAS.get(session_id, "robot") if session_id else "robot"
-    desired_voice_id = PERSONAS.get(persona_id, PERSONAS["robot"])["voice_id"]
-    murf_voice_id = resolve_murf_voice_id(desired_voice_id)
-    print(
-        f"[MURF] Using persona '{persona_id}' with voice '{murf_voice_id}' (requested '{desired_voice_id}')",
-        flush=True,
-    )
-    
-    # Murf WebSocket URL with static context_id
-    ws_url = f"wss://api.murf.ai/v1/speech/stream-input?api-key={murf_api_key}&sample_rate=44100&channel_type=MONO&format=WAV&context_id={MURF_CONTEXT_ID}"
+    if voice_id:
+        murf_voice_id = voice_id
+    else:
+        persona_id = session_store.get_persona(session_id)
+        desired_voice_id = PERSONAS.get(persona_id, PERSONAS["robot"])["voice_id"]
+        murf_voice_id = resolve_murf_voice_id(desired_voice_id)
+        print(
+            f"[MURF] Using persona '{persona_id}' with voice '{murf_voice_id}' (requested '{desired_voice_id}')",
+            flush=True,
+        )
     
-    def send_to_client_safe(message: str) -> None:
-        """Safely send message to client WebSocket if available"""
-        if websocket_client:
+    # Day 29: Each session speaks in its own Murf context over a pooled connection
+    context_id = murf_context_id(session_id)
+    frame_type = audio_frame_type(MURF_STREAM_FORMAT)
+    # Day 41: One span per spoken reply; segments and audio chunks are events on it
+    tts_span = tracer.start_span("tts.murf_stream", voice_id=murf_voice_id, turn_id=turn_id)
+
+    def send_to_client_safe(message) -> None:
+        """Queue a message (text or binary frame) for the client if one is attached"""
+        if send:
             try:
-                # Use asyncio to send message in a thread-safe way to the server loop
-                target_loop = client_loop or asyncio.get_event_loop()
-                asyncio.run_coroutine_threadsafe(websocket_client.send_text(message), target_loop)
+                send(message)
             except Exception as e:
                 print(f"[CLIENT] Failed to send to client: {e}", flush=True)
-    
+
+    # Day 35: Play leading segments that are already cached, without touching Murf
+    cached_chunks = 0
+    source = segments.__aiter__()
+    while tts_audio_cache.enabled:
+        try:
+            segment = await source.__anext__()
+        except StopAsyncIteration:
+            if cached_chunks:
+                print(f"[TTS_CACHE] Reply served from cache ({cached_chunks} chunks)", flush=True)
+                send_to_client_safe(f"audio_complete:{cached_chunks}")
+            else:
+                print("[MURF] No text to synthesize", flush=True)
+            tts_span.finish()
+            return
+        except Exception as source_exc:
+            print(f"[MURF] Text stream failed: {source_exc}", flush=True)
+            if cached_chunks:
+                send_to_client_safe(f"audio_complete:{cached_chunks}")
+            tts_span.finish(source_exc)
+            return
+        clip = await tts_audio_cache.get(murf_voice_id, segment, TTS_STREAM_VARIANT)
+        if clip is None:
+            async def remaining_segments(first: str = segment) -> AsyncIterator[str]:
+                yield first
+                async for rest in source:
+                    yield rest
+            segments = remaining_segments()
+            break
+        if cached_chunks == 0:
+            send_to_client_safe("audio_start:Playing cached audio...")
+        for chunk in clip.chunks:
+            if binary_audio:
+                send_to_client_safe(encode_frame(frame_type, chunk, seq=cached_chunks, turn_id=turn_id))
+            else:
+                send_to_client_safe(f"audio_chunk:{base64.b64encode(chunk).decode('ascii')}")
+            cached_chunks += 1
+        tts_span.event("tts_cache.segment", chars=len(segment), chunks=len(clip.chunks))
+        print(f"[TTS_CACHE] Cached segment played ({len(clip.chunks)} chunks): {segment[:100]}", flush=True)
+
+    conn = None
+    reusable = False
+    sender: Optional[asyncio.Task] = None
+    receiver: Optional[asyncio.Task] = None
+    segments_sent = {"count": 0}
+    sent_texts: List[str] = []
+    first_sent_at: Dict[str, Optional[float]] = {"value": None}
     try:
-        print(f"[MURF] Connecting to WebSocket for TTS conversion...", flush=True)
-        send_to_client_safe("audio_start:Starting TTS conversion...")
-        
-        async with websockets.connect(ws_url) as murf_ws:
-            print(f"[MURF] Connected successfully", flush=True)
-            send_to_client_safe("audio_status:Connected to Murf TTS")
-            
-            # Send voice configuration
-            voice_config_msg = {
-                "voice_config": {
-                    "voiceId": murf_voice_id,
-                    "style": "Conversational",
-                    "rate": 0,
-                    "pitch": 0,
-                    "variation": 1
-                }
-            }
-            await murf_ws.send(json.dumps(voice_config_msg))
-            print(f"[MURF] Voice config sent: {murf_voice_id}", flush=True)
-            
-            # Send text for TTS conversion
-            text_msg = {
-                "text": text,
-                "end": True
-            }
-            await murf_ws.send(json.dumps(text_msg))
-            print(f"[MURF] Text sent for conversion: {text[:100]}...", flush=True)
-            send_to_client_safe("audio_status:Text sent for TTS conversion")
-            
-            # Receive base64 encoded audio chunks and stream to client
+        print("[MURF] Acquiring pooled WebSocket for TTS conversion...", flush=True)
+        if cached_chunks == 0:
+            send_to_client_safe("audio_start:Starting TTS conversion...")
+
+        # Send voice configuration
+        voice_config_msg = {
+            "voice_config": {
+                "voiceId": murf_voice_id,
+                "style": voice_catalog.style_for(murf_voice_id, "Conversational"),
+                "rate": 0,
+                "pitch": 0,
+                "variation": 1
+            },
+            "context_id": context_id,
+        }
+        # An idle pooled socket may have been dropped by Murf; retry once on a fresh one
+        for attempt in range(2):
+            conn = await murf_pool.acquire(murf_api_key)
+            try:
+                await conn.ws.send(json.dumps(voice_config_msg))
+                break
+            except websockets.exceptions.ConnectionClosed:
+                await murf_pool.discard(conn)
+                conn = None
+                if attempt:
+                    raise
+        murf_ws = conn.ws
+        tts_span.event("murf.connected", reused=conn.uses > 1)
+        print(f"[MURF] Connected ({'reused' if conn.uses > 1 else 'new'} connection, context '{context_id}')", flush=True)
+        send_to_client_safe("audio_status:Connected to Murf TTS")
+        print(f"[MURF] Voice config sent: {murf_voice_id}", flush=True)
+
+        async def pump_segments() -> bool:
+            # Send each segment as soon as it is ready, then close the context.
+            # Keep consuming the text stream if Murf goes away so the reply still completes.
+            # Returns False if the Murf socket closed underneath us.
+            murf_open = True
+            try:
+                async for segment in segments:
+                    if not murf_open:
+                        continue
+                    try:
+                        await murf_ws.send(json.dumps({"text": segment, "end": False, "context_id": context_id}))
+                        if first_sent_at["value"] is None:
+                            first_sent_at["value"] = time.perf_counter()
+                        segments_sent["count"] += 1
+                        tts_span.event("murf.segment", n=segments_sent["count"], chars=len(segment))
+                        if segments_sent["count"] == 1:
+                            sent_texts.append(segment)
+                        print(f"[MURF] Segment #{segments_sent['count']} sent: {segment[:100]}", flush=True)
+                    except websockets.exceptions.ConnectionClosed:
+                        murf_open = False
+            except Exception as source_exc:
+                print(f"[MURF] Text stream failed: {source_exc}", flush=True)
+            if not murf_open:
+                return False
+            if segments_sent["count"] == 0:
+                print("[MURF] No text to synthesize", flush=True)
+                return True
+            try:
+                await murf_ws.send(json.dumps({"text": "", "end": True, "context_id": context_id}))
+                send_to_client_safe("audio_status:Text sent for TTS conversion")
+                return True
+            except websockets.exceptions.ConnectionClosed:
+                return False
+
+        async def receive_audio() -> bool:
+            # Receive base64 encoded audio chunks and stream to client.
+            # Returns True once Murf has finished this context cleanly.
             audio_chunks = []
-            chunk_count = 0
+            chunk_count = cached_chunks
+            audio_bytes = 0
+            finished = False
+            # Day 35: Decoded audio kept for the cache (dropped once past the clip size limit)
+            recorded: Optional[List[bytes]] = [] if tts_audio_cache.enabled else None
+            recorded_bytes = 0
             while True:
                 try:
                     response = await murf_ws.recv()
                     data = json.loads(response)
-                    
+                    if data.get("context_id") not in (None, context_id):
+                        continue
+
                     if "audio" in data:
                         audio_chunk = data["audio"]
-                        audio_chunks.append(audio_chunk)
+                        if chunk_count == cached_chunks and first_sent_at["value"] is not None:
+                            TTS_TIME_TO_FIRST_CHUNK_SECONDS.observe(time.perf_counter() - first_sent_at["value"], transport="websocket")
+                        if binary_audio:
+                            # Day 31: Decode once and send raw bytes behind a small header
+                            chunk = base64.b64decode(audio_chunk)
+                            send_to_client_safe(encode_frame(frame_type, chunk, seq=chunk_count, turn_id=turn_id))
+                            audio_bytes += len(chunk)
+                        else:
+                            audio_chunks.append(audio_chunk)
+                            # Day 21: Stream base64 audio chunk to client
+                            send_to_client_safe(f"audio_chunk:{audio_chunk}")
+                            audio_bytes += len(audio_chunk)
+                            chunk = base64.b64decode(audio_chunk) if recorded is not None else b""
+                        if recorded is not None:
+                            recorded_bytes += len(chunk)
+                            if recorded_bytes <= tts_audio_cache.max_clip_bytes:
+                                recorded.append(chunk)
+                            else:
+                                recorded = None
                         chunk_count += 1
-                        
-                        # Day 21: Stream base64 audio chunk to client
-                        send_to_client_safe(f"audio_chunk:{audio_chunk}")
+                        tts_span.event("murf.chunk", seq=chunk_count, length=len(audio_chunk))
                         print(f"[MURF] Streamed audio chunk #{chunk_count} to client (length: {len(audio_chunk)})", flush=True)
-                    
+
                     if data.get("isFinalAudio", False):
-                        print(f"[MURF] Final audio received, total chunks: {len(audio_chunks)}", flush=True)
-                        send_to_client_safe(f"audio_complete:{len(audio_chunks)}")
+                        if first_sent_at["value"] is not None:
+                            TTS_REQUEST_SECONDS.observe(time.perf_counter() - first_sent_at["value"], transport="websocket")
+                        print(f"[MURF] Final audio received, total chunks: {chunk_count}", flush=True)
+                        tts_span.event("murf.final", chunks=chunk_count)
+                        send_to_client_safe(f"audio_complete:{chunk_count}")
+                        finished = True
                         break
-                        
+
                 except websockets.exceptions.ConnectionClosed:
                     print("[MURF] WebSocket connection closed", flush=True)
                     send_to_client_safe("audio_error:Murf WebSocket connection closed")
@@ -361,19 +620,108 @@ async def stream_text_to_murf_websocket(text: str, websocket_client=None, client
                     print(f"[MURF] Error receiving audio: {e}", flush=True)
                     send_to_client_safe(f"audio_error:Error receiving audio: {e}")
                     break
-            
+
             # Combine all audio chunks and print final base64 (for Day 20 compatibility)
             if audio_chunks:
                 combined_audio = "".join(audio_chunks)
                 print(f"[MURF] COMPLETE BASE64 ENCODED AUDIO: {combined_audio}", flush=True)
                 print(f"[MURF] Audio length: {len(combined_audio)} characters", flush=True)
-            else:
+            elif chunk_count:
+                print(f"[MURF] Audio length: {audio_bytes} bytes in {chunk_count} binary frames", flush=True)
+            elif finished:
                 print("[MURF] No audio chunks received", flush=True)
                 send_to_client_safe("audio_error:No audio chunks received")
-                
+            # Day 35: Murf attributes audio to a context, not a segment, so only
+            # single-segment replies can be cached sentence by sentence
+            if finished and recorded and segments_sent["count"] == 1:
+                await tts_audio_cache.put(murf_voice_id, sent_texts[0], TTS_STREAM_VARIANT, recorded, f"audio/{MURF_STREAM_FORMAT.lower()}")
+            return finished
+
+        sender = asyncio.create_task(pump_segments())
+        receiver = asyncio.create_task(receive_audio())
+        murf_open = await sender
+        if segments_sent["count"] == 0:
+            # Nothing was spoken, so no audio is coming back for this context
+            receiver.cancel()
+            reusable = murf_open
+        else:
+            reusable = await receiver and murf_open
+
+    except asyncio.CancelledError as cancelled:
+        for task in (sender, receiver):
+            if task is not None:
+                task.cancel()
+        tts_span.finish(cancelled)
+        raise
     except Exception as e:
         print(f"[MURF] WebSocket connection failed: {e}", flush=True)
         send_to_client_safe(f"audio_error:WebSocket connection failed: {e}")
+        tts_span.finish(e)
+    finally:
+        if receiver is not None and not receiver.done():
+            receiver.cancel()
+        if conn is not None:
+            await murf_pool.release(conn, reusable=reusable)
+    tts_span.set(segments=segments_sent["count"], cached_chunks=cached_chunks, reusable=reusable)
+    tts_span.finish()
+
+    if sender is None:
+        # Never connected: still let the LLM stream finish
+        await drain_segments()
+
+
+async def stream_text_to_murf_websocket(
+    text: str,
+    send: Optional[Callable[[object], None]] = None,
+    session_id: str = None,
+    binary_audio: bool = False,
+    turn_id: int = 0,
+    voice_id: Optional[str] = None,
+) -> None:
+    """Stream a complete reply to Murf as a single segment."""
+    async def single_segment() -> AsyncIterator[str]:
+        yield text
+
+    await stream_segments_to_murf_websocket(
+        single_segment(), send, session_id, binary_audio=binary_audio, turn_id=turn_id, voice_id=voice_id
+    )
+
+
+async def stream_llm_to_murf_pipelined(
+    text_deltas: AsyncIterator[str],
+    send: Optional[Callable[[object], None]] = None,
+    session_id: str = None,
+    on_text_complete: Optional[Callable[[str], None]] = None,
+    binary_audio: bool = False,
+    turn_id: int = 0,
+) -> str:
+    """Day 28: Pipe LLM text deltas into Murf sentence by sentence.
+
+    Segments are released by SentenceChunker as soon as a sentence or clause
+    boundary arrives. on_text_complete is called with the full reply as soon
+    as the LLM stream ends, before the remaining audio has finished.
+    Returns the full generated text.
+    """
+    chunker = SentenceChunker()
+    parts: List[str] = []
+
+    async def segments() -> AsyncIterator[str]:
+        async for delta in text_deltas:
+            if not parts:
+                tracer.event("llm.first_text")
+            parts.append(delta)
+            for segment in chunker.feed(delta):
+                yield segment
+        tail = chunker.flush()
+        if tail:
+            yield tail
+        full_text = "".join(parts)
+        tracer.event("llm.complete", chars=len(full_text))
+        if on_text_complete and full_text:
+            on_text_complete(full_text)
+
+    await stream_segments_to_murf_websocket(segments(), send, session_id, binary_audio=binary_audio, turn_id=turn_id)
+    return "".join(parts)
 
 
 @app.exception_handler(HTTPException)
@@ -391,9 +739,10 @@ async def http_exception_handler(request: Request, exc: HTTPException):
     content: Dict[str, object] = {
         "success": False,
         "detail": detail_obj,
-        "fallback_text": FALLBACK_TEXT,
+        **fallback_payload(),
     }
-    return JSONResponse(status_code=exc.status_code, content=content)
+    # Keep headers set on the exception (e.g. Retry-After)
+    return JSONResponse(status_code=exc.status_code, content=content, headers=getattr(exc, "headers", None))
 
 
 @app.exception_handler(Exception)
@@ -401,7 +750,7 @@ async def unhandled_exception_handler(request: Request, exc: Exception):
     content = {
         "success": False,
         "detail": {"message": f"Unhandled server error: {exc}"},
-        "fallback_text": FALLBACK_TEXT,
+        **fallback_payload(),
     }
     return JSONResponse(status_code=500, content=content)
 
@@ -418,6 +767,76 @@ async def add_no_cache_headers(request: Request, call_next):
     return response
 
 
+# Day 39: Admission control for the expensive voice endpoints. Requests wait in a
+# bounded queue for a slot; on overload they get an immediate 429/503 with Retry-After.
+ADMISSION_ROUTES = (
+    ("POST", "/agent/chat/", "agent_chat"),
+    ("POST", "/llm/query", "llm_query"),
+)
+
+
+def admission_gate_for(method: str, path: str) -> Optional[str]:
+    for route_method, prefix, gate in ADMISSION_ROUTES:
+        if method == route_method and path.startswith(prefix):
+            return gate
+    return None
+
+
+def trace_path(path: str) -> str:
+    """Request path as recorded in traces: the session id in /agent/chat/{id} is replaced by its fingerprint"""
+    if path.startswith("/agent/chat/"):
+        session_id, _, rest = path[len("/agent/chat/"):].partition("/")
+        return "/agent/chat/" + key_fingerprint(session_id) + (f"/{rest}" if rest else "")
+    return path
+
+
+# Day 43: Endpoints whose requests can be profiled individually
+PROFILED_GATES = {"llm_query", "agent_chat"}
+
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    gate = admission_gate_for(request.method, request.url.path)
+    if gate is None:
+        return await call_next(request)
+    # Day 41: Each voice request is one trace, starting with the wait for admission
+    # Session ids act as credentials, so traces only hold their fingerprints
+    with tracer.trace(f"http.{gate}", path=trace_path(request.url.path)) as request_span:
+        # Runs before the body is read, so shed requests cost no upload or upstream calls
+        try:
+            with tracer.span("admission.wait", gate=gate):
+                token = await admission.acquire(gate)
+        except AdmissionRejected as exc:
+            print(f"[ADMISSION] Rejected {request.url.path}: {exc}", flush=True)
+            request_span.set(status=exc.status_code, rejected=exc.reason)
+            content = {
+                "success": False,
+                "detail": {"message": str(exc), "code": "overloaded", "retry_after": exc.retry_after},
+                **fallback_payload(),
+            }
+            return JSONResponse(status_code=exc.status_code, content=content, headers=exc.headers)
+        # Day 43: "X-Profile: 1" with a valid X-Admin-Token samples all threads while this request runs
+        profile = None
+        if gate in PROFILED_GATES and request.headers.get("x-profile"):
+            if profiler.authorized(request.headers.get("x-admin-token")):
+                label = f"{trace_path(request.url.path)} {request_span.trace.trace_id if request_span is not NOOP_SPAN else ''}"
+                profile = profiler.start(label.strip())
+            else:
+                print(f"[PROFILER] Ignored X-Profile on {request.url.path}: missing or invalid X-Admin-Token", flush=True)
+        try:
+            response = await call_next(request)
+        finally:
+            admission.release(gate, token)
+            if profile is not None:
+                profiler.finish(profile)
+        if profile is not None:
+            response.headers["X-Profile-Id"] = profile.profile_id
+        request_span.set(status=response.status_code)
+        if request_span is not NOOP_SPAN:
+            response.headers["X-Trace-Id"] = request_span.trace.trace_id
+        return response
+
+
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     """Serve the main HTML page"""
@@ -430,6 +849,164 @@ async def health_check():
     return {"status": "healthy", "message": "30 Days of AI - Day 20 is running!"}
 
 
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Hit/miss counters for the in-process upstream caches"""
+    return {
+        "weather": weather_service.cache_stats(),
+        "web_search": web_search_service.cache_stats(),
+        "llm_query": llm_response_cache.stats(),
+        "tts_audio": tts_audio_cache.stats(),
+    }
+
+
+@app.get("/api/tts/audio/{key}")
+async def get_cached_tts_audio(key: str):
+    """Day 35: Serve a clip from the TTS audio cache (URLs returned for cache hits)"""
+    clip = await tts_audio_cache.get_by_key(key)
+    if clip is None:
+        raise HTTPException(status_code=404, detail="Audio not found in TTS cache.")
+    return Response(content=clip.audio(), media_type=clip.media_type, headers={"Cache-Control": "private, max-age=86400"})
+
+
+@app.get("/api/sessions/stats")
+async def sessions_stats():
+    """Session store size, limits and eviction counters"""
+    return session_store.stats()
+
+
+@app.get("/api/tts/pool/stats")
+async def murf_pool_stats():
+    """Murf WebSocket pool size and reuse counters"""
+    return murf_pool.stats()
+
+
+@app.get("/api/tts/voices/stats")
+async def murf_voice_catalog_stats():
+    """Murf voice catalog size, freshness and memoized persona voice resolution"""
+    return voice_catalog.stats()
+
+
+@app.get("/api/admission/stats")
+async def admission_stats():
+    """Admission gates: active, waiting and shed requests per endpoint"""
+    return admission.stats()
+
+
+@app.get("/api/egress/stats")
+async def egress_stats():
+    """Upstream lanes: adaptive limit, in-flight and queued calls per (API, key)"""
+    return egress.stats()
+
+
+def require_admin(request: Request) -> None:
+    """Day 43: Admin endpoints (traces, profiler) need ADMIN_TOKEN set and sent back as X-Admin-Token"""
+    if not profiler.enabled():
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (set ADMIN_TOKEN)")
+    if not profiler.authorized(request.headers.get("x-admin-token")):
+        raise HTTPException(status_code=401, detail="Missing or invalid X-Admin-Token")
+
+
+@app.get("/api/traces")
+async def list_traces(request: Request, limit: int = 20, slowest: bool = False):
+    """Recent voice turn and request traces (newest first, or slowest first)"""
+    require_admin(request)
+    return {"stats": tracer.stats(), "traces": tracer.recent(limit, slowest=slowest)}
+
+
+@app.get("/api/traces/{trace_id}")
+async def get_trace(request: Request, trace_id: str, format: str = "json"):
+    """One trace with all its spans; format=chrome returns a file for chrome://tracing or Perfetto"""
+    require_admin(request)
+    trace = tracer.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found (only recent traces are kept in memory)")
+    if format == "chrome":
+        return JSONResponse(
+            {"traceEvents": trace.to_chrome_events(1), "displayTimeUnit": "ms"},
+            headers={"Content-Disposition": f'attachment; filename="trace-{trace_id}.json"'},
+        )
+    return trace.to_dict()
+
+
+@app.get("/api/loop/stats")
+async def loop_stats(request: Request, limit: int = 10):
+    """Event-loop lag percentiles and the call sites that blocked the loop longest"""
+    require_admin(request)
+    return loop_monitor.stats(limit)
+
+
+@app.post("/api/loop/reset")
+async def loop_reset(request: Request):
+    """Day 42: Start a fresh lag window and call-site table, e.g. to confirm a fix"""
+    require_admin(request)
+    stats = loop_monitor.stats()
+    loop_monitor.reset()
+    return stats
+
+
+def profile_response(profile, format: str):
+    """A profile as folded stacks (flamegraph-ready download) or a JSON summary"""
+    if format == "collapsed":
+        return Response(
+            content=profile.collapsed(),
+            media_type="text/plain",
+            headers={"Content-Disposition": f'attachment; filename="profile-{profile.profile_id}.folded"'},
+        )
+    return profile.to_dict()
+
+
+@app.post("/api/admin/profile")
+async def run_profile(
+    request: Request, seconds: float = 10.0, interval_ms: Optional[float] = None, idle: bool = False, format: str = "collapsed"
+):
+    """Sample every thread for `seconds` and return collapsed stacks (format=json for the top functions)"""
+    require_admin(request)
+    seconds = min(max(seconds, 0.1), PROFILER_MAX_SECONDS)
+    profile = profiler.start(f"on-demand {seconds:g}s", interval_ms=interval_ms, idle=idle)
+    print(f"[PROFILER] Profiling all threads for {seconds:g}s (id {profile.profile_id})", flush=True)
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.finish(profile)
+    return profile_response(profile, format)
+
+
+@app.get("/api/admin/profile")
+async def list_profiles(request: Request):
+    """Running and recently finished profiles"""
+    require_admin(request)
+    return profiler.stats()
+
+
+@app.get("/api/admin/profile/{profile_id}")
+async def get_profile(request: Request, profile_id: str, format: str = "collapsed"):
+    """A recent profile, e.g. the one named by a request's X-Profile-Id header"""
+    require_admin(request)
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found (only recent profiles are kept in memory)")
+    return profile_response(profile, format)
+
+
+@app.get("/api/stt/stats")
+async def stt_stats():
+    """Batch transcription worker pool: running, queued and rejected jobs"""
+    return transcription_executor.stats()
+
+
+@app.get("/api/recordings/stats")
+async def recordings_stats():
+    """Recording storage usage, quota and per-connection write throughput"""
+    return recording_store.stats()
+
+
+@app.get("/api/metrics")
+async def metrics():
+    """Prometheus text exposition of pipeline latency histograms and counters"""
+    return Response(content=metrics_registry.render(), media_type=metrics_registry.content_type)
+
+
 @app.get("/api/day")
 async def get_day_info():
     """Get information about the current day"""
@@ -441,7 +1018,8 @@ async def get_day_info():
 @app.get("/api/config/{session_id}/keys")
 async def get_session_keys(session_id: str):
     """Return which keys are set for this session (mask actual values)."""
-    stored = USER_API_KEYS.get(session_id, {})
+    await session_store.ensure(session_id)
+    stored = session_store.get_api_keys(session_id)
     return {
         "session_id": session_id,
         "keys": {k: (k in stored and bool(stored.get(k))) for k in ALLOWED_CONFIG_KEYS},
@@ -460,14 +1038,13 @@ async def update_session_keys(session_id: str, req: UpdateKeysRequest):
     if not isinstance(req.keys, dict):
         raise HTTPException(status_code=400, detail="Invalid keys payload")
     filtered: Dict[str, str] = {k: v for k, v in req.keys.items() if k in ALLOWED_CONFIG_KEYS and isinstance(v, str) and v.strip()}
-    if session_id not in USER_API_KEYS:
-        USER_API_KEYS[session_id] = {}
-    USER_API_KEYS[session_id].update(filtered)
+    await session_store.ensure(session_id)
+    stored = session_store.update_api_keys(session_id, filtered)
     # Return which keys are set
     return {
         "success": True,
         "session_id": session_id,
-        "keys": {k: (k in USER_API_KEYS[session_id]) for k in ALLOWED_CONFIG_KEYS},
+        "keys": {k: (k in stored) for k in ALLOWED_CONFIG_KEYS},
     }
 
 
@@ -484,18 +1061,29 @@ async def set_persona(session_id: str, persona_id: str):
     if persona_id not in PERSONAS:
         raise HTTPException(status_code=400, detail=f"Invalid persona: {persona_id}")
     
-    SESSION_PERSONAS[session_id] = persona_id
-    return {
+    await session_store.ensure(session_id)
+    session_store.set_persona(session_id, persona_id)
+    persona = PERSONAS[persona_id]
+    greeting = persona_greeting(persona)
+    response: Dict[str, object] = {
         "success": True,
         "session_id": session_id,
-        "persona": PERSONAS[persona_id]
+        "persona": persona,
+        "greeting": greeting,
     }
+    # Day 35: Greetings are pre-synthesized at startup; include the audio once it is cached
+    voice_id = resolve_murf_voice_id(persona["voice_id"])
+    greeting_audio_url = cached_rest_audio_url(voice_id, greeting)
+    if greeting_audio_url:
+        response["greeting_audio_url"] = greeting_audio_url
+    return response
 
 
 @app.get("/api/personas/{session_id}")
 async def get_session_persona(session_id: str):
     """Get current persona for a session"""
-    persona_id = SESSION_PERSONAS.get(session_id, "robot")  # Default to robot
+    await session_store.ensure(session_id)
+    persona_id = session_store.get_persona(session_id)  # Default to robot
     return {
         "session_id": session_id,
         "persona_id": persona_id,
@@ -519,36 +1107,14 @@ async def generate_tts(request: TTSRequest):
         raise HTTPException(
             status_code=500, detail="Murf API key not configured.")
 
-    murf_endpoint = "https://api.murf.ai/v1/speech/generate"
-    payload = {
-        "text": request.text,
-        "voiceId": "en-US-terrell",  # Corrected to camelCase: voiceId
-    }
-    headers = {
-        "api-key": murf_api_key,
-        "Content-Type": "application/json"
-    }
-
     try:
-        response = requests.post(
-            murf_endpoint, json=payload, headers=headers, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        audio_url = data.get("audioFile")  # Corrected to camelCase: audioFile
+        # Day 35: Repeated sentences are answered from the TTS audio cache
+        audio_url, data = await murf_generate_audio_url(request.text, "en-US-terrell", murf_api_key, timeout=30)
         if not audio_url:
-            return {"success": False, "message": "No audio URL in Murf response", "raw_response": data, "fallback_text": FALLBACK_TEXT}
+            return {"success": False, "message": "No audio URL in Murf response", "raw_response": data, **fallback_payload()}
         return {"success": True, "audio_url": audio_url}
-    except requests.RequestException as exc:
-        error_detail = f"Failed to call Murf API: {exc}"
-        if exc.response is not None:
-            try:
-                # Try to parse the JSON error response from Murf
-                murf_error = exc.response.json()
-                error_detail = f"Murf API Error: {murf_error.get('message', exc.response.text)}"
-            except ValueError:
-                # If response is not JSON, use the raw text
-                error_detail = f"Murf API Error: {exc.response.status_code} - {exc.response.text}"
-        raise HTTPException(status_code=502, detail=error_detail)
+    except httpx.HTTPError as exc:
+        raise HTTPException(status_code=502, detail=describe_http_error("Murf", exc))
 
 # ---------------------------------------------------------
 
@@ -562,24 +1128,25 @@ async def upload_audio(file: UploadFile = File(...)):
     if not file:
         raise HTTPException(status_code=400, detail="No file sent.")
 
-    file_path = os.path.join(UPLOADS_DIR, file.filename)
-
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        file_size = os.path.getsize(file_path)
+        recording = await recording_store.save_upload(file.filename, file)
 
         return {
             "filename": file.filename,
             "content_type": file.content_type,
-            "size": file_size
+            "size": recording.bytes_written
         }
+    except RecordingQuotaExceeded as e:
+        raise HTTPException(status_code=507, detail=f"Failed to save file: {e}")
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to save file: {e}")
 # ------------------ Day 6: Transcription Endpoint ------------------
 
+# Day 38: Batch transcription runs on services.stt's bounded worker pool with
+# per-request API keys (the global aai.settings.api_key is no longer touched)
+
+
 @app.post("/transcribe/file")
 async def transcribe_file(file: UploadFile = File(...)):
     """Transcribe an uploaded audio file using AssemblyAI and return the text."""
@@ -587,21 +1154,12 @@ async def transcribe_file(file: UploadFile = File(...)):
     if not assemblyai_api_key:
         raise HTTPException(status_code=500, detail="AssemblyAI API key not configured.")
     try:
-        aai.settings.api_key = assemblyai_api_key
         audio_bytes = await file.read()
-        transcriber = aai.Transcriber()
-
-        # Try to use the modern SDK helper for uploading bytes first. If the current
-        # SDK version doesn't have that helper, fall back to passing the bytes
-        # directly to the transcribe() method (supported by newer SDKs as well).
-        try:
-            upload_url = transcriber.upload_file(audio_bytes)  # type: ignore[attr-defined]
-            transcript = transcriber.transcribe(upload_url)
-        except AttributeError:
-            # Older SDK – upload helper not available, pass raw bytes directly.
-            transcript = transcriber.transcribe(audio_bytes)
+        transcript = await transcription_executor.transcribe(audio_bytes, assemblyai_api_key, "/transcribe/file")
 
         return {"transcript": transcript.text}
+    except (TranscriptionQueueFull, httpx.PoolTimeout) as e:
+        raise HTTPException(status_code=503, detail=f"Transcription busy: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Transcription failed: {e}")
 
@@ -622,56 +1180,34 @@ async def tts_echo(file: UploadFile = File(...)):
 
     try:
         # 1) Transcribe using AssemblyAI
-        aai.settings.api_key = assemblyai_api_key
         audio_bytes = await file.read()
-        transcriber = aai.Transcriber()
-
-        try:
-            upload_url = transcriber.upload_file(audio_bytes)  # type: ignore[attr-defined]
-            transcript = transcriber.transcribe(upload_url)
-        except AttributeError:
-            transcript = transcriber.transcribe(audio_bytes)
+        transcript = await transcription_executor.transcribe(audio_bytes, assemblyai_api_key, "/tts/echo")
 
         transcript_text = transcript.text or ""
         if not transcript_text.strip():
-            return {"success": False, "message": "No transcription text produced.", "fallback_text": FALLBACK_TEXT}
+            return {"success": False, "message": "No transcription text produced.", **fallback_payload()}
 
         # 2) Generate TTS using Murf
-        murf_endpoint = "https://api.murf.ai/v1/speech/generate"
-        payload = {
-            "text": transcript_text,
-            # Use any valid Murf voice; can be customized via env later
-            "voiceId": os.getenv("MURF_VOICE_ID", "en-US-terrell"),
-        }
-        headers = {
-            "api-key": murf_api_key,
-            "Content-Type": "application/json",
-        }
-
         try:
-            response = requests.post(murf_endpoint, json=payload, headers=headers, timeout=60)
-            response.raise_for_status()
-            data = response.json()
-            audio_url = data.get("audioFile")
+            # Use any valid Murf voice; can be customized via env later
+            # The user's own words are never worth keeping
+            audio_url, data = await murf_generate_audio_url(
+                transcript_text, DEFAULT_MURF_VOICE_ID, murf_api_key, cache_audio=False
+            )
             if not audio_url:
                 return {
                     "success": False,
                     "message": "No audio URL in Murf response",
                     "raw_response": data,
                     "transcript": transcript_text,
-                    "fallback_text": FALLBACK_TEXT,
+                    **fallback_payload(),
                 }
             return {"success": True, "audio_url": audio_url, "transcript": transcript_text}
-        except requests.RequestException as exc:
-            error_detail = f"Failed to call Murf API: {exc}"
-            if exc.response is not None:
-                try:
-                    murf_error = exc.response.json()
-                    error_detail = f"Murf API Error: {murf_error.get('message', exc.response.text)}"
-                except ValueError:
-                    error_detail = f"Murf API Error: {exc.response.status_code} - {exc.response.text}"
-            raise HTTPException(status_code=502, detail=error_detail)
+        except httpx.HTTPError as exc:
+            raise HTTPException(status_code=502, detail=describe_http_error("Murf", exc))
 
+    except (TranscriptionQueueFull, httpx.PoolTimeout) as e:
+        raise HTTPException(status_code=503, detail=f"Transcription busy: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Echo TTS failed: {e}")
 
@@ -682,6 +1218,7 @@ async def tts_echo(file: UploadFile = File(...)):
 class LLMQueryRequest(BaseModel):
     text: str
     model: Optional[str] = None  # Optional override, defaults via env or sensible default
+    cache: bool = True  # Set false to skip the response cache (when LLM_CACHE_ENABLED)
 
 
 @app.post("/llm/query")
@@ -692,11 +1229,15 @@ async def llm_query(request: Request, file: Optional[UploadFile] = File(None), m
     - multipart/form-data with 'file': audio blob (and optional 'model') → transcribe → Gemini → Murf → returns audio URL
     """
     session_id_from_query = request.query_params.get("session")
+    await session_store.ensure(session_id_from_query)
     gemini_api_key = get_user_config(session_id_from_query, "GEMINI_API_KEY")
     if not gemini_api_key:
         raise HTTPException(status_code=500, detail="Gemini API key not configured.")
 
     content_type = request.headers.get("content-type", "")
+    # Day 40: Spoken queries are voice turns; text queries yield to them upstream
+    is_voice = "multipart/form-data" in content_type or file is not None
+    set_egress_context(session_id_from_query, PRIORITY_INTERACTIVE if is_voice else PRIORITY_TEXT)
 
     # If audio is provided (multipart), run the full pipeline: Transcribe → LLM → Murf
     if "multipart/form-data" in content_type or file is not None:
@@ -712,27 +1253,20 @@ async def llm_query(request: Request, file: Optional[UploadFile] = File(None), m
 
         # 1) Transcribe audio
         try:
-            aai.settings.api_key = assemblyai_api_key
             audio_bytes = await file.read()
-            transcriber = aai.Transcriber()
-
-            try:
-                upload_url = transcriber.upload_file(audio_bytes)  # type: ignore[attr-defined]
-                transcript = transcriber.transcribe(upload_url)
-            except AttributeError:
-                transcript = transcriber.transcribe(audio_bytes)
+            transcript = await transcription_executor.transcribe(audio_bytes, assemblyai_api_key, "/llm/query")
 
             transcript_text = (transcript.text or "").strip()
             if not transcript_text:
-                return {"success": False, "message": "No transcription text produced.", "fallback_text": FALLBACK_TEXT}
+                return {"success": False, "message": "No transcription text produced.", **fallback_payload()}
+        except (TranscriptionQueueFull, httpx.PoolTimeout) as e:
+            raise HTTPException(status_code=503, detail={"message": f"Transcription busy: {e}", "stage": "STT"})
         except Exception as e:
             raise HTTPException(status_code=500, detail={"message": f"Transcription failed: {e}", "stage": "STT"})
 
         # 2) Query Gemini with transcribed text
         chosen_model = model or get_user_config(session_id_from_query, "GEMINI_MODEL", "gemini-1.5-flash")
-        endpoint = (
-            f"https://generativelanguage.googleapis.com/v1beta/models/{chosen_model}:generateContent?key={gemini_api_key}"
-        )
+        endpoint = f"{gemini_url(chosen_model)}?key={gemini_api_key}"
         payload = {
             "contents": [
                 {
@@ -743,12 +1277,16 @@ async def llm_query(request: Request, file: Optional[UploadFile] = File(None), m
             ]
         }
         try:
-            response = requests.post(
-                endpoint,
-                json=payload,
-                headers={"Content-Type": "application/json"},
-                timeout=60,
-            )
+            with LLM_GENERATION_SECONDS.time(mode="blocking"):
+                response = await egress.request(
+                    "gemini",
+                    gemini_api_key,
+                    "POST",
+                    endpoint,
+                    json=payload,
+                    headers={"Content-Type": "application/json"},
+                    timeout=60,
+                )
             response.raise_for_status()
             data = response.json()
 
@@ -766,39 +1304,15 @@ async def llm_query(request: Request, file: Optional[UploadFile] = File(None), m
                     "message": "No generated text returned by Gemini",
                     "raw_response": data,
                     "transcript": transcript_text,
-                    "fallback_text": FALLBACK_TEXT,
+                    **fallback_payload(),
                 }
-        except requests.RequestException as exc:
-            error_detail = f"Failed to call Gemini API: {exc}"
-            if exc.response is not None:
-                try:
-                    gemini_error = exc.response.json()
-                    if isinstance(gemini_error, dict) and "error" in gemini_error:
-                        error_detail = f"Gemini API Error: {gemini_error['error']}"
-                    else:
-                        error_detail = f"Gemini API Error: {gemini_error}"
-                except ValueError:
-                    error_detail = f"Gemini API Error: {exc.response.status_code} - {exc.response.text}"
-            raise HTTPException(status_code=502, detail={"message": error_detail, "stage": "LLM"})
+        except httpx.HTTPError as exc:
+            raise HTTPException(status_code=502, detail={"message": describe_http_error("Gemini", exc), "stage": "LLM"})
 
         
         murf_text = llm_text[:3000]
-        murf_endpoint = "https://api.murf.ai/v1/speech/generate"
-        murf_payload = {
-            "text": murf_text,
-            "voiceId": os.getenv("MURF_VOICE_ID", "en-US-terrell"),
-        }
-        murf_headers = {
-            "api-key": murf_api_key,
-            "Content-Type": "application/json",
-        }
         try:
-            tts_response = requests.post(
-                murf_endpoint, json=murf_payload, headers=murf_headers, timeout=60
-            )
-            tts_response.raise_for_status()
-            tts_data = tts_response.json()
-            audio_url = tts_data.get("audioFile")
+            audio_url, tts_data = await murf_generate_audio_url(murf_text, DEFAULT_MURF_VOICE_ID, murf_api_key)
             if not audio_url:
                 return {
                     "success": False,
@@ -806,7 +1320,7 @@ async def llm_query(request: Request, file: Optional[UploadFile] = File(None), m
                     "raw_response": tts_data,
                     "transcript": transcript_text,
                     "llm_text": llm_text,
-                    "fallback_text": FALLBACK_TEXT,
+                    **fallback_payload(),
                 }
             return {
                 "success": True,
@@ -816,15 +1330,8 @@ async def llm_query(request: Request, file: Optional[UploadFile] = File(None), m
                 "llm_text": llm_text,
                 "truncated_for_tts": len(llm_text) > 3000,
             }
-        except requests.RequestException as exc:
-            error_detail = f"Failed to call Murf API: {exc}"
-            if exc.response is not None:
-                try:
-                    murf_error = exc.response.json()
-                    error_detail = f"Murf API Error: {murf_error.get('message', exc.response.text)}"
-                except ValueError:
-                    error_detail = f"Murf API Error: {exc.response.status_code} - {exc.response.text}"
-            raise HTTPException(status_code=502, detail={"message": error_detail, "stage": "TTS"})
+        except httpx.HTTPError as exc:
+            raise HTTPException(status_code=502, detail={"message": describe_http_error("Murf", exc), "stage": "TTS"})
 
     # Else: JSON (text → LLM only)
     try:
@@ -842,7 +1349,7 @@ async def llm_query(request: Request, file: Optional[UploadFile] = File(None), m
         raise HTTPException(status_code=400, detail={"message": "'text' is required and cannot be empty."})
 
     chosen_model = parsed.model or get_user_config(session_id_from_query, "GEMINI_MODEL", "gemini-1.5-flash")
-    endpoint = f"https://generativelanguage.googleapis.com/v1beta/models/{chosen_model}:generateContent?key={gemini_api_key}"
+    endpoint = f"{gemini_url(chosen_model)}?key={gemini_api_key}"
     payload = {
         "contents": [
             {
@@ -853,40 +1360,40 @@ async def llm_query(request: Request, file: Optional[UploadFile] = File(None), m
         ]
     }
 
-    try:
-        response = requests.post(endpoint, json=payload, headers={"Content-Type": "application/json"}, timeout=60)
-        response.raise_for_status()
-        data = response.json()
+    async def generate() -> Dict[str, object]:
+        try:
+            with LLM_GENERATION_SECONDS.time(mode="blocking"):
+                response = await egress.request(
+                    "gemini", gemini_api_key, "POST", endpoint, json=payload, headers={"Content-Type": "application/json"}, timeout=60
+                )
+            response.raise_for_status()
+            data = response.json()
 
-        generated_text = ""
-        candidates = data.get("candidates", [])
-        if candidates:
-            content = candidates[0].get("content", {})
-            parts = content.get("parts", [])
-            if parts and isinstance(parts[0], dict):
-                generated_text = parts[0].get("text", "")
+            generated_text = ""
+            candidates = data.get("candidates", [])
+            if candidates:
+                content = candidates[0].get("content", {})
+                parts = content.get("parts", [])
+                if parts and isinstance(parts[0], dict):
+                    generated_text = parts[0].get("text", "")
 
-        if not generated_text:
-            return {
-                "success": False,
-                "message": "No generated text returned by Gemini",
-                "raw_response": data,
-                "fallback_text": FALLBACK_TEXT,
-            }
+            if not generated_text:
+                return {
+                    "success": False,
+                    "message": "No generated text returned by Gemini",
+                    "raw_response": data,
+                    **fallback_payload(),
+                }
 
-        return {"success": True, "model": chosen_model, "response": generated_text}
-    except requests.RequestException as exc:
-        error_detail = f"Failed to call Gemini API: {exc}"
-        if exc.response is not None:
-            try:
-                gemini_error = exc.response.json()
-                if isinstance(gemini_error, dict) and "error" in gemini_error:
-                    error_detail = f"Gemini API Error: {gemini_error['error']}"
-                else:
-                    error_detail = f"Gemini API Error: {gemini_error}"
-            except ValueError:
-                error_detail = f"Gemini API Error: {exc.response.status_code} - {exc.response.text}"
-        raise HTTPException(status_code=502, detail={"message": error_detail, "stage": "LLM"})
+            return {"success": True, "model": chosen_model, "response": generated_text}
+        except httpx.HTTPError as exc:
+            raise HTTPException(status_code=502, detail={"message": describe_http_error("Gemini", exc), "stage": "LLM"})
+
+    # Day 34: Identical text-only prompts are answered from the response cache (opt-in)
+    result, cache_status = await llm_response_cache.get_or_compute(
+        chosen_model, prompt_text, generate, use_cache=parsed.cache
+    )
+    return JSONResponse(content=result, headers={"X-Cache": cache_status})
 
 
 # ------------------ Day 10: Agent Chat with Session History ------------------
@@ -899,6 +1406,8 @@ async def agent_chat(session_id: str, file: Optional[UploadFile] = File(None), m
     # Simulate credit exhaustion: return a structured error like a real backend failure
     if SIMULATE_CREDIT_EXHAUSTION:
         raise HTTPException(status_code=402, detail={"message": "Sorry the api credit has been exhausted", "code": "credit_exhausted"})
+    # Session state is read from the backend on a worker thread, never on the event loop
+    await session_store.ensure(session_id)
     assemblyai_api_key = get_user_config(session_id, "ASSEMBLYAI_API_KEY")
     gemini_api_key = get_user_config(session_id, "GEMINI_API_KEY")
     murf_api_key = get_user_config(session_id, "MURF_API_KEY")
@@ -909,37 +1418,32 @@ async def agent_chat(session_id: str, file: Optional[UploadFile] = File(None), m
         raise HTTPException(status_code=500, detail={"message": "Gemini API key not configured.", "stage": "LLM"})
     if not murf_api_key:
         raise HTTPException(status_code=500, detail={"message": "Murf API key not configured.", "stage": "TTS"})
+    set_egress_context(session_id, PRIORITY_INTERACTIVE)
 
     if file is None:
         raise HTTPException(status_code=400, detail="'file' is required in multipart form data.")
 
     # 1) Transcribe audio to text
     try:
-        aai.settings.api_key = assemblyai_api_key
         audio_bytes = await file.read()
-        transcriber = aai.Transcriber()
-
-        try:
-            upload_url = transcriber.upload_file(audio_bytes)  # type: ignore[attr-defined]
-            transcript = transcriber.transcribe(upload_url)
-        except AttributeError:
-            transcript = transcriber.transcribe(audio_bytes)
+        transcript = await transcription_executor.transcribe(audio_bytes, assemblyai_api_key, "/agent/chat")
 
         user_message = (transcript.text or "").strip()
         if not user_message:
-            return {"success": False, "message": "No transcription text produced.", "fallback_text": FALLBACK_TEXT}
+            return {"success": False, "message": "No transcription text produced.", **fallback_payload()}
+    except (TranscriptionQueueFull, httpx.PoolTimeout) as e:
+        raise HTTPException(status_code=503, detail={"message": f"Transcription busy: {e}", "stage": "STT"})
     except Exception as e:
         raise HTTPException(status_code=500, detail={"message": f"Transcription failed: {e}", "stage": "STT"})
 
     # 2) Retrieve chat history and build Gemini contents with persona context
-    history = CHAT_SESSIONS.get(session_id, [])
+    # Only the most recent turns that fit the prompt window are sent to Gemini
+    history = session_store.window(session_id)
     chosen_model = model or get_user_config(session_id, "GEMINI_MODEL", "gemini-1.5-flash")
-    endpoint = (
-        f"https://generativelanguage.googleapis.com/v1beta/models/{chosen_model}:generateContent?key={gemini_api_key}"
-    )
+    endpoint = f"{gemini_url(chosen_model)}?key={gemini_api_key}"
 
     # Day 24: Get persona and build system message
-    persona_id = SESSION_PERSONAS.get(session_id, "robot")
+    persona_id = session_store.get_persona(session_id)
     persona = PERSONAS.get(persona_id, PERSONAS["robot"])
     system_prompt = persona["system_prompt"]
 
@@ -954,7 +1458,7 @@ async def agent_chat(session_id: str, file: Optional[UploadFile] = File(None), m
         })
         contents.append({
             "role": "model", 
-            "parts": [{"text": f"I understand! I am {persona['name']} and I'm ready to help you in character. How may I assist you today?"}]
+            "parts": [{"text": persona_greeting(persona)}]
         })
     
     # Add chat history
@@ -976,7 +1480,7 @@ async def agent_chat(session_id: str, file: Optional[UploadFile] = File(None), m
         # Use per-request function calling service with Tavily key override
         fcs = FunctionCallingService()
         fcs.set_tavily_api_key_override(get_user_config(session_id, "TAVILY_API_KEY"))
-        function_result = fcs.call_gemini_with_functions(
+        function_result = await fcs.call_gemini_with_functions(
             contents, gemini_api_key, chosen_model
         )
         
@@ -985,7 +1489,7 @@ async def agent_chat(session_id: str, file: Optional[UploadFile] = File(None), m
                 "success": False,
                 "message": f"Function calling failed: {function_result.get('error', 'Unknown error')}",
                 "transcript": user_message,
-                "fallback_text": FALLBACK_TEXT,
+                **fallback_payload(),
                 "function_calls": function_result.get("function_calls", [])
             }
         
@@ -997,7 +1501,7 @@ async def agent_chat(session_id: str, file: Optional[UploadFile] = File(None), m
                 "success": False,
                 "message": "No generated text returned by Gemini with function calling",
                 "transcript": user_message,
-                "fallback_text": FALLBACK_TEXT,
+                **fallback_payload(),
                 "function_calls": function_calls_made
             }
             
@@ -1011,34 +1515,16 @@ async def agent_chat(session_id: str, file: Optional[UploadFile] = File(None), m
         error_detail = f"Failed to call Gemini API with function calling: {exc}"
         raise HTTPException(status_code=502, detail={"message": error_detail, "stage": "LLM"})
 
-    # 4) Update chat history (append user and model messages)
-    updated_history = history + [
-        {"role": "user", "text": user_message},
-        {"role": "model", "text": llm_text},
-    ]
-    CHAT_SESSIONS[session_id] = updated_history
+    # 4) Update chat history (append user and model messages in place)
+    session_store.append_turn(session_id, user_message, llm_text)
 
     # 5) TTS via Murf (truncate to 3000 chars per requirements) with persona voice
     murf_text = llm_text[:3000]
-    murf_endpoint = "https://api.murf.ai/v1/speech/generate"
     
     # Use persona-specific voice with validation/fallback
     persona_voice = resolve_murf_voice_id(persona["voice_id"])
-    murf_payload = {
-        "text": murf_text,
-        "voiceId": persona_voice,
-    }
-    murf_headers = {
-        "api-key": murf_api_key,
-        "Content-Type": "application/json",
-    }
     try:
-        tts_response = requests.post(
-            murf_endpoint, json=murf_payload, headers=murf_headers, timeout=60
-        )
-        tts_response.raise_for_status()
-        tts_data = tts_response.json()
-        audio_url = tts_data.get("audioFile")
+        audio_url, tts_data = await murf_generate_audio_url(murf_text, persona_voice, murf_api_key)
         if not audio_url:
             return {
                 "success": False,
@@ -1046,7 +1532,7 @@ async def agent_chat(session_id: str, file: Optional[UploadFile] = File(None), m
                 "raw_response": tts_data,
                 "transcript": user_message,
                 "llm_text": llm_text,
-                "fallback_text": FALLBACK_TEXT,
+                **fallback_payload(),
             }
         return {
             "success": True,
@@ -1055,25 +1541,19 @@ async def agent_chat(session_id: str, file: Optional[UploadFile] = File(None), m
             "transcript": user_message,
             "llm_text": llm_text,
             "truncated_for_tts": len(llm_text) > 3000,
-            "history_len": len(CHAT_SESSIONS.get(session_id, [])),
+            "history_len": session_store.history_len(session_id),
             "function_calls": function_calls_made,
             "web_search_used": any(call.get("function_name") == "search_web" for call in function_calls_made)
         }
-    except requests.RequestException as exc:
-        error_detail = f"Failed to call Murf API: {exc}"
-        if exc.response is not None:
-            try:
-                murf_error = exc.response.json()
-                error_detail = f"Murf API Error: {murf_error.get('message', exc.response.text)}"
-            except ValueError:
-                error_detail = f"Murf API Error: {exc.response.status_code} - {exc.response.text}"
-        raise HTTPException(status_code=502, detail={"message": error_detail, "stage": "TTS"})
+    except httpx.HTTPError as exc:
+        raise HTTPException(status_code=502, detail={"message": describe_http_error("Murf", exc), "stage": "TTS"})
 
 
 @app.get("/agent/chat/{session_id}/history")
 async def get_chat_history(session_id: str):
     """Return chat history for the session."""
-    history = CHAT_SESSIONS.get(session_id, [])
+    await session_store.ensure(session_id)
+    history = session_store.get_history(session_id)
     return {"session_id": session_id, "messages": history, "count": len(history)}
 
 # ---------------------------------------------------------------
@@ -1100,41 +1580,49 @@ async def websocket_audio_stream(websocket: WebSocket):
 
     # Generate a unique filename per connection
     filename = f"recording-{datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f')}.webm"
-    file_path = os.path.join(UPLOADS_DIR, filename)
 
-    # Open the destination file and stream-append incoming binary chunks
-    with open(file_path, "wb") as f:
+    # Day 37: Incoming binary chunks are batched and appended by a worker thread
+    recording = recording_store.open_recording(filename)
+    WS_ACTIVE_CONNECTIONS.inc(endpoint="/ws/audio")
+    try:
+        while True:
+            message = await websocket.receive()
+            data_bytes = message.get("bytes")
+            data_text = message.get("text")
+
+            if data_bytes is not None:
+                WS_FRAMES.inc(endpoint="/ws/audio", direction="in")
+                WS_BYTES.inc(len(data_bytes), endpoint="/ws/audio", direction="in")
+                await recording.write(data_bytes)
+            elif data_text is not None:
+                # Optional control message from client to end recording
+                if data_text.lower() == "done":
+                    break
+            elif message.get("type") == "websocket.disconnect":
+                break
+    except WebSocketDisconnect:
+        # Client disconnected; finalize file
+        pass
+    except Exception as exc:
+        # Best-effort notify client of error, then close
         try:
-            while True:
-                message = await websocket.receive()
-                data_bytes = message.get("bytes")
-                data_text = message.get("text")
-
-                if data_bytes is not None:
-                    f.write(data_bytes)
-                    f.flush()
-                elif data_text is not None:
-                    # Optional control message from client to end recording
-                    if data_text.lower() == "done":
-                        break
-        except WebSocketDisconnect:
-            # Client disconnected; finalize file
+            await websocket.send_text(f"error: {exc}")
+        except Exception:
             pass
+    finally:
+        WS_ACTIVE_CONNECTIONS.dec(endpoint="/ws/audio")
+        try:
+            await recording.close()
         except Exception as exc:
-            # Best-effort notify client of error, then close
-            try:
-                await websocket.send_text(f"error: {exc}")
-            except Exception:
-                pass
-        finally:
-            try:
-                await websocket.send_text(f"saved:{filename}")
-            except Exception:
-                pass
-            try:
-                await websocket.close()
-            except Exception:
-                pass
+            print(f"[RECORDINGS] Failed to finish {filename}: {exc}", flush=True)
+        try:
+            await websocket.send_text(f"saved:{filename}")
+        except Exception:
+            pass
+        try:
+            await websocket.close()
+        except Exception:
+            pass
 
 
 # ------------------ Day 17: WebSocket → AssemblyAI Universal Streaming Transcription ------------------
@@ -1147,12 +1635,25 @@ async def websocket_transcribe(websocket: WebSocket):
       - "final:<text>"
       - "error:<message>"
     and also prints transcripts on the server console.
+
+    Day 32: Clients offering the "voiceagent.v1" subprotocol get the same
+    messages as binary frames tagged with turn ids (see services.ws_protocol).
     """
-    await websocket.accept()
+    framed = WS_SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+    await websocket.accept(subprotocol=WS_SUBPROTOCOL if framed else None)
+    encoder = MessageEncoder(framed=framed)
+
+    async def send_now(message: str) -> None:
+        encoded = encoder.encode(message)
+        if isinstance(encoded, bytes):
+            await websocket.send_bytes(encoded)
+        else:
+            await websocket.send_text(encoded)
+
     # Simulate credit exhaustion: immediately notify client and close
     if SIMULATE_CREDIT_EXHAUSTION:
         try:
-            await websocket.send_text("error:Sorry the api credit has been exhausted")
+            await send_now("error:Sorry the api credit has been exhausted")
         except Exception:
             pass
         try:
@@ -1166,10 +1667,15 @@ async def websocket_transcribe(websocket: WebSocket):
         session_id = websocket.query_params.get("session")  # type: ignore[attr-defined]
     except Exception:
         session_id = None
+    await session_store.ensure(session_id)
+    # Day 31: Clients opt into binary audio frames with ?audio=binary (always on when framed)
+    binary_audio = framed or websocket.query_params.get("audio", "").lower() == "binary"
+    # Day 40: Upstream calls of this connection are interactive and shared fairly per session
+    set_egress_context(session_id, PRIORITY_INTERACTIVE)
 
     assemblyai_api_key = get_user_config(session_id, "ASSEMBLYAI_API_KEY")
     if not assemblyai_api_key:
-        await websocket.send_text("error:AssemblyAI API key not configured")
+        await send_now("error:AssemblyAI API key not configured")
         await websocket.close()
         return
 
@@ -1187,31 +1693,94 @@ async def websocket_transcribe(websocket: WebSocket):
             TurnEvent,
         )
     except ImportError as e:
-        await websocket.send_text(f"error:Universal Streaming API not available: {e}")
+        await send_now(f"error:Universal Streaming API not available: {e}")
         await websocket.close()
         return
 
+    # Day 39: Each streaming session holds a ws_transcribe slot until it closes
+    try:
+        admission_token = await admission.acquire("ws_transcribe")
+    except AdmissionRejected as exc:
+        print(f"[ADMISSION] Rejected /ws/transcribe: {exc}", flush=True)
+        await send_now(f"error:{exc}")
+        # 1013: try again later
+        await websocket.close(code=1013, reason=f"retry-after={exc.retry_after}")
+        return
+
+    # Day 30: Everything for this connection runs as tasks on the server loop.
+    # The AssemblyAI SDK thread only hands events to stt_events; client messages
+    # are queued on outbox and written by a single writer task, in order.
     loop = asyncio.get_running_loop()
+    stt_events: "asyncio.Queue[tuple]" = asyncio.Queue()
+    outbox: "asyncio.Queue[Optional[tuple]]" = asyncio.Queue()
     # Track latest transcripts and whether LLM streaming has started
     last_final_transcript: Dict[str, Optional[str]] = {"value": None}
     last_seen_transcript: Dict[str, Optional[str]] = {"value": None}
     llm_started: Dict[str, bool] = {"value": False}
-
-    def send_text_threadsafe(message: str) -> None:
+    turn_task: Dict[str, Optional[asyncio.Task]] = {"value": None}
+    turn_counter: Dict[str, int] = {"value": 0}
+    # Start time of each reply, for first-audio / complete latency
+    turn_started_at: Dict[int, float] = {}
+    first_audio_seen: set = set()
+    # Turns that produced assistant text (the others get the spoken fallback)
+    answered_turns: set = set()
+    # Day 41: Root span of each running turn, and when the current utterance began
+    turn_spans: Dict[int, object] = {}
+    utterance_started: Dict[str, Optional[float]] = {"value": None}
+
+    def send_client(message, turn_id: int = 0) -> None:
+        outbox.put_nowait((turn_id, message))
+
+    def post_stt_event(*event) -> None:
+        # Called from the SDK's reader thread
         try:
-            asyncio.run_coroutine_threadsafe(websocket.send_text(message), loop)
-        except Exception:
-            pass
+            loop.call_soon_threadsafe(stt_events.put_nowait, event)
+        except RuntimeError:
+            pass  # Loop already closed
+
+    async def client_writer() -> None:
+        while True:
+            item = await outbox.get()
+            if item is None:
+                break
+            turn_id, message = item
+            started = turn_started_at.get(turn_id)
+            if started is not None:
+                if turn_id not in first_audio_seen and (
+                    isinstance(message, bytes) or message.startswith("audio_chunk:")
+                ):
+                    first_audio_seen.add(turn_id)
+                    VOICE_TURN_SECONDS.observe(time.perf_counter() - started, stage="first_audio")
+                    turn_spans.get(turn_id, NOOP_SPAN).event("client.first_audio")
+                elif isinstance(message, str) and message.startswith("audio_complete:"):
+                    VOICE_TURN_SECONDS.observe(time.perf_counter() - started, stage="complete")
+                    turn_spans.get(turn_id, NOOP_SPAN).event("client.audio_complete")
+                    turn_started_at.pop(turn_id, None)
+            try:
+                message = encoder.encode(message, turn_id)
+                if isinstance(message, bytes):
+                    await websocket.send_bytes(message)
+                else:
+                    await websocket.send_text(message)
+                WS_FRAMES.inc(endpoint="/ws/transcribe", direction="out")
+                WS_BYTES.inc(len(message), endpoint="/ws/transcribe", direction="out")
+            except Exception:
+                break  # Client went away; remaining messages are dropped
+
+    writer_task = asyncio.create_task(client_writer())
 
     # Initialize the Universal Streaming client
     try:
         client = StreamingClient(
-            options=StreamingClientOptions(api_key=assemblyai_api_key)
+            options=StreamingClientOptions(api_key=assemblyai_api_key, api_host=ASSEMBLYAI_STREAMING_HOST)
         )
         print("[AAI] Universal Streaming client created")
-        send_text_threadsafe("partial:Connected to AssemblyAI Universal Streaming")
+        send_client("partial:Connected to AssemblyAI Universal Streaming")
     except Exception as exc:
-        await websocket.send_text(f"error:streaming_client_init_failed:{exc}")
+        send_client(f"error:streaming_client_init_failed:{exc}")
+        outbox.put_nowait(None)
+        await writer_task
+        admission.release("ws_transcribe", admission_token)
         await websocket.close()
         return
 
@@ -1220,16 +1789,26 @@ async def websocket_transcribe(websocket: WebSocket):
         # Handle partial transcripts (real-time updates)
         transcript = getattr(event, "transcript", None)
         if transcript:
-            print(f"[AAI][partial] {transcript}", flush=True)
-            send_text_threadsafe(f"partial:{transcript}")
+            post_stt_event("partial", transcript, False)
+
+    def on_turn(_client, event: TurnEvent):
+        transcript = getattr(event, "transcript", None)
+        if transcript:
+            post_stt_event("turn", transcript, getattr(event, "end_of_turn", True))
+
+    async def run_turn(prompt_text: str, turn_id: int) -> None:
+        def send_turn(message) -> None:
+            if isinstance(message, str) and message.startswith("assistant_text:"):
+                answered_turns.add(turn_id)
+            send_client(message, turn_id)
 
-    def stream_gemini_response(prompt_text: str, client_websocket=None) -> None:
         if not gemini_api_key:
             print("[LLM] GEMINI_API_KEY not configured; skipping streaming.", flush=True)
             return
 
-        # Day 24: Get persona and build system message
-        persona_id = SESSION_PERSONAS.get(session_id, "robot") if session_id else "robot"
+        # Day 24: Get persona and build system message (revalidated off the loop each turn)
+        await session_store.ensure(session_id)
+        persona_id = session_store.get_persona(session_id)
         persona = PERSONAS.get(persona_id, PERSONAS["robot"])
         system_prompt = persona["system_prompt"]
         
@@ -1245,7 +1824,7 @@ async def websocket_transcribe(websocket: WebSocket):
         # Add a model response acknowledging the role
         contents.append({
             "role": "model", 
-            "parts": [{"text": f"I understand! I am {persona['name']} and I'm ready to help you in character. How may I assist you today?"}]
+            "parts": [{"text": persona_greeting(persona)}]
         })
         
         # Add current user message
@@ -1254,14 +1833,50 @@ async def websocket_transcribe(websocket: WebSocket):
             "parts": [{"text": prompt_text}]
         })
 
+        # Day 28: Pipelined mode - stream tokens (including tool-enabled turns) into Murf as sentences complete
+        if STREAM_TTS_PIPELINE:
+            def on_text_complete(full_text: str) -> None:
+                print(f"[LLM][full] {full_text}", flush=True)
+                send_turn(f"assistant_text:{full_text}")
+                try:
+                    if session_id:
+                        session_store.append_turn(session_id, last_final_transcript.get("value") or prompt_text, full_text)
+                except Exception as hist_exc:
+                    print(f"[HISTORY] Failed to persist pipelined messages: {hist_exc}", flush=True)
+
+            try:
+                tracer.current_span().set(mode="pipelined")
+                print(f"[LLM] Pipelined streaming with function calling → model={gemini_model}", flush=True)
+                fcs = FunctionCallingService()
+                fcs.set_tavily_api_key_override(get_user_config(session_id, "TAVILY_API_KEY"))
+                function_calls_made: List[Dict[str, object]] = []
+                pipelined_text = await stream_llm_to_murf_pipelined(
+                    fcs.stream_gemini_with_functions(
+                        contents, gemini_api_key, gemini_model,
+                        max_function_calls=2, function_calls_made=function_calls_made,
+                    ),
+                    send_turn,
+                    session_id=session_id,
+                    on_text_complete=on_text_complete,
+                    binary_audio=binary_audio,
+                    turn_id=turn_id,
+                )
+                for call in function_calls_made:
+                    print(f"[LLM] Function call: {call.get('function_name', 'unknown')} - Success: {call.get('success', False)}", flush=True)
+                if pipelined_text:
+                    return
+                print("[LLM] Pipelined stream produced no text; falling back", flush=True)
+            except Exception as pipe_exc:
+                print(f"[LLM] Pipelined streaming failed: {pipe_exc}; falling back", flush=True)
+
         # Day 25: Try function calling first for better results
         try:
             print("[LLM] Attempting function calling for streaming response", flush=True)
             fcs = FunctionCallingService()
             fcs.set_tavily_api_key_override(get_user_config(session_id, "TAVILY_API_KEY"))
-            function_result = fcs.call_gemini_with_functions(
-                contents, gemini_api_key, gemini_model, max_function_calls=2
-            )
+            tracer.current_span().set(mode="function_calling")
+            with tracer.span("llm.function_calling", model=gemini_model):
+                function_result = await fcs.call_gemini_with_functions(contents, gemini_api_key, gemini_model, max_function_calls=2)
             
             if function_result.get("success") and function_result.get("response"):
                 full_text = function_result.get("response", "")
@@ -1275,26 +1890,18 @@ async def websocket_transcribe(websocket: WebSocket):
                             print(f"[LLM] Web search performed: {call.get('parameters', {}).get('query', 'unknown query')}")
                 
                 # Send the complete response
-                send_text_threadsafe(f"assistant_text:{full_text}")
+                send_turn(f"assistant_text:{full_text}")
                 
                 # Persist to chat history
                 try:
                     if session_id:
-                        history = CHAT_SESSIONS.get(session_id, [])
-                        updated_history = history + [
-                            {"role": "user", "text": last_final_transcript.get("value") or prompt_text},
-                            {"role": "model", "text": full_text},
-                        ]
-                        CHAT_SESSIONS[session_id] = updated_history
+                        session_store.append_turn(session_id, last_final_transcript.get("value") or prompt_text, full_text)
                 except Exception as hist_exc:
                     print(f"[HISTORY] Failed to persist function calling messages: {hist_exc}", flush=True)
                 
                 # Send to TTS
                 try:
-                    tts_loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(tts_loop)
-                    tts_loop.run_until_complete(stream_text_to_murf_websocket(full_text, client_websocket, client_loop=loop, session_id=session_id))
-                    tts_loop.close()
+                    await stream_text_to_murf_websocket(full_text, send_turn, session_id=session_id, binary_audio=binary_audio, turn_id=turn_id)
                 except Exception as murf_error:
                     print(f"[MURF] Failed to send function calling response to Murf WebSocket: {murf_error}", flush=True)
                 return
@@ -1304,198 +1911,193 @@ async def websocket_transcribe(websocket: WebSocket):
         except Exception as func_exc:
             print(f"[LLM] Function calling failed with exception: {func_exc}, falling back to streaming", flush=True)
 
-        endpoint = (
-            f"https://generativelanguage.googleapis.com/v1beta/models/{gemini_model}:streamGenerateContent"
-        )
+        endpoint = gemini_url(gemini_model, "streamGenerateContent")
         payload = {"contents": contents}
 
         try:
+            tracer.current_span().set(mode="streaming")
             print(f"[LLM] Streaming POST → model={gemini_model}", flush=True)
-            with requests.post(
+            stream_started = time.perf_counter()
+            async with egress.stream(
+                "gemini",
+                gemini_api_key,
+                "POST",
                 endpoint,
                 json=payload,
                 headers={
                     "Content-Type": "application/json",
                     "x-goog-api-key": gemini_api_key,
                     "Accept": "text/event-stream",
-                    "Connection": "keep-alive",
                 },
-                stream=True,
                 timeout=300,
             ) as response:
                 response.raise_for_status()
                 print(f"[LLM] Streaming response status {response.status_code}", flush=True)
                 accumulated_chunks: List[str] = []
                 had_chunk = False
-                debug_count = 0
-                for raw_line in response.iter_lines(decode_unicode=True):
-                    if not raw_line:
-                        continue
-                    line = raw_line.strip()
-                    if not line:
-                        continue
-                    if debug_count < 5:
-                        print(f"[LLM][raw] {line}", flush=True)
-                        debug_count += 1
-                    # Some servers may prefix with 'data:' like SSE
-                    if line.startswith("data:"):
-                        line = line[5:].strip()
-                        if not line:
-                            continue
-                    try:
-                        item = json.loads(line)
-                    except json.JSONDecodeError:
-                        # Some servers may send event lines that aren't JSON (e.g., comments)
-                        continue
-
-                    try:
-                        candidates = item.get("candidates", [])
-                        if candidates:
-                            content = candidates[0].get("content", {})
-                            parts = content.get("parts", [])
-                            if parts and isinstance(parts[0], dict):
-                                chunk_text = parts[0].get("text", "")
-                                if chunk_text:
-                                    accumulated_chunks.append(chunk_text)
-                                    print(f"[LLM][chunk] {chunk_text}", flush=True)
-                                    had_chunk = True
-                            finish_reason = candidates[0].get("finishReason") or candidates[0].get("finish_reason")
-                            if finish_reason:
-                                print(f"[LLM][finish] {finish_reason}", flush=True)
-                    except Exception:
-                        # Ignore malformed interim items
-                        pass
-
-                full_text = "".join(accumulated_chunks)
-                if full_text:
-                    print(f"[LLM][full] {full_text}", flush=True)
-                    # Day 21: Send complete LLM response to Murf WebSocket with client WebSocket
-                    print("[MURF] Sending LLM response to Murf WebSocket for TTS conversion...", flush=True)
-                    # Day 23: Immediately notify client with assistant text
-                    try:
-                        send_text_threadsafe(f"assistant_text:{full_text}")
-                    except Exception:
-                        pass
-                    # Day 23: Persist to in-memory chat history if session_id present
-                    try:
-                        if session_id:
-                            history = CHAT_SESSIONS.get(session_id, [])
-                            updated_history = history + [
-                                {"role": "user", "text": last_final_transcript.get("value") or prompt_text},
-                                {"role": "model", "text": full_text},
-                            ]
-                            CHAT_SESSIONS[session_id] = updated_history
-                    except Exception as hist_exc:
-                        print(f"[HISTORY] Failed to persist streaming messages: {hist_exc}", flush=True)
-                    try:
-                        # Run Murf websocket in a separate event loop since we're in a thread
-                        tts_loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(tts_loop)
-                        tts_loop.run_until_complete(stream_text_to_murf_websocket(full_text, client_websocket, client_loop=loop, session_id=session_id))
-                        tts_loop.close()
-                    except Exception as murf_error:
-                        print(f"[MURF] Failed to send to Murf WebSocket: {murf_error}", flush=True)
-                elif not had_chunk:
-                    # Fallback: call non-streaming generateContent once
-                    try:
-                        fallback_endpoint = (
-                            f"https://generativelanguage.googleapis.com/v1beta/models/{gemini_model}:generateContent"
-                        )
-                        fallback_payload = {
-                            "contents": [
-                                {
-                                    "role": "user",
-                                    "parts": [
-                                        {"text": prompt_text}
-                                    ]
-                                }
-                            ]
-                        }
-                        print("[LLM] No stream chunks; trying non-streaming fallback", flush=True)
-                        r = requests.post(
+                # Day 33: Decode the body incrementally (JSON array or SSE) so each
+                # response object is handled as soon as its bytes arrive
+                async for item in iter_gemini_stream(response):
+                    chunk_text = candidate_text(item)
+                    if chunk_text:
+                        if not had_chunk:
+                            LLM_TIME_TO_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - stream_started, mode="stream")
+                        accumulated_chunks.append(chunk_text)
+                        print(f"[LLM][chunk] {chunk_text}", flush=True)
+                        had_chunk = True
+                    reason = finish_reason(item)
+                    if reason:
+                        print(f"[LLM][finish] {reason}", flush=True)
+            LLM_GENERATION_SECONDS.observe(time.perf_counter() - stream_started, mode="stream")
+
+            full_text = "".join(accumulated_chunks)
+            if full_text:
+                print(f"[LLM][full] {full_text}", flush=True)
+                # Day 21: Send complete LLM response to Murf WebSocket with client WebSocket
+                print("[MURF] Sending LLM response to Murf WebSocket for TTS conversion...", flush=True)
+                # Day 23: Immediately notify client with assistant text
+                send_turn(f"assistant_text:{full_text}")
+                # Day 23: Persist to in-memory chat history if session_id present
+                try:
+                    if session_id:
+                        session_store.append_turn(session_id, last_final_transcript.get("value") or prompt_text, full_text)
+                except Exception as hist_exc:
+                    print(f"[HISTORY] Failed to persist streaming messages: {hist_exc}", flush=True)
+                try:
+                    await stream_text_to_murf_websocket(full_text, send_turn, session_id=session_id, binary_audio=binary_audio, turn_id=turn_id)
+                except Exception as murf_error:
+                    print(f"[MURF] Failed to send to Murf WebSocket: {murf_error}", flush=True)
+            elif not had_chunk:
+                # Fallback: call non-streaming generateContent once
+                try:
+                    fallback_endpoint = gemini_url(gemini_model)
+                    fallback_body = {
+                        "contents": [
+                            {
+                                "role": "user",
+                                "parts": [
+                                    {"text": prompt_text}
+                                ]
+                            }
+                        ]
+                    }
+                    print("[LLM] No stream chunks; trying non-streaming fallback", flush=True)
+                    with LLM_GENERATION_SECONDS.time(mode="blocking"):
+                        r = await egress.request(
+                            "gemini",
+                            gemini_api_key,
+                            "POST",
                             fallback_endpoint,
-                            json=fallback_payload,
+                            json=fallback_body,
                             headers={
                                 "Content-Type": "application/json",
                                 "x-goog-api-key": gemini_api_key,
                             },
                             timeout=60,
                         )
-                        r.raise_for_status()
-                        data = r.json()
-                        print(f"[LLM][fallback_raw] {json.dumps(data)[:300]}...", flush=True)
-                        candidates = data.get("candidates", [])
-                        if candidates:
-                            content = candidates[0].get("content", {})
-                            parts = content.get("parts", [])
-                            if parts and isinstance(parts[0], dict):
-                                text = parts[0].get("text", "")
-                                if text:
-                                    print(f"[LLM][full-fallback] {text}", flush=True)
-                                    # Day 23: Immediately notify client with assistant text (fallback)
-                                    try:
-                                        send_text_threadsafe(f"assistant_text:{text}")
-                                    except Exception:
-                                        pass
-                                    # Day 23: Persist fallback full text as well
-                                    try:
-                                        if session_id:
-                                            history = CHAT_SESSIONS.get(session_id, [])
-                                            updated_history = history + [
-                                                {"role": "user", "text": last_final_transcript.get("value") or prompt_text},
-                                                {"role": "model", "text": text},
-                                            ]
-                                            CHAT_SESSIONS[session_id] = updated_history
-                                    except Exception as hist_exc:
-                                        print(f"[HISTORY] Failed to persist fallback messages: {hist_exc}", flush=True)
-                                    # Day 21: Send fallback response to Murf WebSocket with client WebSocket
-                                    try:
-                                        tts_loop = asyncio.new_event_loop()
-                                        asyncio.set_event_loop(tts_loop)
-                                        tts_loop.run_until_complete(stream_text_to_murf_websocket(text, client_websocket, client_loop=loop, session_id=session_id))
-                                        tts_loop.close()
-                                    except Exception as murf_error:
-                                        print(f"[MURF] Failed to send fallback to Murf WebSocket: {murf_error}", flush=True)
-                    except Exception as e:
-                        print(f"[LLM] Fallback failed: {e}", flush=True)
-        except requests.RequestException as exc:
+                    r.raise_for_status()
+                    data = r.json()
+                    print(f"[LLM][fallback_raw] {json.dumps(data)[:300]}...", flush=True)
+                    candidates = data.get("candidates", [])
+                    if candidates:
+                        content = candidates[0].get("content", {})
+                        parts = content.get("parts", [])
+                        if parts and isinstance(parts[0], dict):
+                            text = parts[0].get("text", "")
+                            if text:
+                                print(f"[LLM][full-fallback] {text}", flush=True)
+                                # Day 23: Immediately notify client with assistant text (fallback)
+                                send_turn(f"assistant_text:{text}")
+                                # Day 23: Persist fallback full text as well
+                                try:
+                                    if session_id:
+                                        session_store.append_turn(session_id, last_final_transcript.get("value") or prompt_text, text)
+                                except Exception as hist_exc:
+                                    print(f"[HISTORY] Failed to persist fallback messages: {hist_exc}", flush=True)
+                                # Day 21: Send fallback response to Murf WebSocket with client WebSocket
+                                try:
+                                    await stream_text_to_murf_websocket(text, send_turn, session_id=session_id, binary_audio=binary_audio, turn_id=turn_id)
+                                except Exception as murf_error:
+                                    print(f"[MURF] Failed to send fallback to Murf WebSocket: {murf_error}", flush=True)
+                except Exception as e:
+                    print(f"[LLM] Fallback failed: {e}", flush=True)
+        except httpx.HTTPError as exc:
             print(f"[LLM] Streaming request failed: {exc}", flush=True)
-    def on_turn(_client, event: TurnEvent):
-        transcript = getattr(event, "transcript", None)
-        is_end = getattr(event, "end_of_turn", True)
-        if transcript:
+
+    async def run_turn_with_fallback(prompt_text: str, turn_id: int, stt_started: Optional[float] = None) -> None:
+        """Day 35: Speak FALLBACK_TEXT (pre-synthesized, so usually from the cache) if a turn produced no reply.
+
+        Day 41: Each turn is one trace; the utterance that led to it is recorded as its stt span.
+        """
+        with tracer.trace("voice_turn", session=key_fingerprint(session_id), turn_id=turn_id, model=gemini_model) as turn_span:
+            turn_spans[turn_id] = turn_span
+            if stt_started is not None:
+                tracer.record_span(
+                    "stt.utterance", stt_started, turn_started_at.get(turn_id, time.perf_counter()),
+                    lane="assemblyai-stream", chars=len(prompt_text),
+                )
             try:
-                print(f"[AAI][turn] is_end={is_end} llm_started={llm_started['value']} len={len(transcript)}", flush=True)
-            except Exception:
-                pass
+                await run_turn(prompt_text, turn_id)
+                if turn_id in answered_turns:
+                    answered_turns.discard(turn_id)
+                    return
+                print("[LLM] No reply produced; speaking fallback", flush=True)
+                turn_span.set(fallback=True)
+
+                def send_turn(message) -> None:
+                    send_client(message, turn_id)
+
+                send_turn(f"assistant_text:{FALLBACK_TEXT}")
+                try:
+                    await stream_text_to_murf_websocket(FALLBACK_TEXT, send_turn, session_id=session_id, binary_audio=binary_audio, turn_id=turn_id)
+                except Exception as murf_error:
+                    print(f"[MURF] Failed to speak fallback: {murf_error}", flush=True)
+            finally:
+                turn_spans.pop(turn_id, None)
+
+    def start_turn(prompt_text: str, reason: str) -> None:
+        """Start the LLM → TTS task for a user turn.
+
+        Legacy clients get one reply per connection. Framed clients can keep the
+        socket open across turns; a new turn starts once the previous reply is done.
+        """
+        current = turn_task["value"]
+        if llm_started["value"] and not (framed and current is not None and current.done()):
+            print(f"[LLM] Streaming already started; skipping duplicate trigger ({reason})", flush=True)
+            return
+        llm_started["value"] = True
+        print(f"[LLM] Starting streaming due to {reason} (model={gemini_model}, has_key={bool(gemini_api_key)})", flush=True)
+        turn_counter["value"] += 1
+        turn_started_at[turn_counter["value"]] = time.perf_counter()
+        stt_started, utterance_started["value"] = utterance_started["value"], None
+        turn_task["value"] = asyncio.create_task(
+            run_turn_with_fallback(prompt_text, turn_counter["value"], stt_started), name=f"turn-{turn_counter['value']}"
+        )
+
+    async def handle_stt_events() -> None:
+        while True:
+            kind, transcript, is_end = await stt_events.get()
+            if utterance_started["value"] is None:
+                utterance_started["value"] = time.perf_counter()
+            # Transcript messages carry the id of the turn they are about to start
+            user_turn = turn_counter["value"] + 1
+            if kind == "partial":
+                print(f"[AAI][partial] {transcript}", flush=True)
+                send_client(f"partial:{transcript}", user_turn)
+                continue
+            print(f"[AAI][turn] is_end={is_end} llm_started={llm_started['value']} len={len(transcript)}", flush=True)
             last_seen_transcript["value"] = transcript
             last_final_transcript["value"] = transcript
             print(f"[AAI][final] {transcript}")
-            send_text_threadsafe(f"final:{transcript}")
+            send_client(f"final:{transcript}", user_turn)
             # Day 18: Explicitly notify client of end of user turn with transcript
             if is_end:
-                send_text_threadsafe(f"turn_end:{transcript}")
+                send_client(f"turn_end:{transcript}", user_turn)
                 # Day 19: Trigger Gemini streaming using the final transcript
-                if not llm_started["value"]:
-                    llm_started["value"] = True
-                    print(f"[LLM] Starting streaming due to end-of-turn (model={gemini_model}, has_key={bool(gemini_api_key)})", flush=True)
-                    try:
-                        threading.Thread(target=stream_gemini_response, args=(transcript, websocket), daemon=True).start()
-                    except Exception as exc:
-                        print(f"[LLM] Failed to start streaming thread: {exc}", flush=True)
-                else:
-                    print("[LLM] Streaming already started; skipping duplicate trigger (end-of-turn)", flush=True)
-            else:
+                start_turn(transcript, "end-of-turn")
+            elif not framed:
                 # If no explicit end-of-turn arrives, start once on first transcript
-                if not llm_started["value"]:
-                    llm_started["value"] = True
-                    print(f"[LLM] Starting streaming on first transcript (no turn_end yet) (model={gemini_model}, has_key={bool(gemini_api_key)})", flush=True)
-                    try:
-                        threading.Thread(target=stream_gemini_response, args=(transcript, websocket), daemon=True).start()
-                    except Exception as exc:
-                        print(f"[LLM] Failed to start streaming thread: {exc}", flush=True)
-                else:
-                    print("[LLM] Streaming already started; skipping duplicate trigger (interim)", flush=True)
+                start_turn(transcript, "first transcript (no turn_end yet)")
 
     # Register event handlers
     client.on(StreamingEvents.Turn, on_turn)
@@ -1507,25 +2109,37 @@ async def websocket_transcribe(websocket: WebSocket):
     except (ImportError, AttributeError):
         print("[AAI] Partial transcript handler not available", flush=True)
 
-    # Connect in a background thread
-    def connect_streaming():
+    # connect() blocks until the handshake completes; run it off the loop
+    async def connect_streaming() -> None:
         try:
             # Connect with Universal Streaming parameters
-            client.connect(
+            await asyncio.to_thread(
+                client.connect,
                 StreamingParameters(
                     sample_rate=16000,
                     format_turns=True,  # Enable turn events for final transcripts
                     # Add additional debugging parameters
                     enable_extra_session_information=True,
-                )
+                ),
             )
             print("[AAI] Universal Streaming connected")
         except Exception as exc:
             print(f"[AAI] Universal Streaming connect() failed: {exc}")
-            send_text_threadsafe(f"error:connect_failed:{exc}")
+            send_client(f"error:connect_failed:{exc}")
+
+    async def wait_for_disconnect() -> None:
+        try:
+            while True:
+                message = await websocket.receive()
+                if message.get("type") == "websocket.disconnect":
+                    return
+        except (RuntimeError, WebSocketDisconnect):
+            return
 
-    connect_thread = threading.Thread(target=connect_streaming, daemon=True)
-    connect_thread.start()
+    stt_task = asyncio.create_task(handle_stt_events())
+    connect_task = asyncio.create_task(connect_streaming())
+    done_received = False
+    WS_ACTIVE_CONNECTIONS.inc(endpoint="/ws/transcribe")
 
     try:
         bytes_total: int = 0
@@ -1535,53 +2149,72 @@ async def websocket_transcribe(websocket: WebSocket):
                 message = await websocket.receive()
             except RuntimeError:
                 break  # Socket already disconnected
-
-            data_bytes = message.get("bytes")
-            data_text = message.get("text")
-
-            if data_bytes is not None:
-                # Forward raw PCM16LE 16k mono audio bytes to Universal Streaming
+            if message.get("type") == "websocket.disconnect":
+                break
+
+            data = message.get("bytes")
+            if data is None:
+                data = message.get("text")
+            if data is None:
+                continue
+            WS_FRAMES.inc(endpoint="/ws/transcribe", direction="in")
+            WS_BYTES.inc(len(data), endpoint="/ws/transcribe", direction="in")
+            kind, audio_bytes = decode_client_message(data, framed)
+
+            if kind == "audio":
+                # Forward raw PCM16LE 16k mono audio bytes to Universal Streaming (non-blocking enqueue)
                 try:
-                    client.stream(data_bytes)
-                    bytes_total += len(data_bytes)
+                    client.stream(audio_bytes)
+                    bytes_total += len(audio_bytes)
                     frames_total += 1
                     if frames_total % 50 == 0:
                         print(f"[WS] forwarded frames={frames_total} bytes={bytes_total}", flush=True)
                 except Exception as exc:
                     print(f"[AAI] stream() error: {exc}")
-            elif data_text is not None:
-                if data_text.lower() == "done":
-                    print("[WS] Received 'done' from client", flush=True)
-                    print(f"[WS] totals frames={frames_total} bytes={bytes_total}", flush=True)
-                    # If client ends before we saw an explicit end-of-turn, fallback to last final transcript
-                    if not llm_started["value"]:
-                        # Prefer final transcript, else fall back to last seen partial transcript
-                        fallback_text = last_final_transcript["value"] or last_seen_transcript["value"]
-                        if fallback_text:
-                            llm_started["value"] = True
-                            print("[LLM] Starting streaming due to client 'done'", flush=True)
-                            try:
-                                threading.Thread(target=stream_gemini_response, args=(fallback_text, websocket), daemon=True).start()
-                            except Exception as exc:
-                                print(f"[LLM] Failed to start streaming thread: {exc}", flush=True)
-                        else:
-                            print("[DEBUG] No transcript received from AssemblyAI - trying test prompt", flush=True)
-                            # Force trigger with test text to verify LLM streaming works
-                            llm_started["value"] = True
-                            try:
-                                # Use a more interesting test prompt
-                                test_prompt = "Explain what streaming LLM responses are in one sentence."
-                                threading.Thread(target=stream_gemini_response, args=(test_prompt, websocket), daemon=True).start()
-                            except Exception as exc:
-                                print(f"[LLM] Failed to start streaming thread: {exc}", flush=True)
-                    break
+            elif kind == "done":
+                print("[WS] Received 'done' from client", flush=True)
+                print(f"[WS] totals frames={frames_total} bytes={bytes_total}", flush=True)
+                done_received = True
+                # If client ends before we saw an explicit end-of-turn, fallback to last final transcript
+                if not llm_started["value"]:
+                    # Prefer final transcript, else fall back to last seen partial transcript
+                    fallback_text = last_final_transcript["value"] or last_seen_transcript["value"]
+                    if fallback_text:
+                        start_turn(fallback_text, "client 'done'")
+                    else:
+                        print("[DEBUG] No transcript received from AssemblyAI - trying test prompt", flush=True)
+                        # Force trigger with test text to verify LLM streaming works
+                        # Use a more interesting test prompt
+                        start_turn("Explain what streaming LLM responses are in one sentence.", "test prompt")
+                break
+
+        # After 'done', keep the socket open until the reply has been streamed,
+        # unless the client disconnects first
+        turn = turn_task["value"]
+        if done_received and turn is not None and not turn.done():
+            disconnect_watch = asyncio.create_task(wait_for_disconnect())
+            await asyncio.wait({turn, disconnect_watch}, return_when=asyncio.FIRST_COMPLETED)
+            disconnect_watch.cancel()
     except WebSocketDisconnect:
         pass
     finally:
+        admission.release("ws_transcribe", admission_token)
+        WS_ACTIVE_CONNECTIONS.dec(endpoint="/ws/transcribe")
+        turn = turn_task["value"]
+        if turn is not None and not turn.done():
+            print("[WS] Client disconnected; cancelling in-flight turn", flush=True)
+            turn.cancel()
+        stt_task.cancel()
+        outbox.put_nowait(None)
+        try:
+            await asyncio.wait_for(writer_task, timeout=5)
+        except (asyncio.TimeoutError, Exception):
+            writer_task.cancel()
         try:
             # Disconnect from Universal Streaming
             try:
-                client.disconnect(terminate=True)
+                await connect_task
+                await asyncio.to_thread(client.disconnect, terminate=True)
                 print("[AAI] Universal Streaming disconnected")
             except Exception:
                 pass
@@ -0,0 +1,178 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from .metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_SECONDS, ADMISSION_REJECTED
+
+
+ADMISSION_ENABLED = str(os.getenv("ADMISSION_ENABLED", "true")).lower() in {"1", "true", "yes", "on"}
+ADMISSION_MAX_RETRY_AFTER = int(os.getenv("ADMISSION_MAX_RETRY_AFTER", "30"))
+
+# Default (concurrency, queue depth, queue timeout seconds) per gate. Override
+# one value with e.g. ADMISSION_AGENT_CHAT_CONCURRENCY=8 or ADMISSION_LLM_QUERY_QUEUE_TIMEOUT=2
+DEFAULT_GATES: Dict[str, Tuple[int, int, float]] = {
+    "agent_chat": (16, 32, 5.0),
+    "llm_query": (32, 64, 5.0),
+    "ws_transcribe": (50, 10, 3.0),
+}
+
+# Rejection reasons (status codes follow the usual meaning: 429 shed at once, 503 gave up waiting)
+REASON_QUEUE_FULL = "queue_full"
+REASON_QUEUE_TIMEOUT = "queue_timeout"
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; carries the HTTP status and Retry-After seconds."""
+
+    def __init__(self, gate: str, reason: str, retry_after: int):
+        self.gate = gate
+        self.reason = reason
+        self.retry_after = retry_after
+        self.status_code = 429 if reason == REASON_QUEUE_FULL else 503
+        super().__init__(f"Server busy ({gate}: {reason.replace('_', ' ')}), retry in {retry_after}s")
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(self.retry_after)}
+
+
+class AdmissionGate:
+    """Concurrency limit with a bounded FIFO wait queue.
+
+    - Up to max_concurrent holders at once
+    - Up to max_queue waiters; more are rejected immediately (429)
+    - A waiter not admitted within queue_timeout seconds is rejected (503)
+    - Retry-After is estimated from the average time a slot is held
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = max(0.0, queue_timeout)
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._hold_avg = max(self.queue_timeout, 1.0)
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    def retry_after(self) -> int:
+        backlog = (len(self._waiters) + 1) / self.max_concurrent
+        return max(1, min(ADMISSION_MAX_RETRY_AFTER, math.ceil(self._hold_avg * backlog)))
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        if reason == REASON_QUEUE_FULL:
+            self.rejected_queue_full += 1
+        else:
+            self.rejected_timeout += 1
+        ADMISSION_REJECTED.inc(gate=self.name, reason=reason)
+        return AdmissionRejected(self.name, reason, self.retry_after())
+
+    def _admit(self) -> float:
+        self.active += 1
+        self.admitted += 1
+        ADMISSION_IN_FLIGHT.inc(gate=self.name)
+        return time.monotonic()
+
+    async def acquire(self) -> float:
+        """Wait for a slot. Returns the admission time (pass it to release())."""
+        if self.active < self.max_concurrent and not self._waiters:
+            ADMISSION_QUEUE_SECONDS.observe(0.0, gate=self.name)
+            return self._admit()
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject(REASON_QUEUE_FULL)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                self._waiters.remove(waiter)
+                waiter.cancel()
+                raise self._reject(REASON_QUEUE_TIMEOUT)
+            # Admitted just as the deadline passed: keep the slot
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed to us; pass it on
+                self._release_slot()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+        ADMISSION_QUEUE_SECONDS.observe(time.monotonic() - started, gate=self.name)
+        self.admitted += 1
+        return time.monotonic()
+
+    def release(self, admitted_at: Optional[float] = None) -> None:
+        if admitted_at is not None:
+            held = time.monotonic() - admitted_at
+            self._hold_avg += 0.1 * (held - self._hold_avg)
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        # Hand the slot straight to the oldest live waiter, so queued requests are not overtaken
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+        ADMISSION_IN_FLIGHT.dec(gate=self.name)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "queue_timeout_seconds": self.queue_timeout,
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "avg_hold_seconds": round(self._hold_avg, 3),
+            "retry_after_seconds": self.retry_after(),
+        }
+
+
+def _gate_setting(name: str, key: str, default):
+    value = os.getenv(f"ADMISSION_{name.upper()}_{key}")
+    return type(default)(value) if value else default
+
+
+class AdmissionController:
+    """Named admission gates for the expensive voice endpoints."""
+
+    def __init__(self, gates: Dict[str, Tuple[int, int, float]] = DEFAULT_GATES, enabled: bool = ADMISSION_ENABLED):
+        self.enabled = enabled
+        self.gates: Dict[str, AdmissionGate] = {
+            name: AdmissionGate(
+                name,
+                _gate_setting(name, "CONCURRENCY", concurrency),
+                _gate_setting(name, "QUEUE", queue),
+                _gate_setting(name, "QUEUE_TIMEOUT", timeout),
+            )
+            for name, (concurrency, queue, timeout) in gates.items()
+        }
+
+    async def acquire(self, name: str) -> Optional[float]:
+        """Take a slot on gate `name`; raises AdmissionRejected when shed. Returns a token for release()."""
+        if not self.enabled or name not in self.gates:
+            return None
+        return await self.gates[name].acquire()
+
+    def release(self, name: str, token: Optional[float]) -> None:
+        if token is not None:
+            self.gates[name].release(token)
+
+    def stats(self) -> Dict[str, object]:
+        return {"enabled": self.enabled, "gates": {name: gate.stats() for name, gate in self.gates.items()}}
+
+
+admission = AdmissionController()
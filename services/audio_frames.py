@@ -0,0 +1,39 @@
+import struct
+from typing import Optional, Tuple
+
+
+# Binary WebSocket frame: 8-byte header followed by the payload
+#   version (u8) | frame type (u8) | turn id (u16) | sequence number (u32), big-endian
+FRAME_HEADER = struct.Struct("!BBHI")
+FRAME_VERSION = 1
+
+# Audio frame types; the type doubles as the payload format
+FRAME_AUDIO_WAV = 0x20
+FRAME_AUDIO_MP3 = 0x21
+FRAME_AUDIO_PCM = 0x22
+
+AUDIO_FRAME_TYPES = {
+    "WAV": FRAME_AUDIO_WAV,
+    "MP3": FRAME_AUDIO_MP3,
+    "PCM": FRAME_AUDIO_PCM,
+}
+
+
+def audio_frame_type(audio_format: str) -> int:
+    """Frame type for a Murf output format name (defaults to WAV)."""
+    return AUDIO_FRAME_TYPES.get(audio_format.upper(), FRAME_AUDIO_WAV)
+
+
+def encode_frame(frame_type: int, payload: bytes, seq: int = 0, turn_id: int = 0) -> bytes:
+    """Prefix payload with the frame header."""
+    return FRAME_HEADER.pack(FRAME_VERSION, frame_type, turn_id & 0xFFFF, seq & 0xFFFFFFFF) + payload
+
+
+def decode_frame(frame: bytes) -> Optional[Tuple[int, int, int, bytes]]:
+    """Split a frame into (frame_type, turn_id, seq, payload), or None if it is not a valid frame."""
+    if len(frame) < FRAME_HEADER.size:
+        return None
+    version, frame_type, turn_id, seq = FRAME_HEADER.unpack_from(frame)
+    if version != FRAME_VERSION:
+        return None
+    return frame_type, turn_id, seq, bytes(frame[FRAME_HEADER.size:])
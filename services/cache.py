@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Bounded in-process cache with per-entry TTL and LRU eviction.
+
+    - Entries expire `ttl` seconds after they were stored (overridable per entry)
+    - When full, the least recently used entry is evicted
+    - With max_bytes set, entries also count their `size` against a byte budget
+    - Hit/miss/eviction counters are kept for the stats endpoint
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0, name: str = "cache", max_bytes: int = 0):
+        self.name = name
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = float(ttl)
+        self.max_bytes = max(0, int(max_bytes))
+        # key -> (value, expires_at, size)
+        self._data: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at, size = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Like get(), but without touching LRU order or the hit/miss counters."""
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return default
+        return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, size: int = 0) -> bool:
+        """Store value under key, evicting the least recently used entries if full.
+
+        Returns False (and stores nothing) if size alone exceeds max_bytes.
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else float(ttl))
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            if self.max_bytes and size > self.max_bytes:
+                return False
+            self._data[key] = (value, expires_at, size)
+            self.bytes += size
+            while len(self._data) > self.maxsize or (self.max_bytes and self.bytes > self.max_bytes):
+                _, evicted = self._data.popitem(last=False)
+                self.bytes -= evicted[2]
+                self.evictions += 1
+        return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[2]
+        return default if entry is None else entry[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = {
+            "name": self.name,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+        if self.max_bytes:
+            stats["bytes"] = self.bytes
+            stats["max_bytes"] = self.max_bytes
+        return stats
@@ -0,0 +1,383 @@
+import asyncio
+import contextvars
+import hashlib
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+
+import httpx
+
+from .http_client import get_http_client
+from .metrics import EGRESS_IN_FLIGHT, EGRESS_QUEUE_SECONDS, EGRESS_THROTTLED
+from .tracing import tracer, NOOP_SPAN
+
+
+EGRESS_ENABLED = str(os.getenv("EGRESS_ENABLED", "true")).lower() in {"1", "true", "yes", "on"}
+# How long a request may wait for an upstream slot before failing with httpx.PoolTimeout
+EGRESS_QUEUE_TIMEOUT = float(os.getenv("EGRESS_QUEUE_TIMEOUT", "30"))
+# Smoothed latency above baseline * tolerance counts as congestion
+EGRESS_LATENCY_TOLERANCE = float(os.getenv("EGRESS_LATENCY_TOLERANCE", "2.5"))
+# Longest Retry-After honoured, and how often request() retries a call answered with 429
+EGRESS_MAX_PAUSE = float(os.getenv("EGRESS_MAX_PAUSE", "30"))
+EGRESS_THROTTLE_RETRIES = int(os.getenv("EGRESS_THROTTLE_RETRIES", "1"))
+EGRESS_MAX_LANES = int(os.getenv("EGRESS_MAX_LANES", "256"))
+
+# Default (initial, max) concurrency per upstream. Override one value with
+# e.g. EGRESS_GEMINI_INITIAL=4 or EGRESS_MURF_MAX=16
+DEFAULT_LIMITS: Dict[str, Tuple[int, int]] = {
+    "gemini": (8, 64),
+    "murf": (8, 32),
+    "assemblyai": (4, 32),
+    "tavily": (4, 16),
+}
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0  # voice turns (/ws/transcribe, /agent/chat)
+PRIORITY_TEXT = 1  # text requests such as /llm/query
+PRIORITY_BACKGROUND = 2  # pre-synthesis, catalog refreshes
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_TEXT: "text", PRIORITY_BACKGROUND: "background"}
+
+# (session id, priority) of the work running in the current task
+_egress_context: contextvars.ContextVar[Tuple[str, int]] = contextvars.ContextVar(
+    "egress_context", default=("", PRIORITY_TEXT)
+)
+
+
+def set_egress_context(session_id: Optional[str], priority: int) -> None:
+    """Attribute upstream calls made from the current task (and tasks it starts) to a session and priority."""
+    _egress_context.set((session_id or "", priority))
+
+
+def key_fingerprint(api_key: str) -> str:
+    """Short, non-reversible id of an API key or session id (lanes, stats and traces never hold raw ones)."""
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:12]
+
+
+def _retry_after_seconds(response: Optional[httpx.Response]) -> float:
+    """Retry-After in seconds (0 when absent or given as an HTTP date)."""
+    if response is None:
+        return 0.0
+    try:
+        return min(EGRESS_MAX_PAUSE, max(0.0, float(response.headers.get("retry-after", ""))))
+    except ValueError:
+        return 0.0
+
+
+class EgressLane:
+    """Outbound concurrency for one (upstream, API key) pair.
+
+    - AIMD limit: +1/limit per successful call while the lane is saturated,
+      x0.5 on a 429 and x0.9 when smoothed latency exceeds the baseline by
+      more than EGRESS_LATENCY_TOLERANCE; only calls sent after the last
+      decrease can cut again, so a burst of 429s cuts the limit once
+    - A 429 with Retry-After pauses dispatch for that long, instead of
+      letting every queued call hit the quota again
+    - Waiters are served by priority, then round-robin across sessions,
+      so one busy session cannot take every slot
+    """
+
+    def __init__(self, upstream: str, fingerprint: str, initial: int, max_limit: int):
+        self.upstream = upstream
+        self.fingerprint = fingerprint
+        self.max_limit = max(1, max_limit)
+        self.limit = float(min(max(1, initial), self.max_limit))
+        self.in_flight = 0
+        # priority -> session -> waiters
+        self._waiters: Dict[int, "OrderedDict[str, Deque[asyncio.Future]]"] = {}
+        self._waiting = 0
+        self._paused_until = 0.0
+        self._resume_handle: Optional[asyncio.TimerHandle] = None
+        self._last_decrease = -1.0
+        # Limit in use when the last 429 arrived
+        self.throttle_limit: Optional[float] = None
+        self.baseline: Optional[float] = None
+        self.latency_avg: Optional[float] = None
+        self.last_used = time.monotonic()
+        self.completed = 0
+        self.throttled = 0
+        self.errors = 0
+        self.timeouts = 0
+
+    @property
+    def idle(self) -> bool:
+        return self.in_flight == 0 and self._waiting == 0
+
+    def _can_dispatch(self) -> bool:
+        return self.in_flight < int(self.limit) and time.monotonic() >= self._paused_until
+
+    def _take(self) -> None:
+        self.in_flight += 1
+        self.last_used = time.monotonic()
+        EGRESS_IN_FLIGHT.inc(upstream=self.upstream)
+
+    async def acquire(self, session_id: str, priority: int, timeout: float) -> None:
+        if self._waiting == 0 and self._can_dispatch():
+            self._take()
+            EGRESS_QUEUE_SECONDS.observe(0.0, upstream=self.upstream, priority=PRIORITY_NAMES.get(priority, "text"))
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(priority, OrderedDict()).setdefault(session_id, deque()).append(waiter)
+        self._waiting += 1
+        self._schedule_resume()
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                self._remove(waiter, session_id, priority)
+                self.timeouts += 1
+                raise httpx.PoolTimeout(
+                    f"Timed out after {timeout:.0f}s waiting for a {self.upstream} slot "
+                    f"({self.in_flight} in flight, limit {int(self.limit)})"
+                )
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._remove(waiter, session_id, priority)
+            raise
+        EGRESS_QUEUE_SECONDS.observe(
+            time.monotonic() - started, upstream=self.upstream, priority=PRIORITY_NAMES.get(priority, "text")
+        )
+
+    def _remove(self, waiter: asyncio.Future, session_id: str, priority: int) -> None:
+        waiter.cancel()
+        sessions = self._waiters.get(priority, {})
+        queue = sessions.get(session_id)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self._waiting -= 1
+            if not queue:
+                del sessions[session_id]
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        for priority in sorted(self._waiters):
+            sessions = self._waiters[priority]
+            while sessions:
+                session_id, queue = next(iter(sessions.items()))
+                waiter = queue.popleft()
+                self._waiting -= 1
+                if queue:
+                    sessions.move_to_end(session_id)
+                else:
+                    del sessions[session_id]
+                if not waiter.done():
+                    return waiter
+            del self._waiters[priority]
+        return None
+
+    def _resume(self) -> None:
+        self._resume_handle = None
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._waiting and self._can_dispatch():
+            waiter = self._next_waiter()
+            if waiter is None:
+                break
+            self._take()
+            waiter.set_result(None)
+        self._schedule_resume()
+
+    def _schedule_resume(self) -> None:
+        # Wake the queue when a 429 pause ends
+        delay = self._paused_until - time.monotonic()
+        if self._waiting and delay > 0 and self._resume_handle is None:
+            self._resume_handle = asyncio.get_running_loop().call_later(delay, self._resume)
+
+    def release(
+        self, outcome: str = "cancelled", sent_at: float = 0.0, latency: Optional[float] = None, retry_after: float = 0.0
+    ) -> None:
+        """Return a slot and feed the outcome of the call (sent at perf_counter() sent_at) into the limit.
+
+        outcome is "ok", "throttled" (429), "error" or "cancelled"; only the first two change the limit.
+        """
+        saturated = self.in_flight >= int(self.limit)
+        self.in_flight -= 1
+        EGRESS_IN_FLIGHT.dec(upstream=self.upstream)
+        if outcome == "throttled":
+            self.throttled += 1
+            EGRESS_THROTTLED.inc(upstream=self.upstream)
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            if self._decrease(0.5, sent_at):
+                self.throttle_limit = self.limit * 2
+        elif outcome == "ok":
+            self.completed += 1
+            if latency is not None:
+                self._observe_latency(latency, saturated, sent_at)
+        elif outcome == "error":
+            self.errors += 1
+        self._dispatch()
+
+    def _observe_latency(self, latency: float, saturated: bool, sent_at: float) -> None:
+        self.baseline = latency if self.baseline is None else min(latency, self.baseline + 0.01 * (latency - self.baseline))
+        self.latency_avg = latency if self.latency_avg is None else self.latency_avg + 0.2 * (latency - self.latency_avg)
+        if self.latency_avg > self.baseline * EGRESS_LATENCY_TOLERANCE:
+            self._decrease(0.9, sent_at)
+        elif saturated:
+            # Only grow a limit that is actually being used, and probe slowly
+            # around the level that was last throttled
+            step = 1.0 / self.limit
+            if self.throttle_limit is not None and self.limit + 1 >= self.throttle_limit:
+                step *= 0.1
+            self.limit = min(float(self.max_limit), self.limit + step)
+
+    def _decrease(self, factor: float, sent_at: float) -> bool:
+        # Calls sent before the last decrease already saw the old limit
+        if sent_at < self._last_decrease:
+            return False
+        self._last_decrease = time.perf_counter()
+        self.limit = max(1.0, self.limit * factor)
+        return True
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "upstream": self.upstream,
+            "key": self.fingerprint,
+            "limit": round(self.limit, 2),
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "waiting": self._waiting,
+            "paused_seconds": round(max(0.0, self._paused_until - time.monotonic()), 2),
+            "baseline_ms": round(self.baseline * 1000, 1) if self.baseline is not None else None,
+            "latency_avg_ms": round(self.latency_avg * 1000, 1) if self.latency_avg is not None else None,
+            "completed": self.completed,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "queue_timeouts": self.timeouts,
+        }
+
+
+def _limit_setting(upstream: str, key: str, default: int) -> int:
+    value = os.getenv(f"EGRESS_{upstream.upper()}_{key}")
+    return int(value) if value else default
+
+
+class EgressSlot:
+    """`async with` a slot on one lane; the outcome of the block adjusts the lane's limit.
+
+    Call observe(response) when the response is checked outside the block.
+    """
+
+    def __init__(self, scheduler: "EgressScheduler", upstream: str, api_key: str, measure_latency: bool = True):
+        self.scheduler = scheduler
+        self.upstream = upstream
+        self.api_key = api_key
+        self.measure_latency = measure_latency
+        self.lane: Optional[EgressLane] = None
+        self.response: Optional[httpx.Response] = None
+        self.span = NOOP_SPAN
+        self._started = 0.0
+        self._latency: Optional[float] = None
+
+    def observe(self, response: httpx.Response) -> None:
+        """Record the response (status and time to headers) as the outcome of this call."""
+        self.response = response
+        if self._latency is None:
+            self._latency = time.perf_counter() - self._started
+            self.span.event("response", status=response.status_code)
+        self.span.set(status=response.status_code)
+
+    async def __aenter__(self) -> "EgressSlot":
+        # One span per upstream call, covering the wait for a slot
+        self.span = tracer.start_span(f"{self.upstream}.call")
+        if self.scheduler.enabled:
+            session_id, priority = _egress_context.get()
+            lane = self.scheduler.lane(self.upstream, self.api_key)
+            queued = time.perf_counter()
+            try:
+                await lane.acquire(session_id, priority, self.scheduler.queue_timeout)
+            except BaseException as exc:
+                self.span.finish(exc)
+                raise
+            self.lane = lane
+            self.span.set(queue_ms=round((time.perf_counter() - queued) * 1000, 1), limit=int(lane.limit))
+        self._started = time.perf_counter()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.span.finish(exc)
+        lane, self.lane = self.lane, None
+        if lane is None:
+            return
+        response = self.response
+        if isinstance(exc, httpx.HTTPStatusError):
+            response = exc.response
+        if response is not None and response.status_code == 429:
+            lane.release("throttled", self._started, retry_after=_retry_after_seconds(response))
+        elif exc is not None or (response is not None and response.status_code >= 500):
+            # Failures say nothing reliable about capacity; keep the limit
+            lane.release("error", self._started)
+        else:
+            latency = self._latency if self._latency is not None else time.perf_counter() - self._started
+            lane.release("ok", self._started, latency if self.measure_latency else None)
+
+
+class EgressScheduler:
+    """Outbound scheduler: one EgressLane per (upstream, API key).
+
+    Every session without its own keys shares the server keys, so their calls
+    share a lane; sessions with their own keys get lanes of their own.
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[int, int]] = DEFAULT_LIMITS, enabled: bool = EGRESS_ENABLED):
+        self.enabled = enabled
+        self.queue_timeout = EGRESS_QUEUE_TIMEOUT
+        self.limits = {
+            upstream: (_limit_setting(upstream, "INITIAL", initial), _limit_setting(upstream, "MAX", max_limit))
+            for upstream, (initial, max_limit) in limits.items()
+        }
+        self.lanes: Dict[Tuple[str, str], EgressLane] = {}
+
+    def lane(self, upstream: str, api_key: str) -> EgressLane:
+        fingerprint = key_fingerprint(api_key)
+        lane = self.lanes.get((upstream, fingerprint))
+        if lane is None:
+            if len(self.lanes) >= EGRESS_MAX_LANES:
+                self._prune()
+            initial, max_limit = self.limits.get(upstream, (8, 32))
+            lane = EgressLane(upstream, fingerprint, initial, max_limit)
+            self.lanes[(upstream, fingerprint)] = lane
+        return lane
+
+    def _prune(self) -> None:
+        idle = sorted((lane.last_used, key) for key, lane in self.lanes.items() if lane.idle)
+        for _, key in idle[: max(1, len(idle) // 2)]:
+            del self.lanes[key]
+
+    def slot(self, upstream: str, api_key: str, measure_latency: bool = True) -> EgressSlot:
+        return EgressSlot(self, upstream, api_key, measure_latency)
+
+    async def request(self, upstream: str, api_key: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """Shared-client request issued through the upstream's lane (status is not checked).
+
+        A 429 is retried up to EGRESS_THROTTLE_RETRIES times; the retry queues
+        behind the lane's Retry-After pause and reduced limit.
+        """
+        for attempt in range(EGRESS_THROTTLE_RETRIES + 1):
+            async with self.slot(upstream, api_key) as slot:
+                response = await get_http_client().request(method, url, **kwargs)
+                slot.observe(response)
+            if response.status_code != 429 or not self.enabled:
+                break
+        return response
+
+    @asynccontextmanager
+    async def stream(self, upstream: str, api_key: str, method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """Streaming request; the slot is held until the body is consumed, latency is time to headers."""
+        async with self.slot(upstream, api_key) as slot:
+            async with get_http_client().stream(method, url, **kwargs) as response:
+                slot.observe(response)
+                yield response
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "queue_timeout_seconds": self.queue_timeout,
+            "lanes": [lane.stats() for lane in self.lanes.values()],
+        }
+
+
+egress = EgressScheduler()
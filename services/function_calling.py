@@ -1,8 +1,21 @@
+import asyncio
 import json
-import requests
-from typing import Dict, List, Optional, Any
+import os
+import time
+import httpx
+from typing import Dict, List, Optional, Any, AsyncIterator, Tuple
 from .web_search import web_search_service
 from .weather import weather_service
+from .egress import egress
+from .upstreams import gemini_url
+from .llm import stream_gemini_chunks
+from .gemini_stream import candidate_parts
+from .metrics import LLM_GENERATION_SECONDS, TOOL_CALL_SECONDS
+from .tracing import tracer
+
+
+# Per-call timeout (seconds) for tool execution within one Gemini turn
+FUNCTION_CALL_TIMEOUT = float(os.getenv("FUNCTION_CALL_TIMEOUT", "20"))
 
 
 # Define the web search function schema for Gemini
@@ -77,7 +90,7 @@ class FunctionCallingService:
         """Get all function declarations for Gemini API."""
         return [func["declaration"] for func in self.functions.values()]
     
-    def execute_function(self, function_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+    async def execute_function(self, function_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
         """
         Execute a function call and return the result.
         
@@ -95,10 +108,14 @@ class FunctionCallingService:
                 "result": None
             }
         
+        started = time.perf_counter()
+        outcome = "cancelled"
         try:
             print(f"[FUNCTION_CALL] Executing {function_name} with params: {parameters}")
             handler = self.functions[function_name]["handler"]
-            result = handler(**parameters)
+            with tracer.span(f"tool.{function_name}", parameters=parameters):
+                result = await handler(**parameters)
+            outcome = "success"
             
             return {
                 "success": True,
@@ -108,6 +125,7 @@ class FunctionCallingService:
             }
             
         except Exception as e:
+            outcome = "error"
             print(f"[FUNCTION_CALL] Error executing {function_name}: {e}")
             return {
                 "success": False,
@@ -116,8 +134,70 @@ class FunctionCallingService:
                 "parameters": parameters,
                 "result": None
             }
+        finally:
+            # Timed-out calls are cancelled by execute_function_with_timeout and show up as "cancelled"
+            TOOL_CALL_SECONDS.observe(time.perf_counter() - started, tool=function_name, outcome=outcome)
     
-    def call_gemini_with_functions(
+    def format_function_result(self, function_name: str, exec_result: Dict[str, Any]) -> str:
+        """Format a function execution result for the conversation."""
+        if not exec_result["success"]:
+            return f"Error: {exec_result.get('error', 'Unknown error')}"
+        if function_name == "search_web":
+            # Format search results nicely for the conversation
+            return web_search_service.format_search_results_for_llm(exec_result["result"])
+        if function_name == "get_weather":
+            return weather_service.format_for_llm(exec_result["result"])
+        return json.dumps(exec_result["result"], indent=2)
+
+    async def execute_function_with_timeout(
+        self, function_name: str, parameters: Dict[str, Any], timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Execute a function call, turning a timeout into a failed result."""
+        timeout = FUNCTION_CALL_TIMEOUT if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(self.execute_function(function_name, parameters), timeout)
+        except asyncio.TimeoutError:
+            print(f"[FUNCTION_CALL] {function_name} timed out after {timeout}s")
+            return {
+                "success": False,
+                "error": f"{function_name} timed out after {timeout} seconds",
+                "function_name": function_name,
+                "parameters": parameters,
+                "result": None
+            }
+
+    async def run_function_calls(
+        self, function_calls: List[Dict[str, Any]], timeout: Optional[float] = None
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Execute the function calls from one model response concurrently.
+        
+        Each call gets its own timeout; results keep the order of the calls so
+        the functionResponse parts line up with the model's functionCall parts.
+        Cancelling the caller cancels every call still in flight.
+        
+        Returns:
+            Tuple of (execution results, functionResponse parts for the conversation)
+        """
+        if len(function_calls) > 1:
+            print(f"[FUNCTION_CALL] Running {len(function_calls)} function calls concurrently")
+        exec_results = await asyncio.gather(*[
+            self.execute_function_with_timeout(func_call.get("name", ""), func_call.get("args", {}), timeout)
+            for func_call in function_calls
+        ])
+        
+        function_responses = []
+        for func_call, exec_result in zip(function_calls, exec_results):
+            func_name = func_call.get("name", "")
+            function_responses.append({
+                "functionResponse": {
+                    "name": func_name,
+                    "response": {"result": self.format_function_result(func_name, exec_result)}
+                }
+            })
+        return list(exec_results), function_responses
+
+    async def call_gemini_with_functions(
         self, 
         contents: List[Dict[str, Any]], 
         api_key: str, 
@@ -136,7 +216,7 @@ class FunctionCallingService:
         Returns:
             Dictionary with final response and function call history
         """
-        endpoint = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}"
+        endpoint = f"{gemini_url(model)}?key={api_key}"
         
         # Prepare the payload with function declarations
         payload = {
@@ -155,12 +235,16 @@ class FunctionCallingService:
             try:
                 print(f"[FUNCTION_CALL] Gemini call iteration {call_iteration + 1}")
                 
-                response = requests.post(
-                    endpoint,
-                    json=payload,
-                    headers={"Content-Type": "application/json"},
-                    timeout=60
-                )
+                with LLM_GENERATION_SECONDS.time(mode="blocking"):
+                    response = await egress.request(
+                        "gemini",
+                        api_key,
+                        "POST",
+                        endpoint,
+                        json=payload,
+                        headers={"Content-Type": "application/json"},
+                        timeout=60
+                    )
                 response.raise_for_status()
                 data = response.json()
                 
@@ -195,37 +279,8 @@ class FunctionCallingService:
                     })
                     
                     # Execute each function call
-                    function_responses = []
-                    for func_call in function_calls_in_response:
-                        func_name = func_call.get("name", "")
-                        func_args = func_call.get("args", {})
-                        
-                        # Execute the function
-                        exec_result = self.execute_function(func_name, func_args)
-                        function_calls_made.append(exec_result)
-                        
-                        # Format the result for the conversation
-                        if exec_result["success"]:
-                            if func_name == "search_web":
-                                # Format search results nicely for the conversation
-                                formatted_result = web_search_service.format_search_results_for_llm(
-                                    exec_result["result"]
-                                )
-                            elif func_name == "get_weather":
-                                formatted_result = weather_service.format_for_llm(
-                                    exec_result["result"]
-                                )
-                            else:
-                                formatted_result = json.dumps(exec_result["result"], indent=2)
-                        else:
-                            formatted_result = f"Error: {exec_result.get('error', 'Unknown error')}"
-                        
-                        function_responses.append({
-                            "functionResponse": {
-                                "name": func_name,
-                                "response": {"result": formatted_result}
-                            }
-                        })
+                    exec_results, function_responses = await self.run_function_calls(function_calls_in_response)
+                    function_calls_made.extend(exec_results)
                     
                     # Add function responses to conversation
                     conversation_contents.append({
@@ -245,7 +300,7 @@ class FunctionCallingService:
                         "conversation": conversation_contents
                     }
             
-            except requests.RequestException as e:
+            except httpx.HTTPError as e:
                 return {
                     "success": False,
                     "error": f"Gemini API error: {e}",
@@ -267,5 +322,61 @@ class FunctionCallingService:
         }
 
 
+    async def stream_gemini_with_functions(
+        self,
+        contents: List[Dict[str, Any]],
+        api_key: str,
+        model: str,
+        max_function_calls: int = 3,
+        function_calls_made: Optional[List[Dict[str, Any]]] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Streaming variant of call_gemini_with_functions.
+        
+        Consumes streamGenerateContent and yields text deltas as they arrive.
+        When the model emits functionCall parts, the stream is allowed to finish,
+        the functions are executed and the stream is resumed with their results.
+        
+        Args:
+            contents: Conversation contents
+            api_key: Gemini API key
+            model: Model name
+            max_function_calls: Maximum number of Gemini calls to allow
+            function_calls_made: Optional list that receives each function execution result
+            
+        Raises:
+            httpx.HTTPError on HTTP errors for callers to handle.
+        """
+        if function_calls_made is None:
+            function_calls_made = []
+        conversation_contents = contents.copy()
+        tools = [{"function_declarations": self.get_function_declarations()}]
+        
+        for call_iteration in range(max_function_calls):
+            print(f"[FUNCTION_CALL] Gemini streaming iteration {call_iteration + 1}")
+            payload = {"contents": conversation_contents, "tools": tools}
+            
+            model_parts: List[Dict[str, Any]] = []
+            function_calls_in_response: List[Dict[str, Any]] = []
+            async for item in stream_gemini_chunks(payload, api_key, model):
+                for part in candidate_parts(item):
+                    model_parts.append(part)
+                    if "functionCall" in part:
+                        function_calls_in_response.append(part["functionCall"])
+                    elif part.get("text"):
+                        yield part["text"]
+            
+            if not function_calls_in_response:
+                return
+            
+            # Add the model's response with function calls, run them and resume the stream
+            conversation_contents.append({"role": "model", "parts": model_parts})
+            exec_results, function_responses = await self.run_function_calls(function_calls_in_response)
+            function_calls_made.extend(exec_results)
+            conversation_contents.append({"role": "user", "parts": function_responses})
+        
+        print(f"[FUNCTION_CALL] Maximum function calls ({max_function_calls}) reached while streaming")
+
+
 # Backward-compatible global instance (not used for per-request overrides)
 function_calling_service = FunctionCallingService()
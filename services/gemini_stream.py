@@ -0,0 +1,166 @@
+import codecs
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+import httpx
+
+
+# Stream formats returned by streamGenerateContent
+FORMAT_SSE = "sse"     # ?alt=sse: "data: {...}" events separated by blank lines
+FORMAT_JSON = "json"   # default: one JSON array of response objects, pretty-printed over many lines
+
+
+class GeminiStreamDecoder:
+    """Incremental decoder for Gemini streamGenerateContent bodies.
+
+    Feed it raw bytes (or text) as they arrive; each call returns the response
+    objects completed by that data. Both SSE and the chunked JSON array format
+    are supported, detected from the first non-whitespace character. Objects
+    are emitted as soon as their closing brace arrives, regardless of how the
+    body is split into network chunks or lines.
+    """
+
+    def __init__(self):
+        self.format: Optional[str] = None
+        self._utf8 = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._buffer = ""
+        # JSON scanner state (positions index into _buffer)
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._start = -1
+        # SSE state: data lines of the event being received
+        self._event_data: List[str] = []
+        self.skipped = 0
+
+    def feed(self, data: Union[bytes, str]) -> List[Dict[str, Any]]:
+        text = self._utf8.decode(data) if isinstance(data, (bytes, bytearray)) else data
+        if not text:
+            return []
+        self._buffer += text
+        if self.format is None:
+            stripped = self._buffer.lstrip()
+            if not stripped:
+                return []
+            self.format = FORMAT_JSON if stripped[0] in "[{" else FORMAT_SSE
+        if self.format == FORMAT_JSON:
+            return self._scan_json()
+        return self._scan_sse()
+
+    def close(self) -> List[Dict[str, Any]]:
+        """Flush whatever is left once the body has ended."""
+        items = self.feed(self._utf8.decode(b"", final=True))
+        if self.format == FORMAT_SSE:
+            # A last line or event without its terminating newline still counts
+            self._buffer += "\n"
+            items.extend(self._scan_sse())
+            items.extend(self._dispatch_event())
+        self._buffer = ""
+        return items
+
+    # ---- JSON array / concatenated objects ----
+    def _scan_json(self) -> List[Dict[str, Any]]:
+        items: List[Dict[str, Any]] = []
+        buffer = self._buffer
+        i = self._pos
+        length = len(buffer)
+        while i < length:
+            ch = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = self._depth > 0
+            elif ch == "{":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif ch == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(buffer[self._start:i + 1], items)
+                    self._start = -1
+            # Outside an object, "[", "," , "]" and whitespace are array punctuation
+            i += 1
+        if self._depth == 0:
+            # Nothing pending: drop consumed text so the buffer stays small
+            self._buffer = ""
+            self._pos = 0
+        else:
+            self._buffer = buffer[self._start:]
+            self._pos = i - self._start
+            self._start = 0
+        return items
+
+    # ---- Server-sent events ----
+    def _scan_sse(self) -> List[Dict[str, Any]]:
+        items: List[Dict[str, Any]] = []
+        lines = self._buffer.split("\n")
+        # The last element is an incomplete line (empty if the buffer ended with a newline)
+        self._buffer = lines.pop()
+        for line in lines:
+            line = line.rstrip("\r")
+            if not line:
+                items.extend(self._dispatch_event())
+            elif line.startswith("data:"):
+                value = line[5:]
+                self._event_data.append(value[1:] if value.startswith(" ") else value)
+            # "event:", "id:", "retry:" and ":" comments carry nothing we need
+        return items
+
+    def _dispatch_event(self) -> List[Dict[str, Any]]:
+        if not self._event_data:
+            return []
+        data = "\n".join(self._event_data)
+        self._event_data = []
+        items: List[Dict[str, Any]] = []
+        if data.strip() and data.strip() != "[DONE]":
+            self._emit(data, items)
+        return items
+
+    def _emit(self, raw: str, items: List[Dict[str, Any]]) -> None:
+        try:
+            item = json.loads(raw)
+        except json.JSONDecodeError:
+            self.skipped += 1
+            return
+        if isinstance(item, dict):
+            items.append(item)
+        elif isinstance(item, list):
+            items.extend(x for x in item if isinstance(x, dict))
+
+
+async def iter_gemini_stream(response: httpx.Response) -> AsyncIterator[Dict[str, Any]]:
+    """Yield each Gemini response object from a streaming httpx response as soon as it is complete."""
+    decoder = GeminiStreamDecoder()
+    async for chunk in response.aiter_bytes():
+        for item in decoder.feed(chunk):
+            yield item
+    for item in decoder.close():
+        yield item
+
+
+def candidate_parts(item: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Parts of the first candidate in a response object."""
+    candidates = item.get("candidates") or []
+    if not candidates or not isinstance(candidates[0], dict):
+        return []
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    return [p for p in parts if isinstance(p, dict)]
+
+
+def candidate_text(item: Dict[str, Any]) -> str:
+    """Text delta carried by a response object (all text parts of the first candidate)."""
+    return "".join(p.get("text", "") for p in candidate_parts(item) if p.get("text"))
+
+
+def finish_reason(item: Dict[str, Any]) -> Optional[str]:
+    candidates = item.get("candidates") or []
+    if candidates and isinstance(candidates[0], dict):
+        return candidates[0].get("finishReason") or candidates[0].get("finish_reason")
+    return None
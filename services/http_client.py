@@ -0,0 +1,71 @@
+import os
+from typing import Optional
+
+import httpx
+
+
+# Pool sizing for the shared outbound client. One keep-alive pool is shared by
+# every request handler so TLS sessions to Gemini/Murf/Tavily are reused.
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "200"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "50"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(60.0, connect=HTTP_CONNECT_TIMEOUT)
+    return httpx.AsyncClient(limits=limits, timeout=timeout)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared async HTTP client, creating it lazily if needed.
+
+    The app opens the client at startup; scripts that import the services
+    directly get one created on first use.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def open_http_client() -> httpx.AsyncClient:
+    """Create the shared client (called from the app lifespan on startup)."""
+    client = get_http_client()
+    print(
+        f"[HTTP] Shared client ready (max_connections={HTTP_MAX_CONNECTIONS}, "
+        f"keepalive={HTTP_MAX_KEEPALIVE_CONNECTIONS})",
+        flush=True,
+    )
+    return client
+
+
+async def close_http_client() -> None:
+    """Close the shared client and release pooled connections."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+        print("[HTTP] Shared client closed", flush=True)
+    _client = None
+
+
+def describe_http_error(service: str, exc: httpx.HTTPError) -> str:
+    """Build the user-facing error string used by the endpoints for upstream failures."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        try:
+            body = exc.response.json()
+        except ValueError:
+            return f"{service} API Error: {exc.response.status_code} - {exc.response.text}"
+        if isinstance(body, dict) and "error" in body:
+            return f"{service} API Error: {body['error']}"
+        if isinstance(body, dict) and "message" in body:
+            return f"{service} API Error: {body['message']}"
+        return f"{service} API Error: {body}"
+    return f"Failed to call {service} API: {exc}"
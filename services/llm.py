@@ -1,18 +1,25 @@
-import requests
+import time
+from typing import AsyncIterator
 
+import httpx
 
-def generate_text_gemini(prompt_text: str, api_key: str, model: str) -> str:
+from .egress import egress
+from .gemini_stream import iter_gemini_stream, candidate_text
+from .upstreams import gemini_url
+from .metrics import LLM_GENERATION_SECONDS, LLM_TIME_TO_FIRST_TOKEN_SECONDS
+
+
+async def generate_text_gemini(prompt_text: str, api_key: str, model: str) -> str:
     """Call Gemini generateContent and return generated text (first candidate).
 
-    Raises requests.RequestException on HTTP errors for callers to handle.
+    Raises httpx.HTTPError on HTTP errors for callers to handle.
     """
-    endpoint = (
-        f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}"
-    )
+    endpoint = f"{gemini_url(model)}?key={api_key}"
     payload = {"contents": [{"parts": [{"text": prompt_text}]}]}
-    response = requests.post(
-        endpoint, json=payload, headers={"Content-Type": "application/json"}, timeout=60
-    )
+    with LLM_GENERATION_SECONDS.time(mode="blocking"):
+        response = await egress.request(
+            "gemini", api_key, "POST", endpoint, json=payload, headers={"Content-Type": "application/json"}, timeout=60
+        )
     response.raise_for_status()
     data = response.json()
 
@@ -25,18 +32,17 @@ def generate_text_gemini(prompt_text: str, api_key: str, model: str) -> str:
     return ""
 
 
-def generate_text_gemini_with_contents(contents: list, api_key: str, model: str) -> str:
+async def generate_text_gemini_with_contents(contents: list, api_key: str, model: str) -> str:
     """Call Gemini generateContent with role-based contents and return text.
 
     'contents' should be a list of dicts like: {"role": "user"|"model", "parts": [{"text": "..."}]}
     """
-    endpoint = (
-        f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}"
-    )
+    endpoint = f"{gemini_url(model)}?key={api_key}"
     payload = {"contents": contents}
-    response = requests.post(
-        endpoint, json=payload, headers={"Content-Type": "application/json"}, timeout=60
-    )
+    with LLM_GENERATION_SECONDS.time(mode="blocking"):
+        response = await egress.request(
+            "gemini", api_key, "POST", endpoint, json=payload, headers={"Content-Type": "application/json"}, timeout=60
+        )
     response.raise_for_status()
     data = response.json()
 
@@ -49,3 +55,36 @@ def generate_text_gemini_with_contents(contents: list, api_key: str, model: str)
     return ""
 
 
+async def stream_gemini_chunks(payload: dict, api_key: str, model: str) -> AsyncIterator[dict]:
+    """Call Gemini streamGenerateContent (SSE) and yield each response chunk as it arrives.
+
+    'payload' is the full request body (contents, tools, ...).
+    Raises httpx.HTTPError on HTTP errors for callers to handle.
+    """
+    endpoint = f"{gemini_url(model, 'streamGenerateContent')}?alt=sse"
+    headers = {"Content-Type": "application/json", "x-goog-api-key": api_key}
+    started = time.perf_counter()
+    first_chunk = True
+    try:
+        async with egress.stream(
+            "gemini", api_key, "POST", endpoint, json=payload, headers=headers, timeout=httpx.Timeout(300.0, connect=10.0)
+        ) as response:
+            response.raise_for_status()
+            async for item in iter_gemini_stream(response):
+                if first_chunk:
+                    first_chunk = False
+                    LLM_TIME_TO_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started, mode="stream")
+                yield item
+    finally:
+        LLM_GENERATION_SECONDS.observe(time.perf_counter() - started, mode="stream")
+
+
+async def stream_gemini_text(contents: list, api_key: str, model: str) -> AsyncIterator[str]:
+    """Stream a Gemini reply and yield text deltas as they arrive.
+
+    Raises httpx.HTTPError on HTTP errors for callers to handle.
+    """
+    async for item in stream_gemini_chunks({"contents": contents}, api_key, model):
+        text = candidate_text(item)
+        if text:
+            yield text
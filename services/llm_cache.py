@@ -0,0 +1,115 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from .cache import TTLCache
+
+
+# Opt-in exact-match cache for text-only /llm/query answers
+LLM_CACHE_ENABLED = str(os.getenv("LLM_CACHE_ENABLED", "false")).lower() in {"1", "true", "yes", "on"}
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "300"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Values reported in the X-Cache response header
+CACHE_HIT = "HIT"
+CACHE_MISS = "MISS"
+CACHE_COALESCED = "COALESCED"
+CACHE_BYPASS = "BYPASS"
+
+
+def _entry_size(key: Tuple[str, str], value: Dict[str, Any]) -> int:
+    """Approximate memory used by an entry (prompt plus generated text, UTF-8)."""
+    text = str(value.get("response", ""))
+    return len(key[0]) + len(key[1].encode("utf-8")) + len(text.encode("utf-8"))
+
+
+class LLMResponseCache:
+    """Exact-match (model, prompt) cache for non-conversational LLM answers.
+
+    - Only successful answers are stored, for `ttl` seconds
+    - Entries are evicted LRU once max_entries or max_bytes is exceeded
+    - Concurrent identical prompts share one upstream call (request coalescing)
+    """
+
+    def __init__(
+        self,
+        enabled: bool = LLM_CACHE_ENABLED,
+        ttl: float = LLM_CACHE_TTL,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        max_bytes: int = LLM_CACHE_MAX_BYTES,
+    ):
+        self.enabled = enabled
+        self.cache = TTLCache(maxsize=max_entries, ttl=ttl, name="llm_query", max_bytes=max_bytes)
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.coalesced = 0
+        self.bypassed = 0
+
+    @staticmethod
+    def key(model: str, prompt: str) -> Tuple[str, str]:
+        return model, prompt
+
+    async def get_or_compute(
+        self,
+        model: str,
+        prompt: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+        use_cache: bool = True,
+    ) -> Tuple[Dict[str, Any], str]:
+        """Return (response, cache status), calling compute() only when needed.
+
+        compute() returns the endpoint's response dict; it is cached when
+        "success" is true. Errors raised by compute() reach every coalesced caller.
+        """
+        if not (self.enabled and use_cache):
+            self.bypassed += 1
+            return await compute(), CACHE_BYPASS
+
+        key = self.key(model, prompt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached, CACHE_HIT
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending), CACHE_COALESCED
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The leading request was cancelled (client went away); compute our own answer
+                return await compute(), CACHE_MISS
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Mark retrieved so an uncoalesced failure is not logged as "never retrieved"
+            future.exception()
+            raise
+        else:
+            if result.get("success"):
+                self.cache.set(key, result, size=_entry_size(key, result))
+            future.set_result(result)
+            return result, CACHE_MISS
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.cache.stats()
+        stats.update(
+            enabled=self.enabled,
+            coalesced=self.coalesced,
+            bypassed=self.bypassed,
+            in_flight=len(self._inflight),
+        )
+        return stats
+
+
+llm_response_cache = LLMResponseCache()
@@ -0,0 +1,272 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set
+
+from .metrics import LOOP_BLOCKED_SECONDS, LOOP_LAG_SECONDS, LOOP_STALLS
+
+
+# Event-loop watchdog: a ticker measures scheduling lag, a thread samples the
+# loop thread's stack while the loop is blocked for longer than the threshold
+LOOP_MONITOR_ENABLED = str(os.getenv("LOOP_MONITOR_ENABLED", "true")).lower() in {"1", "true", "yes", "on"}
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.05"))
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "100"))
+# Lag samples kept for percentiles (1200 ticks of 50 ms = the last minute)
+LOOP_MONITOR_WINDOW = int(os.getenv("LOOP_MONITOR_WINDOW", "1200"))
+LOOP_MONITOR_STACK_DEPTH = int(os.getenv("LOOP_MONITOR_STACK_DEPTH", "12"))
+# Call sites tracked in memory, and distinct site labels exported to Prometheus (the rest count as "other")
+LOOP_MONITOR_MAX_SITES = int(os.getenv("LOOP_MONITOR_MAX_SITES", "200"))
+OTHER_SITE = "other"
+
+# Frames under this directory (outside installed packages) count as our call sites
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_LIBRARY_DIRS = ("site-packages", "dist-packages", os.sep + ".venv" + os.sep, os.sep + "venv" + os.sep)
+# Stacks are cut where asyncio runs the callback; the frames below are the loop itself
+_ASYNCIO_HANDLE_FILE = asyncio.events.__file__
+
+
+def _is_project_file(filename: str) -> bool:
+    return filename.startswith(PROJECT_ROOT) and not any(part in filename for part in _LIBRARY_DIRS)
+
+
+def short_path(filename: str) -> str:
+    if filename.startswith(PROJECT_ROOT + os.sep):
+        return os.path.relpath(filename, PROJECT_ROOT)
+    for marker in ("site-packages" + os.sep, "dist-packages" + os.sep):
+        if marker in filename:
+            return filename.split(marker, 1)[1]
+    return os.path.basename(filename)
+
+
+def _describe(frame) -> str:
+    return f"{short_path(frame.f_code.co_filename)}:{frame.f_lineno} in {frame.f_code.co_name}"
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class LoopMonitor:
+    """Measures event-loop lag and reports the code that blocks the loop.
+
+    - A task sleeps `interval` seconds in a loop; how late it wakes up is the
+      scheduling lag every other coroutine sees at that moment
+    - A watchdog thread notices when the tick is overdue by more than
+      `threshold_ms` and samples the loop thread's stack until the loop runs again
+    - Blocked time is attributed to the innermost frame in this project (the call
+      site to fix) and aggregated, so the worst offenders rank first
+    """
+
+    def __init__(
+        self,
+        interval: float = LOOP_MONITOR_INTERVAL,
+        threshold_ms: float = LOOP_LAG_THRESHOLD_MS,
+        window: int = LOOP_MONITOR_WINDOW,
+        enabled: bool = LOOP_MONITOR_ENABLED,
+    ):
+        self.interval = max(0.005, interval)
+        self.threshold = max(0.001, threshold_ms / 1000.0)
+        self.enabled = enabled
+        # Sample several times per threshold so short stalls are still caught
+        self.sample_interval = max(0.005, min(self.interval, self.threshold / 5))
+        self._lag: Deque[float] = deque(maxlen=max(10, window))
+        self._lock = threading.Lock()
+        self._sites: Dict[str, Dict[str, object]] = {}
+        self._recent: Deque[Dict[str, object]] = deque(maxlen=20)
+        # Counter series never go away, so their labels are capped for the life of the process
+        self._metric_sites: Set[str] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._ticker: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        # Written by the ticker, read by the watchdog
+        self._deadline = 0.0
+        self._ticks = 0
+        self._last_lag = 0.0
+        self._last_log = 0.0
+        self.started_at: Optional[float] = None
+        self.stalls = 0
+        self.blocked_seconds = 0.0
+        self.max_lag = 0.0
+
+    # ---- loop side ----
+    def start(self) -> None:
+        """Start the ticker on the running loop and the watchdog thread."""
+        if not self.enabled or self._ticker is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._deadline = time.perf_counter() + self.interval
+        self.started_at = time.time()
+        self._ticker = asyncio.create_task(self._tick(), name="loop-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        if self._ticker is not None:
+            self._ticker.cancel()
+            self._ticker = None
+        self._stop.set()
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1.0)
+            self._watchdog = None
+
+    async def _tick(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(0.0, now - self._deadline)
+            self._deadline = now + self.interval
+            self._last_lag = lag
+            self._ticks += 1
+            self._lag.append(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+            LOOP_LAG_SECONDS.observe(lag)
+
+    # ---- watchdog thread ----
+    def _watch(self) -> None:
+        stall: Optional[Dict[str, object]] = None
+        last_sample = 0.0
+        while not self._stop.wait(self.sample_interval):
+            now = time.perf_counter()
+            if stall is not None and self._ticks != stall["ticks"]:
+                self._finish_stall(stall)
+                stall = None
+            overdue = now - self._deadline
+            if overdue < self.threshold:
+                continue
+            if stall is None:
+                stall = {"ticks": self._ticks, "at": time.time() - overdue, "sites": {}, "first": None}
+                # The loop was already blocked this long before we noticed
+                blocked = overdue
+            else:
+                blocked = now - last_sample
+            last_sample = now
+            self._sample(stall, blocked)
+
+    def _sample(self, stall: Dict[str, object], blocked: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        stack: List[str] = []
+        site = None
+        leaf = _describe(frame)
+        f = frame
+        while f is not None and f.f_code.co_filename != _ASYNCIO_HANDLE_FILE:
+            if site is None and _is_project_file(f.f_code.co_filename) and f.f_code.co_filename != __file__:
+                site = _describe(f)
+            if len(stack) < LOOP_MONITOR_STACK_DEPTH:
+                stack.append(_describe(f))
+            elif site is not None:
+                break
+            f = f.f_back
+        del frame, f
+        site = site or leaf
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        sample = {"site": site, "leaf": leaf, "task": task.get_name() if task is not None else None, "stack": stack}
+        sites = stall["sites"]
+        sites[site] = sites.get(site, 0.0) + blocked
+        if stall["first"] is None:
+            stall["first"] = sample
+        with self._lock:
+            entry = self._sites.get(site)
+            if entry is None:
+                if len(self._sites) >= LOOP_MONITOR_MAX_SITES:
+                    del self._sites[min(self._sites, key=lambda k: self._sites[k]["blocked_seconds"])]
+                entry = self._sites[site] = {"site": site, "samples": 0, "stalls": 0, "blocked_seconds": 0.0, "max_stall_ms": 0.0}
+            entry["samples"] += 1
+            entry["blocked_seconds"] += blocked
+            entry["leaf"] = leaf
+            entry["task"] = sample["task"]
+            entry["stack"] = stack
+            entry["last_seen"] = round(time.time(), 3)
+            label = site
+            if label not in self._metric_sites:
+                if len(self._metric_sites) < LOOP_MONITOR_MAX_SITES:
+                    self._metric_sites.add(label)
+                else:
+                    label = OTHER_SITE
+        LOOP_BLOCKED_SECONDS.inc(blocked, site=label)
+
+    def _finish_stall(self, stall: Dict[str, object]) -> None:
+        duration = self._last_lag
+        first = stall["first"] or {}
+        sites = stall["sites"]
+        top = max(sites, key=sites.get) if sites else first.get("site")
+        with self._lock:
+            self.stalls += 1
+            self.blocked_seconds += duration
+            for site in sites:
+                entry = self._sites.get(site)
+                if entry is not None:
+                    entry["stalls"] += 1
+                    entry["max_stall_ms"] = max(entry["max_stall_ms"], round(duration * 1000, 1))
+            self._recent.append({
+                "at": round(stall["at"], 3),
+                "duration_ms": round(duration * 1000, 1),
+                "site": top,
+                "task": first.get("task"),
+                "stack": first.get("stack", []),
+            })
+        LOOP_STALLS.inc()
+        now = time.monotonic()
+        if now - self._last_log >= 1.0:
+            self._last_log = now
+            print(f"[LOOP] Event loop blocked {duration * 1000:.0f} ms at {top} (task {first.get('task')})", flush=True)
+
+    # ---- reporting ----
+    def lag_percentiles(self) -> Dict[str, float]:
+        ordered = sorted(self._lag)
+        result = {f"p{pct}_ms": round(_percentile(ordered, pct) * 1000, 2) for pct in (50, 90, 99)}
+        result["max_ms"] = round(ordered[-1] * 1000, 2) if ordered else 0.0
+        return result
+
+    def top_sites(self, limit: int = 10) -> List[Dict[str, object]]:
+        with self._lock:
+            entries = sorted(self._sites.values(), key=lambda e: e["blocked_seconds"], reverse=True)[:limit]
+            entries = [dict(entry) for entry in entries]
+        result = []
+        for entry in entries:
+            entry["blocked_ms"] = round(entry.pop("blocked_seconds") * 1000, 1)
+            result.append(entry)
+        return result
+
+    def reset(self) -> None:
+        """Forget collected samples and call sites (e.g. after a fix is deployed)."""
+        with self._lock:
+            self._lag.clear()
+            self._sites.clear()
+            self._recent.clear()
+            self.stalls = 0
+            self.blocked_seconds = 0.0
+            self.max_lag = 0.0
+
+    def stats(self, limit: int = 10) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "running": self._ticker is not None,
+            "interval_ms": round(self.interval * 1000, 1),
+            "threshold_ms": round(self.threshold * 1000, 1),
+            "window_seconds": round(len(self._lag) * self.interval, 1),
+            "lag": self.lag_percentiles(),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "stalls": self.stalls,
+            "blocked_ms": round(self.blocked_seconds * 1000, 1),
+            "top_sites": self.top_sites(limit),
+            "recent_stalls": list(self._recent)[::-1],
+        }
+
+
+loop_monitor = LoopMonitor()
@@ -0,0 +1,260 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# Latency buckets (seconds) covering fast cache hits through slow upstream calls
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0,
+)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Report function() at scrape time (unlabelled gauges only)."""
+        self._function = function
+
+    def value(self, **labels: str) -> float:
+        if self._function is not None:
+            return float(self._function())
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        if self._function is not None:
+            try:
+                return [f"{self.name} {_format_value(float(self._function()))}"]
+            except Exception:
+                return []
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, plus sum and count."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[key] = series
+            series[0][index] += 1
+            series[1][0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the wall time spent inside the with-block (exceptions included)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(c), s[0])) for k, (c, s) in self._series.items())
+        lines: List[str] = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in the Prometheus text format."""
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))  # type: ignore[return-value]
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# ---- voice pipeline metrics ----
+STT_SECONDS = registry.histogram(
+    "voice_stt_seconds", "AssemblyAI speech-to-text time by stage (queue, upload, transcribe)", ["stage", "endpoint"]
+)
+LLM_TIME_TO_FIRST_TOKEN_SECONDS = registry.histogram(
+    "voice_llm_time_to_first_token_seconds", "Time from Gemini request to the first streamed text", ["mode"]
+)
+LLM_GENERATION_SECONDS = registry.histogram(
+    "voice_llm_generation_seconds", "Total Gemini request time (stream: until the stream ends)", ["mode"]
+)
+TOOL_CALL_SECONDS = registry.histogram(
+    "voice_tool_call_seconds", "Function-calling tool execution time", ["tool", "outcome"]
+)
+TTS_TIME_TO_FIRST_CHUNK_SECONDS = registry.histogram(
+    "voice_tts_time_to_first_chunk_seconds", "Time from sending text to Murf to the first audio chunk", ["transport"]
+)
+TTS_REQUEST_SECONDS = registry.histogram(
+    "voice_tts_request_seconds", "Murf TTS request time (REST generate, or full streamed reply)", ["transport"]
+)
+VOICE_TURN_SECONDS = registry.histogram(
+    "voice_turn_seconds", "Streaming voice turn latency from end of user speech", ["stage"]
+)
+WS_FRAMES = registry.counter("voice_ws_frames_total", "WebSocket messages", ["endpoint", "direction"])
+WS_BYTES = registry.counter("voice_ws_bytes_total", "WebSocket payload bytes", ["endpoint", "direction"])
+WS_ACTIVE_CONNECTIONS = registry.gauge("voice_ws_active_connections", "Open WebSocket connections", ["endpoint"])
+ACTIVE_SESSIONS = registry.gauge("voice_active_sessions", "Sessions currently held in the session store")
+ADMISSION_QUEUE_SECONDS = registry.histogram(
+    "voice_admission_queue_seconds", "Time requests waited for an admission slot", ["gate"]
+)
+ADMISSION_REJECTED = registry.counter("voice_admission_rejected_total", "Requests shed by admission control", ["gate", "reason"])
+ADMISSION_IN_FLIGHT = registry.gauge("voice_admission_in_flight", "Requests holding an admission slot", ["gate"])
+EGRESS_QUEUE_SECONDS = registry.histogram(
+    "voice_egress_queue_seconds", "Time upstream calls waited for an egress slot", ["upstream", "priority"]
+)
+EGRESS_THROTTLED = registry.counter("voice_egress_throttled_total", "Upstream calls answered with 429", ["upstream"])
+EGRESS_IN_FLIGHT = registry.gauge("voice_egress_in_flight", "Upstream calls holding an egress slot", ["upstream"])
+LOOP_LAG_SECONDS = registry.histogram(
+    "voice_event_loop_lag_seconds",
+    "How late the event loop ran a timer due now (scheduling lag)",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_STALLS = registry.counter("voice_event_loop_stalls_total", "Times the event loop was blocked past the lag threshold")
+LOOP_BLOCKED_SECONDS = registry.counter(
+    "voice_event_loop_blocked_seconds_total", "Time the event loop was blocked, by call site", ["site"]
+)
+
+
+def render_metrics() -> str:
+    return registry.render()
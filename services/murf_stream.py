@@ -0,0 +1,218 @@
+import asyncio
+import os
+import random
+import time
+from typing import Dict, List, Optional
+
+import websockets
+
+from .egress import key_fingerprint
+
+
+MURF_WS_URL = os.getenv("MURF_WS_URL", "wss://api.murf.ai/v1/speech/stream-input")
+MURF_STREAM_SAMPLE_RATE = int(os.getenv("MURF_STREAM_SAMPLE_RATE", "44100"))
+MURF_STREAM_FORMAT = os.getenv("MURF_STREAM_FORMAT", "WAV")
+# Idle connections kept per API key, and how long one may sit unused before it is closed
+MURF_POOL_MAX_IDLE = int(os.getenv("MURF_POOL_MAX_IDLE", "4"))
+MURF_POOL_IDLE_TIMEOUT = float(os.getenv("MURF_POOL_IDLE_TIMEOUT", "60"))
+MURF_POOL_REAP_INTERVAL = float(os.getenv("MURF_POOL_REAP_INTERVAL", "15"))
+# Connections idle for longer than this are pinged before being handed out
+MURF_POOL_PING_AFTER = float(os.getenv("MURF_POOL_PING_AFTER", "10"))
+MURF_POOL_PING_TIMEOUT = float(os.getenv("MURF_POOL_PING_TIMEOUT", "2"))
+# Reconnect attempts with exponential backoff (base, cap in seconds)
+MURF_CONNECT_ATTEMPTS = int(os.getenv("MURF_CONNECT_ATTEMPTS", "3"))
+MURF_BACKOFF_BASE = float(os.getenv("MURF_BACKOFF_BASE", "0.25"))
+MURF_BACKOFF_MAX = float(os.getenv("MURF_BACKOFF_MAX", "4.0"))
+
+
+def murf_context_id(session_id: Optional[str]) -> str:
+    """Murf context id for a session; each session gets its own context.
+
+    Built from the session's fingerprint: session ids act as credentials, so
+    they are never sent upstream or logged.
+    """
+    return f"voice-agent-{key_fingerprint(session_id)}" if session_id else "voice-agent-anonymous"
+
+
+class MurfConnection:
+    """One Murf stream-input WebSocket plus bookkeeping for the pool."""
+
+    __slots__ = ("ws", "api_key", "loop", "created_at", "last_used", "uses")
+
+    def __init__(self, ws, api_key: str, loop: asyncio.AbstractEventLoop):
+        self.ws = ws
+        self.api_key = api_key
+        self.loop = loop
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+
+    @property
+    def open(self) -> bool:
+        return bool(getattr(self.ws, "open", False))
+
+
+class MurfConnectionPool:
+    """Pool of persistent Murf stream-input WebSocket connections.
+
+    - Connections are leased exclusively for one reply and returned afterwards
+    - Idle connections are health-checked (ping) before reuse
+    - A background reaper closes connections idle for longer than idle_timeout
+    - New connections are opened with exponential backoff between attempts
+    Connections belong to the event loop that opened them; a caller on a
+    different loop gets a fresh connection that is not pooled.
+    """
+
+    def __init__(
+        self,
+        max_idle: int = MURF_POOL_MAX_IDLE,
+        idle_timeout: float = MURF_POOL_IDLE_TIMEOUT,
+        ping_after: float = MURF_POOL_PING_AFTER,
+        ping_timeout: float = MURF_POOL_PING_TIMEOUT,
+        connect_attempts: int = MURF_CONNECT_ATTEMPTS,
+    ):
+        self.max_idle = max(0, max_idle)
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self.ping_timeout = ping_timeout
+        self.connect_attempts = max(1, connect_attempts)
+        self._idle: Dict[str, List[MurfConnection]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.in_use = 0
+        self.connects = 0
+        self.connect_failures = 0
+        self.reuses = 0
+        self.health_failures = 0
+        self.reaped = 0
+
+    def _url(self, api_key: str) -> str:
+        return (
+            f"{MURF_WS_URL}?api-key={api_key}&sample_rate={MURF_STREAM_SAMPLE_RATE}"
+            f"&channel_type=MONO&format={MURF_STREAM_FORMAT}"
+        )
+
+    async def _connect(self, api_key: str) -> MurfConnection:
+        """Open a new connection, retrying with exponential backoff and jitter."""
+        last_exc: Optional[Exception] = None
+        for attempt in range(self.connect_attempts):
+            if attempt:
+                delay = min(MURF_BACKOFF_MAX, MURF_BACKOFF_BASE * (2 ** (attempt - 1)))
+                await asyncio.sleep(delay * (0.5 + random.random() / 2))
+            try:
+                ws = await websockets.connect(self._url(api_key))
+                self.connects += 1
+                return MurfConnection(ws, api_key, asyncio.get_running_loop())
+            except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as exc:
+                last_exc = exc
+                self.connect_failures += 1
+                print(f"[MURF] Connect attempt {attempt + 1}/{self.connect_attempts} failed: {exc}", flush=True)
+        raise ConnectionError(f"Could not connect to Murf after {self.connect_attempts} attempts: {last_exc}")
+
+    async def _healthy(self, conn: MurfConnection) -> bool:
+        if not conn.open:
+            return False
+        if time.monotonic() - conn.last_used < self.ping_after:
+            return True
+        try:
+            pong = await conn.ws.ping()
+            await asyncio.wait_for(pong, self.ping_timeout)
+            return True
+        except Exception:
+            return False
+
+    async def acquire(self, api_key: str) -> MurfConnection:
+        """Lease a healthy connection for api_key, reusing an idle one when possible."""
+        loop = asyncio.get_running_loop()
+        if self._loop is None:
+            self._loop = loop
+        if loop is self._loop:
+            idle = self._idle.get(api_key, [])
+            while idle:
+                conn = idle.pop()
+                if await self._healthy(conn):
+                    conn.uses += 1
+                    self.reuses += 1
+                    self.in_use += 1
+                    return conn
+                self.health_failures += 1
+                await self._close(conn)
+        conn = await self._connect(api_key)
+        conn.uses += 1
+        self.in_use += 1
+        return conn
+
+    async def release(self, conn: MurfConnection, reusable: bool = True) -> None:
+        """Return a leased connection. Pass reusable=False if its context did not finish cleanly."""
+        self.in_use = max(0, self.in_use - 1)
+        conn.last_used = time.monotonic()
+        idle = self._idle.setdefault(conn.api_key, [])
+        if (
+            reusable
+            and conn.open
+            and conn.loop is self._loop
+            and conn.loop is asyncio.get_running_loop()
+            and len(idle) < self.max_idle
+        ):
+            idle.append(conn)
+            return
+        await self._close(conn)
+
+    async def discard(self, conn: MurfConnection) -> None:
+        await self.release(conn, reusable=False)
+
+    async def _close(self, conn: MurfConnection) -> None:
+        try:
+            await conn.ws.close()
+        except Exception:
+            pass
+
+    async def reap_idle(self) -> int:
+        """Close idle connections past idle_timeout (or already closed). Returns the number closed."""
+        cutoff = time.monotonic() - self.idle_timeout
+        reaped: List[MurfConnection] = []
+        for api_key, idle in list(self._idle.items()):
+            keep = [c for c in idle if c.open and c.last_used > cutoff]
+            reaped.extend(c for c in idle if c not in keep)
+            if keep:
+                self._idle[api_key] = keep
+            else:
+                del self._idle[api_key]
+        for conn in reaped:
+            await self._close(conn)
+        self.reaped += len(reaped)
+        return len(reaped)
+
+    async def run_reaper(self, interval: float = MURF_POOL_REAP_INTERVAL) -> None:
+        """Background task: periodically close idle connections."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                reaped = await self.reap_idle()
+                if reaped:
+                    print(f"[MURF] Reaped {reaped} idle connections", flush=True)
+            except Exception as exc:
+                print(f"[MURF] Pool reaper failed: {exc}", flush=True)
+
+    async def close(self) -> None:
+        """Close every idle connection (called on shutdown)."""
+        idle = [c for conns in self._idle.values() for c in conns]
+        self._idle.clear()
+        self._loop = None
+        for conn in idle:
+            await self._close(conn)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "idle": sum(len(c) for c in self._idle.values()),
+            "in_use": self.in_use,
+            "max_idle_per_key": self.max_idle,
+            "idle_timeout_seconds": self.idle_timeout,
+            "connects": self.connects,
+            "connect_failures": self.connect_failures,
+            "reuses": self.reuses,
+            "health_failures": self.health_failures,
+            "reaped": self.reaped,
+        }
+
+
+murf_pool = MurfConnectionPool()
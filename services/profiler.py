@@ -0,0 +1,238 @@
+import asyncio
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional
+
+from .loop_monitor import short_path
+
+
+# On-demand statistical profiler; its endpoints are disabled unless ADMIN_TOKEN is set
+# (read per call, like the API keys, so a value from .env is picked up)
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "10"))
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+PROFILER_MAX_DEPTH = int(os.getenv("PROFILER_MAX_DEPTH", "128"))
+# Finished profiles kept for download by id
+PROFILER_RECENT = int(os.getenv("PROFILER_RECENT", "10"))
+
+# Leaf frames of threads parked waiting for work (left out unless idle=True)
+_IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("runners.py", "run"),  # uvloop waits for events in C, below asyncio.run
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+
+def _thread_label(name: str) -> str:
+    """Drop pool numbering ("stt_3" -> "stt") so worker threads merge in the flamegraph."""
+    return re.sub(r"[-_]\d+\b", "", name).strip() or name
+
+
+def _frame_label(frame) -> str:
+    return f"{frame.f_code.co_name} ({short_path(frame.f_code.co_filename)})"
+
+
+class Profile:
+    """Stack samples collected over one profiling window."""
+
+    def __init__(self, label: str, interval: float, idle: bool):
+        self.profile_id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.interval = interval
+        self.idle = idle
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+
+    def collapsed(self) -> str:
+        """Folded stacks ("thread;outer;...;inner count"), for flamegraph.pl, speedscope or inferno."""
+        stacks = dict(self.stacks)  # The sampler may still be adding to a running profile
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items(), key=lambda kv: -kv[1]))
+
+    def top_functions(self, limit: int = 20) -> List[Dict[str, object]]:
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in dict(self.stacks).items():
+            frames = stack.split(";")[1:]
+            if frames:
+                own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        busy = max(1, sum(own.values()))
+        return [
+            {
+                "function": name,
+                "self_samples": count,
+                "self_percent": round(count * 100.0 / busy, 1),
+                "total_percent": round(total[name] * 100.0 / busy, 1),
+            }
+            for name, count in own.most_common(limit)
+        ]
+
+    def summary(self) -> Dict[str, object]:
+        end = self.finished_at or time.time()
+        threads: Counter = Counter()
+        for stack, count in dict(self.stacks).items():
+            threads[stack.split(";", 1)[0]] += count
+        return {
+            "profile_id": self.profile_id,
+            "label": self.label,
+            "started_at": round(self.started_at, 3),
+            "duration_seconds": round(end - self.started_at, 3),
+            "interval_ms": round(self.interval * 1000, 2),
+            "running": self.finished_at is None,
+            "samples": self.samples,
+            "idle_samples_skipped": self.idle_samples,
+            "threads": dict(threads.most_common()),
+        }
+
+    def to_dict(self, limit: int = 20) -> Dict[str, object]:
+        result = self.summary()
+        result["top_functions"] = self.top_functions(limit)
+        return result
+
+
+class SamplingProfiler:
+    """Samples the stacks of every thread from a background thread.
+
+    - One sampler thread serves all open profiles and stops when none are open
+    - Covers the event loop thread and worker threads alike (STT pool,
+      AssemblyAI streaming callbacks, to_thread calls, exporters)
+    - Overhead is one sys._current_frames() walk per interval, and only while profiling
+    """
+
+    def __init__(self, interval_ms: float = PROFILER_INTERVAL_MS, max_depth: int = PROFILER_MAX_DEPTH):
+        self.interval = max(0.001, interval_ms / 1000.0)
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self._active: Dict[str, Profile] = {}
+        self._recent: Deque[Profile] = deque(maxlen=PROFILER_RECENT)
+        self._thread: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self.profiles_total = 0
+
+    @staticmethod
+    def enabled() -> bool:
+        return bool(os.getenv("ADMIN_TOKEN"))
+
+    @staticmethod
+    def authorized(token: Optional[str]) -> bool:
+        expected = os.getenv("ADMIN_TOKEN", "")
+        return bool(expected) and bool(token) and hmac.compare_digest(token.encode(), expected.encode())
+
+    def start(self, label: str = "", interval_ms: Optional[float] = None, idle: bool = False) -> Profile:
+        """Open a profile; samples are added until finish() is called."""
+        interval = self.interval if interval_ms is None else max(0.001, interval_ms / 1000.0)
+        profile = Profile(label, interval, idle)
+        try:
+            asyncio.get_running_loop()
+            self._loop_thread_id = threading.get_ident()
+        except RuntimeError:
+            pass
+        with self._lock:
+            self._active[profile.profile_id] = profile
+            self.profiles_total += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return profile
+
+    def finish(self, profile: Profile) -> Profile:
+        with self._lock:
+            if self._active.pop(profile.profile_id, None) is not None:
+                profile.finished_at = time.time()
+                self._recent.append(profile)
+        return profile
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self._lock:
+            profile = self._active.get(profile_id)
+            if profile is not None:
+                return profile
+            for profile in self._recent:
+                if profile.profile_id == profile_id:
+                    return profile
+        return None
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        next_due: Dict[str, float] = {}
+        last_sample: Dict[str, float] = {}
+        while True:
+            with self._lock:
+                profiles = list(self._active.values())
+                if not profiles:
+                    self._thread = None
+                    return
+            now = time.perf_counter()
+            due = [p for p in profiles if next_due.get(p.profile_id, 0.0) <= now]
+            if due:
+                # A thread holding the GIL delays the sampler; weighting each sample by the
+                # intervals elapsed keeps CPU-bound code from being under-counted
+                weights = [
+                    max(1, round((now - last_sample[p.profile_id]) / p.interval)) if p.profile_id in last_sample else 1
+                    for p in due
+                ]
+                self._sample(due, weights, own_id)
+                for profile in due:
+                    next_due[profile.profile_id] = now + profile.interval
+                    last_sample[profile.profile_id] = now
+            live = {p.profile_id for p in profiles}
+            for profile_id in [k for k in next_due if k not in live]:
+                del next_due[profile_id]
+                last_sample.pop(profile_id, None)
+            wait = min(next_due[p.profile_id] for p in profiles if p.profile_id in next_due) - time.perf_counter()
+            self._wake.wait(max(0.0, wait))
+            self._wake.clear()
+
+    def _sample(self, profiles: List[Profile], weights: List[int], own_id: int) -> None:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        loop_id = self._loop_thread_id
+        stacks: List[tuple] = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            leaf = (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name)
+            labels: List[str] = []
+            f = frame
+            while f is not None and len(labels) < self.max_depth:
+                labels.append(_frame_label(f))
+                f = f.f_back
+            del frame, f
+            name = names.get(thread_id, f"thread-{thread_id}")
+            thread = "event-loop" if thread_id == loop_id else _thread_label(name)
+            labels.append(thread)
+            stacks.append((";".join(reversed(labels)), leaf in _IDLE_LEAVES))
+        for profile, weight in zip(profiles, weights):
+            profile.samples += 1
+            for stack, idle in stacks:
+                if idle and not profile.idle:
+                    profile.idle_samples += weight
+                    continue
+                profile.stacks[stack] += weight
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "enabled": self.enabled(),
+                "interval_ms": round(self.interval * 1000, 2),
+                "max_seconds": PROFILER_MAX_SECONDS,
+                "profiles_total": self.profiles_total,
+                "active": [p.summary() for p in self._active.values()],
+                "recent": [p.summary() for p in reversed(self._recent)],
+            }
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,316 @@
+import asyncio
+import os
+import threading
+import time
+from typing import BinaryIO, Dict, List, Optional
+
+
+# Where uploaded and streamed recordings are kept (the long-standing uploads directory; files
+# already there count towards the quota and retention), and how much of the disk they may use
+RECORDINGS_DIR = os.getenv("RECORDINGS_DIR", "server/uploads")
+RECORDINGS_QUOTA_BYTES = int(os.getenv("RECORDINGS_QUOTA_BYTES", str(1024 * 1024 * 1024)))
+RECORDINGS_MAX_FILE_BYTES = int(os.getenv("RECORDINGS_MAX_FILE_BYTES", str(100 * 1024 * 1024)))
+RECORDINGS_RETENTION = float(os.getenv("RECORDINGS_RETENTION", str(7 * 24 * 3600)))
+RECORDINGS_SWEEP_INTERVAL = float(os.getenv("RECORDINGS_SWEEP_INTERVAL", "300"))
+# Frames are batched in memory and written in one call once either limit is reached
+RECORDINGS_FLUSH_BYTES = int(os.getenv("RECORDINGS_FLUSH_BYTES", str(256 * 1024)))
+RECORDINGS_FLUSH_INTERVAL = float(os.getenv("RECORDINGS_FLUSH_INTERVAL", "1.0"))
+
+UPLOAD_READ_SIZE = 1024 * 1024
+
+
+class RecordingQuotaExceeded(Exception):
+    """Raised when a recording would exceed the disk quota or the per-file limit."""
+
+
+class RecordingWriter:
+    """Buffered writer for one recording.
+
+    write() only appends to an in-memory batch on the event loop. Full
+    batches are written by a worker thread, one at a time and in order;
+    a new batch waits for the previous write, which bounds memory per
+    recording to about two batches.
+    """
+
+    def __init__(self, store: "RecordingStore", name: str, flush_bytes: int, flush_interval: float):
+        self.store = store
+        self.name = name
+        self.path = os.path.join(store.directory, name)
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self._file: Optional[BinaryIO] = None
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+        self._pending: Optional[asyncio.Future] = None
+        self.started_at = time.time()
+        self.closed_at: Optional[float] = None
+        self.frames = 0
+        self.bytes_received = 0
+        self.bytes_reserved = 0
+        self.bytes_written = 0
+        self.writes = 0
+        self.write_seconds = 0.0
+
+    async def write(self, data: bytes) -> None:
+        if not data:
+            return
+        if self.bytes_received + len(data) > self.store.file_limit:
+            raise RecordingQuotaExceeded(f"Recording exceeds {self.store.file_limit} bytes")
+        self._buffer.append(data)
+        self._buffered += len(data)
+        self.frames += 1
+        self.bytes_received += len(data)
+        if self._buffered >= self.flush_bytes or time.monotonic() - self._last_flush >= self.flush_interval:
+            await self.flush()
+
+    async def flush(self, wait: bool = False) -> None:
+        """Hand the current batch to a worker thread (waiting for the previous write first)."""
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            await pending
+        self._last_flush = time.monotonic()
+        if self._buffer:
+            batch = b"".join(self._buffer)
+            self._buffer = []
+            self._buffered = 0
+            if not await self.store.reserve(len(batch)):
+                raise RecordingQuotaExceeded(f"Recordings quota of {self.store.quota_bytes} bytes exceeded")
+            self.bytes_reserved += len(batch)
+            self._pending = asyncio.ensure_future(asyncio.to_thread(self._write_batch, batch))
+        if wait and self._pending is not None:
+            pending, self._pending = self._pending, None
+            await pending
+
+    def _write_batch(self, batch: bytes) -> None:
+        started = time.perf_counter()
+        try:
+            if self._file is None:
+                self._file = self.store._open(self.path)
+            self._file.write(batch)
+        except OSError:
+            self.bytes_reserved -= len(batch)
+            self.store._release(len(batch))
+            raise
+        self.bytes_written += len(batch)
+        self.writes += 1
+        self.write_seconds += time.perf_counter() - started
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    async def close(self) -> None:
+        """Write what is buffered and close the file. Safe to call more than once."""
+        if self.closed_at is not None:
+            return
+        try:
+            await self.flush(wait=True)
+        finally:
+            self.closed_at = time.time()
+            await asyncio.to_thread(self._close_file)
+            self.store._finished(self)
+
+    def _remove_file(self) -> None:
+        try:
+            os.remove(self.path)
+        except OSError:
+            return
+        self.store._release(self.bytes_written)
+
+    async def discard(self) -> None:
+        """Close and delete a partial recording."""
+        try:
+            await self.close()
+        finally:
+            await asyncio.to_thread(self._remove_file)
+
+    def stats(self) -> Dict[str, object]:
+        elapsed = max((self.closed_at or time.time()) - self.started_at, 1e-6)
+        return {
+            "name": self.name,
+            "frames": self.frames,
+            "bytes_received": self.bytes_received,
+            "bytes_written": self.bytes_written,
+            "buffered_bytes": self._buffered,
+            "writes": self.writes,
+            "avg_write_ms": round(self.write_seconds / self.writes * 1000, 3) if self.writes else 0.0,
+            "duration_seconds": round(elapsed, 3),
+            "throughput_bytes_per_second": round(self.bytes_received / elapsed, 1),
+        }
+
+
+class RecordingStore:
+    """Recordings directory with a disk quota and retention TTL.
+
+    - Disk usage is tracked as batches are reserved, so quota checks never scan the disk
+    - A background sweeper deletes recordings older than `retention` seconds and,
+      when over quota, the oldest finished recordings; it also resyncs usage with the disk
+    - Files of recordings still being written are never deleted
+    """
+
+    def __init__(
+        self,
+        directory: str = RECORDINGS_DIR,
+        quota_bytes: int = RECORDINGS_QUOTA_BYTES,
+        max_file_bytes: int = RECORDINGS_MAX_FILE_BYTES,
+        retention: float = RECORDINGS_RETENTION,
+        flush_bytes: int = RECORDINGS_FLUSH_BYTES,
+        flush_interval: float = RECORDINGS_FLUSH_INTERVAL,
+    ):
+        self.directory = directory
+        self.quota_bytes = quota_bytes
+        self.max_file_bytes = max_file_bytes
+        self.retention = retention
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._usage: Optional[int] = None
+        self._active: Dict[str, RecordingWriter] = {}
+        self._recent: List[Dict[str, object]] = []
+        self.recordings_total = 0
+        self.bytes_total = 0
+        self.quota_rejections = 0
+        self.deleted_expired = 0
+        self.deleted_for_quota = 0
+
+    # ---- disk bookkeeping (blocking; called from worker threads) ----
+    def _scan(self) -> List[os.DirEntry]:
+        if not os.path.isdir(self.directory):
+            return []
+        return [e for e in os.scandir(self.directory) if e.is_file()]
+
+    def _resync(self) -> int:
+        total = sum(e.stat().st_size for e in self._scan())
+        with self._lock:
+            # Bytes reserved for batches not yet on disk stay counted
+            pending = sum(w.bytes_reserved - w.bytes_written for w in list(self._active.values()))
+            self._usage = total + pending
+        return total
+
+    def _open(self, path: str) -> BinaryIO:
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(path):
+            self._release(os.path.getsize(path))
+        # Unbuffered: batches are already large, and on-disk sizes stay exact for the quota
+        return open(path, "wb", buffering=0)
+
+    def _release(self, size: int) -> None:
+        with self._lock:
+            if self._usage is not None:
+                self._usage = max(0, self._usage - size)
+
+    def _cleanup(self, need: int = 0) -> int:
+        """Delete expired recordings, then the oldest ones until `need` more bytes fit the quota."""
+        now = time.time()
+        active = {w.path for w in list(self._active.values())}
+        entries = sorted(
+            ((e, e.stat()) for e in self._scan() if e.path not in active),
+            key=lambda item: item[1].st_mtime,
+        )
+        self._resync()
+        deleted = 0
+        for entry, st in entries:
+            expired = now - st.st_mtime > self.retention
+            with self._lock:
+                over_quota = self._usage + need > self.quota_bytes
+            if not (expired or over_quota):
+                continue
+            try:
+                os.remove(entry.path)
+            except OSError:
+                continue
+            self._release(st.st_size)
+            deleted += 1
+            if expired:
+                self.deleted_expired += 1
+            else:
+                self.deleted_for_quota += 1
+        return deleted
+
+    @property
+    def file_limit(self) -> int:
+        """Largest single recording accepted (a file larger than the whole quota can never fit)."""
+        return min(self.max_file_bytes, self.quota_bytes)
+
+    # ---- public API ----
+    def open_recording(self, name: str) -> RecordingWriter:
+        """Start a recording under the recordings directory (name is reduced to its base name)."""
+        name = os.path.basename(name or "") or f"recording-{int(time.time() * 1000)}"
+        writer = RecordingWriter(self, name, self.flush_bytes, self.flush_interval)
+        self._active[writer.path] = writer
+        self.recordings_total += 1
+        return writer
+
+    async def reserve(self, size: int) -> bool:
+        """Account for `size` bytes about to be written, freeing old recordings if needed."""
+        if self._usage is None:
+            await asyncio.to_thread(self._resync)
+        with self._lock:
+            if self._usage + size <= self.quota_bytes:
+                self._usage += size
+                self.bytes_total += size
+                return True
+        await asyncio.to_thread(self._cleanup, size)
+        with self._lock:
+            if self._usage + size <= self.quota_bytes:
+                self._usage += size
+                self.bytes_total += size
+                return True
+        self.quota_rejections += 1
+        return False
+
+    async def save_upload(self, name: str, upload) -> RecordingWriter:
+        """Copy an UploadFile into the store in large chunks without blocking the loop."""
+        size = getattr(upload, "size", None)
+        if size is not None and size > self.file_limit:
+            self.quota_rejections += 1
+            raise RecordingQuotaExceeded(f"Recording exceeds {self.file_limit} bytes")
+        writer = self.open_recording(name)
+        try:
+            while True:
+                chunk = await upload.read(UPLOAD_READ_SIZE)
+                if not chunk:
+                    break
+                await writer.write(chunk)
+            await writer.close()
+        except BaseException:
+            await writer.discard()
+            raise
+        return writer
+
+    def _finished(self, writer: RecordingWriter) -> None:
+        self._active.pop(writer.path, None)
+        self._recent.append(writer.stats())
+        del self._recent[:-20]
+
+    async def run_sweeper(self, interval: float = RECORDINGS_SWEEP_INTERVAL) -> None:
+        """Background task: enforce retention and quota, resync disk usage."""
+        while True:
+            try:
+                deleted = await asyncio.to_thread(self._cleanup)
+                if deleted:
+                    print(f"[RECORDINGS] Deleted {deleted} old recordings ({self._usage} bytes in use)", flush=True)
+            except Exception as exc:
+                print(f"[RECORDINGS] Sweep failed: {exc}", flush=True)
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "directory": self.directory,
+            "usage_bytes": self._usage,
+            "quota_bytes": self.quota_bytes,
+            "max_file_bytes": self.file_limit,
+            "retention_seconds": self.retention,
+            "recordings_total": self.recordings_total,
+            "bytes_total": self.bytes_total,
+            "quota_rejections": self.quota_rejections,
+            "deleted_expired": self.deleted_expired,
+            "deleted_for_quota": self.deleted_for_quota,
+            "active": [w.stats() for w in list(self._active.values())],
+            "recent": list(self._recent),
+        }
+
+
+recording_store = RecordingStore()
@@ -0,0 +1,78 @@
+import re
+from typing import List, Optional
+
+
+# Sentence terminators, optionally followed by closing quotes/brackets, then whitespace
+_SENTENCE_END = re.compile(r"[.!?…]+[\"')\]]*\s+|\n+")
+# Clause boundaries we are willing to break on once a segment gets long
+_CLAUSE_END = re.compile(r"[,;:—–]\s+")
+
+
+class SentenceChunker:
+    """Incrementally split an LLM token stream into speakable TTS segments.
+
+    Text is fed as it arrives; complete sentences are released immediately.
+    Long run-on sentences are cut at clause boundaries, and as a last resort
+    at whitespace, so TTS never waits on an unbounded buffer. The first
+    segment uses a lower clause threshold to get audio started sooner.
+    """
+
+    def __init__(
+        self,
+        min_chars: int = 20,
+        first_clause_chars: int = 40,
+        clause_chars: int = 100,
+        max_chars: int = 240,
+    ):
+        self.min_chars = min_chars
+        self.first_clause_chars = first_clause_chars
+        self.clause_chars = clause_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+        self._emitted = 0
+
+    def _split_index(self) -> Optional[int]:
+        buf = self._buffer
+        for match in _SENTENCE_END.finditer(buf):
+            if match.end() >= self.min_chars and buf[: match.start()].strip():
+                return match.end()
+
+        clause_limit = self.first_clause_chars if self._emitted == 0 else self.clause_chars
+        if len(buf) >= clause_limit:
+            cut = None
+            for match in _CLAUSE_END.finditer(buf):
+                if match.end() >= self.min_chars:
+                    cut = match.end()
+            if cut is not None:
+                return cut
+
+        if len(buf) >= self.max_chars:
+            cut = buf.rfind(" ", 0, self.max_chars)
+            return cut + 1 if cut > 0 else self.max_chars
+        return None
+
+    def feed(self, delta: str) -> List[str]:
+        """Add streamed text and return any segments that are ready to speak."""
+        if not delta:
+            return []
+        self._buffer += delta
+        segments: List[str] = []
+        while True:
+            idx = self._split_index()
+            if idx is None:
+                break
+            segment = self._buffer[:idx].strip()
+            self._buffer = self._buffer[idx:]
+            if segment:
+                segments.append(segment)
+                self._emitted += 1
+        return segments
+
+    def flush(self) -> Optional[str]:
+        """Return whatever text remains once the stream has ended."""
+        segment = self._buffer.strip()
+        self._buffer = ""
+        if not segment:
+            return None
+        self._emitted += 1
+        return segment
@@ -0,0 +1,310 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+# Backend selection: "memory" (default, per-process) or "sqlite" (shared across workers)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").strip().lower()
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "server/sessions.db")
+# Write-behind batching: flush at most every interval seconds or once a batch fills up
+SESSION_WRITE_BEHIND_INTERVAL = float(os.getenv("SESSION_WRITE_BEHIND_INTERVAL", "0.05"))
+SESSION_WRITE_BATCH_SIZE = int(os.getenv("SESSION_WRITE_BATCH_SIZE", "256"))
+# Sessions not updated for this long are purged from the database
+SESSION_DB_RETENTION = float(os.getenv("SESSION_DB_RETENTION", str(7 * 24 * 3600)))
+
+
+class SessionBackend:
+    """Persistence interface behind SessionStore.
+
+    The store keeps hot sessions in memory and calls the backend to load a
+    session it does not have and to record every change. Backends with
+    `shared = True` are visible to other worker processes, so the store
+    periodically revalidates its cached copy against them. API keys are
+    never handed to a backend; they stay in the memory of the worker that
+    received them.
+    """
+
+    name = "base"
+    shared = False
+
+    def load(self, session_id: str, max_messages: int) -> Optional[Dict[str, Any]]:
+        """Return {"persona_id", "messages"} or None if unknown."""
+        return None
+
+    def append_messages(self, session_id: str, messages: List[Dict[str, str]]) -> None:
+        pass
+
+    def save_persona(self, session_id: str, persona_id: str) -> None:
+        pass
+
+    def has_pending(self, session_id: str) -> bool:
+        """True if writes for the session have not reached storage yet."""
+        return False
+
+    def purge(self, older_than: float) -> None:
+        pass
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class MemorySessionBackend(SessionBackend):
+    """Default backend: the store's in-memory state is the only copy."""
+
+    name = "memory"
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    persona_id TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id, id);
+CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions(updated_at);
+"""
+
+_UPSERT_SESSION = (
+    "INSERT INTO sessions(session_id, updated_at) VALUES (?, ?) "
+    "ON CONFLICT(session_id) DO UPDATE SET updated_at = excluded.updated_at"
+)
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """SQLite (WAL) backend with a write-behind queue.
+
+    Writes are queued and applied by one background thread in batched
+    transactions, so request handlers never wait on disk. Reads use a
+    per-thread connection; WAL lets them run alongside the writer and
+    alongside other worker processes using the same file.
+    """
+
+    name = "sqlite"
+    shared = True
+
+    def __init__(
+        self,
+        path: str = SESSION_DB_PATH,
+        flush_interval: float = SESSION_WRITE_BEHIND_INTERVAL,
+        batch_size: int = SESSION_WRITE_BATCH_SIZE,
+    ):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = max(1, batch_size)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+            self._drop_api_keys_column(conn)
+        finally:
+            conn.close()
+
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._pending: Dict[str, int] = {}
+        self._pending_lock = threading.Lock()
+        self._local = threading.local()
+        self.ops_written = 0
+        self.batches_written = 0
+        self.write_errors = 0
+        self._closed = False
+        self._writer = threading.Thread(target=self._writer_loop, name="session-write-behind", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    @staticmethod
+    def _drop_api_keys_column(conn: sqlite3.Connection) -> None:
+        """Remove the plaintext api_keys column left by databases created by older versions."""
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(sessions)")]
+        if "api_keys" not in columns:
+            return
+        try:
+            conn.execute("ALTER TABLE sessions DROP COLUMN api_keys")
+        except sqlite3.OperationalError:
+            # SQLite before 3.35 cannot drop columns; blank the stored keys instead
+            conn.execute("UPDATE sessions SET api_keys = '{}'")
+        print("[SESSIONS] Removed stored API keys from the session database", flush=True)
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    # ---- reads ----
+    def load(self, session_id: str, max_messages: int) -> Optional[Dict[str, Any]]:
+        conn = self._reader()
+        row = conn.execute(
+            "SELECT persona_id FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        rows = conn.execute(
+            "SELECT role, text FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (session_id, max_messages),
+        ).fetchall()
+        return {
+            "persona_id": row[0],
+            "messages": [{"role": role, "text": text} for role, text in reversed(rows)],
+        }
+
+    # ---- queued writes ----
+    def _enqueue(self, op: tuple, session_id: Optional[str] = None) -> None:
+        if self._closed:
+            return
+        if session_id:
+            with self._pending_lock:
+                self._pending[session_id] = self._pending.get(session_id, 0) + 1
+        self._queue.put(op)
+
+    def append_messages(self, session_id: str, messages: List[Dict[str, str]]) -> None:
+        self._enqueue(("append", session_id, [dict(m) for m in messages], time.time()), session_id)
+
+    def save_persona(self, session_id: str, persona_id: str) -> None:
+        self._enqueue(("persona", session_id, persona_id, time.time()), session_id)
+
+    def purge(self, older_than: float) -> None:
+        self._enqueue(("purge", None, older_than, time.time()))
+
+    def has_pending(self, session_id: str) -> bool:
+        with self._pending_lock:
+            return self._pending.get(session_id, 0) > 0
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Block until everything queued so far has been written."""
+        if self._closed:
+            return
+        done = threading.Event()
+        self._queue.put(("flush", None, done, 0.0))
+        done.wait(timeout)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self.flush(timeout=10.0)
+        self._closed = True
+        self._queue.put(("stop", None, None, 0.0))
+        self._writer.join(timeout=5.0)
+
+    # ---- writer thread ----
+    def _writer_loop(self) -> None:
+        conn = self._connect()
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1][0] not in ("flush", "stop"):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            running = self._apply(conn, batch)
+        conn.close()
+
+    def _write_op(self, conn: sqlite3.Connection, kind: str, session_id: Optional[str], value: Any, ts: float) -> None:
+        if kind == "append":
+            conn.execute(_UPSERT_SESSION, (session_id, ts))
+            conn.executemany(
+                "INSERT INTO messages(session_id, role, text, created_at) VALUES (?, ?, ?, ?)",
+                [(session_id, m.get("role", ""), m.get("text", ""), ts) for m in value],
+            )
+        elif kind == "persona":
+            conn.execute(_UPSERT_SESSION, (session_id, ts))
+            conn.execute("UPDATE sessions SET persona_id = ? WHERE session_id = ?", (value, session_id))
+        elif kind == "purge":
+            conn.execute(
+                "DELETE FROM messages WHERE session_id IN (SELECT session_id FROM sessions WHERE updated_at < ?)",
+                (value,),
+            )
+            conn.execute("DELETE FROM sessions WHERE updated_at < ?", (value,))
+
+    def _apply(self, conn: sqlite3.Connection, batch: List[tuple]) -> bool:
+        """Write one batch in a transaction; each op has its own savepoint, so a bad
+        record is dropped on its own instead of rolling back other sessions' writes."""
+        running = not any(kind == "stop" for kind, _, _, _ in batch)
+        waiters = [value for kind, _, value, _ in batch if kind == "flush"]
+        # Every queued op counts as done afterwards, whether or not it was written
+        touched = [session_id for _, session_id, _, _ in batch if session_id]
+        written = 0
+        try:
+            conn.execute("BEGIN")
+            for kind, session_id, value, ts in batch:
+                if kind in ("flush", "stop"):
+                    continue
+                conn.execute("SAVEPOINT op")
+                try:
+                    self._write_op(conn, kind, session_id, value, ts)
+                except Exception as exc:
+                    conn.execute("ROLLBACK TO op")
+                    self.write_errors += 1
+                    print(f"[SESSIONS] Dropped {kind} write for session {session_id}: {exc}", flush=True)
+                else:
+                    written += 1
+                conn.execute("RELEASE op")
+            conn.execute("COMMIT")
+            self.ops_written += written
+            self.batches_written += 1
+        except Exception as exc:
+            self.write_errors += 1
+            print(f"[SESSIONS] Write-behind batch of {len(batch)} failed: {exc}", flush=True)
+            try:
+                conn.execute("ROLLBACK")
+            except Exception:
+                pass
+        finally:
+            with self._pending_lock:
+                for session_id in touched:
+                    remaining = self._pending.get(session_id, 0) - 1
+                    if remaining > 0:
+                        self._pending[session_id] = remaining
+                    else:
+                        self._pending.pop(session_id, None)
+            for event in waiters:
+                event.set()
+        return running
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "path": self.path,
+            "queued": self._queue.qsize(),
+            "ops_written": self.ops_written,
+            "batches_written": self.batches_written,
+            "write_errors": self.write_errors,
+        }
+
+
+def create_session_backend(kind: str = SESSION_BACKEND) -> SessionBackend:
+    """Build the backend selected by SESSION_BACKEND."""
+    if kind == "sqlite":
+        return SQLiteSessionBackend()
+    if kind not in ("", "memory"):
+        print(f"[SESSIONS] Unknown SESSION_BACKEND '{kind}', using memory", flush=True)
+    return MemorySessionBackend()
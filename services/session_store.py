@@ -0,0 +1,324 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from .cache import TTLCache
+from .session_backend import SessionBackend, MemorySessionBackend, create_session_backend, SESSION_DB_RETENTION
+
+
+# Bounds for per-worker session state
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "3600"))
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+# Messages retained per session (served by the history endpoint)
+SESSION_HISTORY_MAX_MESSAGES = int(os.getenv("SESSION_HISTORY_MAX_MESSAGES", "200"))
+# Prompt window: most recent turns that fit both limits are sent to the LLM
+SESSION_WINDOW_TURNS = int(os.getenv("SESSION_WINDOW_TURNS", "20"))
+SESSION_WINDOW_TOKENS = int(os.getenv("SESSION_WINDOW_TOKENS", "4000"))
+# With a shared backend, cached sessions older than this are reloaded (other workers may have written)
+SESSION_REVALIDATE_SECONDS = float(os.getenv("SESSION_REVALIDATE_SECONDS", "1.0"))
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used for prompt windowing."""
+    return max(1, len(text) // 4)
+
+
+class SessionState:
+    """Chat history, persona and API keys for one session."""
+
+    __slots__ = ("history", "persona_id", "api_keys", "created_at", "last_access", "loaded_at")
+
+    def __init__(self, max_messages: int):
+        self.history: Deque[Dict[str, str]] = deque(maxlen=max_messages)
+        self.persona_id: Optional[str] = None
+        self.api_keys: Dict[str, str] = {}
+        self.created_at = time.time()
+        self.last_access = time.monotonic()
+        self.loaded_at = self.last_access
+
+    def hydrate(self, record: Dict[str, object]) -> None:
+        """Replace contents with a record loaded from the backend (API keys are kept)."""
+        self.history.clear()
+        self.history.extend(record.get("messages") or [])
+        self.persona_id = record.get("persona_id") or None
+        self.loaded_at = time.monotonic()
+
+
+class SessionStore:
+    """Bounded, evicting in-memory store for per-session state.
+
+    - Sessions idle for longer than idle_ttl are evicted by a background sweeper
+    - At most max_sessions are kept; the least recently used is evicted first
+    - Each session's history is an append-only deque capped at max_messages
+    - window() returns the recent messages that fit a turn and token budget
+    - Every change is also handed to a pluggable SessionBackend; sessions not
+      in memory are loaded from it, so a shared backend (SQLite) keeps history
+      across restarts and across uvicorn workers; API keys are never persisted
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = SESSION_MAX_SESSIONS,
+        idle_ttl: float = SESSION_IDLE_TTL,
+        max_messages: int = SESSION_HISTORY_MAX_MESSAGES,
+        window_turns: int = SESSION_WINDOW_TURNS,
+        window_tokens: int = SESSION_WINDOW_TOKENS,
+        backend: Optional[SessionBackend] = None,
+        revalidate_seconds: float = SESSION_REVALIDATE_SECONDS,
+    ):
+        self.backend = backend or MemorySessionBackend()
+        self.revalidate_seconds = revalidate_seconds
+        self.max_sessions = max(1, max_sessions)
+        self.idle_ttl = idle_ttl
+        self.max_messages = max(2, max_messages)
+        self.window_turns = window_turns
+        self.window_tokens = window_tokens
+        self._sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._refreshing: Set[str] = set()
+        # Ids looked up and not found; trusted by the accessors until the next ensure() reloads them
+        self._absent = TTLCache(maxsize=self.max_sessions, ttl=max(idle_ttl, revalidate_seconds, 1.0), name="sessions_absent")
+        self.evicted_idle = 0
+        self.evicted_capacity = 0
+
+    def _lookup(self, session_id: str, now: float) -> Tuple[Optional[SessionState], bool]:
+        """Cached state (or None) and whether it is due for revalidation against a shared backend."""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None:
+                return None, False
+            self._sessions.move_to_end(session_id)
+            state.last_access = now
+            due = (
+                self.backend.shared
+                and now - state.loaded_at > self.revalidate_seconds
+                and not self.backend.has_pending(session_id)
+            )
+            return state, due
+
+    def _merge(
+        self, session_id: str, record: Optional[Dict[str, object]], create: bool, now: float
+    ) -> Optional[SessionState]:
+        """Cache a record loaded from the backend (or a new empty session when create is set)."""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if record is None and state is None:
+                if not create:
+                    self._absent.set(session_id, True)
+                    return None
+                state = SessionState(self.max_messages)
+            elif state is None:
+                state = SessionState(self.max_messages)
+                state.hydrate(record)
+            elif record is not None and not self.backend.has_pending(session_id):
+                state.hydrate(record)
+            else:
+                state.loaded_at = now
+            if session_id not in self._sessions:
+                self._absent.pop(session_id)
+                self._sessions[session_id] = state
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evicted_capacity += 1
+            self._sessions.move_to_end(session_id)
+            state.last_access = now
+            return state
+
+    def _refresh(self, session_id: str) -> None:
+        """Reload a cached session from the shared backend (runs on a worker thread)."""
+        try:
+            record = self.backend.load(session_id, self.max_messages)
+            with self._lock:
+                if session_id in self._sessions:
+                    self._merge(session_id, record, False, time.monotonic())
+        except Exception as exc:
+            print(f"[SESSIONS] Revalidating {session_id[:8]} failed: {exc}", flush=True)
+        finally:
+            with self._lock:
+                self._refreshing.discard(session_id)
+
+    def _schedule_refresh(self, session_id: str) -> None:
+        with self._lock:
+            if session_id in self._refreshing:
+                return
+            self._refreshing.add(session_id)
+        try:
+            asyncio.get_running_loop().run_in_executor(None, self._refresh, session_id)
+        except RuntimeError:
+            self._refresh(session_id)  # No event loop in this thread: nothing to block
+
+    def _get(self, session_id: Optional[str], create: bool = False) -> Optional[SessionState]:
+        if not session_id:
+            return None
+        now = time.monotonic()
+        state, due = self._lookup(session_id, now)
+        if state is not None:
+            if due:
+                # Serve the cached copy; the reload from the shared backend happens off the loop
+                self._schedule_refresh(session_id)
+            return state
+        if self._absent.get(session_id) or _on_event_loop():
+            # Known absent, or a cold miss inside an async handler: ensure() already had its
+            # chance to load the session, so never read the backend on the event loop
+            record = None
+        else:
+            record = self.backend.load(session_id, self.max_messages)
+        return self._merge(session_id, record, create, now)
+
+    async def ensure(self, session_id: Optional[str]) -> None:
+        """Load or revalidate a session on a worker thread, so the accessors that follow
+        find it cached and never read the backend on the event loop."""
+        if not session_id:
+            return
+        now = time.monotonic()
+        state, due = self._lookup(session_id, now)
+        if state is not None and not due:
+            return
+        if state is None and not self.backend.shared:
+            return  # Nothing persisted to load
+        # Also rechecks ids marked absent: another worker may have created the session since
+        record = await asyncio.to_thread(self.backend.load, session_id, self.max_messages)
+        self._merge(session_id, record, False, now)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    # ---- history ----
+    def get_history(self, session_id: Optional[str]) -> List[Dict[str, str]]:
+        """All retained messages for the session (oldest first)."""
+        state = self._get(session_id)
+        if state is None:
+            return []
+        with self._lock:
+            return list(state.history)
+
+    def history_len(self, session_id: Optional[str]) -> int:
+        state = self._get(session_id)
+        return len(state.history) if state is not None else 0
+
+    def window(self, session_id: Optional[str]) -> List[Dict[str, str]]:
+        """Most recent messages within the turn and token window (oldest first)."""
+        state = self._get(session_id)
+        if state is None:
+            return []
+        max_messages = self.window_turns * 2 if self.window_turns > 0 else len(state.history)
+        selected: List[Dict[str, str]] = []
+        tokens = 0
+        with self._lock:
+            for msg in reversed(state.history):
+                if len(selected) >= max_messages:
+                    break
+                cost = estimate_tokens(msg.get("text", ""))
+                if self.window_tokens > 0 and selected and tokens + cost > self.window_tokens:
+                    break
+                selected.append(msg)
+                tokens += cost
+        selected.reverse()
+        # Gemini expects the conversation to start with a user message
+        while selected and selected[0].get("role") != "user":
+            selected.pop(0)
+        return selected
+
+    def append_turn(self, session_id: Optional[str], user_text: str, model_text: str) -> None:
+        """Append a user/model exchange in place."""
+        state = self._get(session_id, create=True)
+        if state is None:
+            return
+        messages = [{"role": "user", "text": user_text}, {"role": "model", "text": model_text}]
+        with self._lock:
+            state.history.extend(messages)
+        self.backend.append_messages(session_id, messages)
+
+    # ---- persona ----
+    def get_persona(self, session_id: Optional[str], default: str = "robot") -> str:
+        state = self._get(session_id)
+        if state is None or not state.persona_id:
+            return default
+        return state.persona_id
+
+    def set_persona(self, session_id: str, persona_id: str) -> None:
+        state = self._get(session_id, create=True)
+        if state is not None:
+            state.persona_id = persona_id
+            self.backend.save_persona(session_id, persona_id)
+
+    # ---- per-session API keys ----
+    def get_api_keys(self, session_id: Optional[str]) -> Dict[str, str]:
+        state = self._get(session_id)
+        return dict(state.api_keys) if state is not None else {}
+
+    def update_api_keys(self, session_id: str, keys: Dict[str, str]) -> Dict[str, str]:
+        state = self._get(session_id, create=True)
+        if state is None:
+            return {}
+        with self._lock:
+            state.api_keys.update(keys)
+            return dict(state.api_keys)
+
+    # ---- eviction ----
+    def evict_idle(self) -> int:
+        """Drop sessions idle for longer than idle_ttl from memory. Returns the number evicted.
+
+        A persistent backend keeps the evicted sessions; they are reloaded on next access.
+        """
+        if self.idle_ttl <= 0:
+            return 0
+        cutoff = time.monotonic() - self.idle_ttl
+        evicted = 0
+        with self._lock:
+            # OrderedDict is in access order, so idle sessions are at the front
+            while self._sessions:
+                session_id, state = next(iter(self._sessions.items()))
+                if state.last_access > cutoff:
+                    break
+                del self._sessions[session_id]
+                evicted += 1
+        self.evicted_idle += evicted
+        return evicted
+
+    async def run_sweeper(self, interval: float = SESSION_SWEEP_INTERVAL) -> None:
+        """Background task: periodically evict idle sessions."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                evicted = self.evict_idle()
+                if evicted:
+                    print(f"[SESSIONS] Evicted {evicted} idle sessions ({len(self)} active)", flush=True)
+                self.backend.purge(time.time() - SESSION_DB_RETENTION)
+            except Exception as exc:
+                print(f"[SESSIONS] Sweep failed: {exc}", flush=True)
+
+    def close(self) -> None:
+        """Flush pending backend writes (called on shutdown)."""
+        self.backend.close()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "backend": self.backend.stats(),
+            "active_sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "idle_ttl_seconds": self.idle_ttl,
+            "max_messages_per_session": self.max_messages,
+            "window_turns": self.window_turns,
+            "window_tokens": self.window_tokens,
+            "evicted_idle": self.evicted_idle,
+            "evicted_capacity": self.evicted_capacity,
+        }
+
+
+session_store = SessionStore(backend=create_session_backend())
@@ -1,22 +1,150 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
 import assemblyai as aai
 
+from .cache import TTLCache
+from .egress import egress
+from .metrics import STT_SECONDS
 
-def transcribe_audio_bytes(audio_bytes: bytes, api_key: str) -> str:
-    """Transcribe raw audio bytes using AssemblyAI SDK and return the text.
+
+# Batch transcription runs on a bounded worker pool; requests beyond
+# STT_MAX_WORKERS wait in a queue of at most STT_MAX_QUEUE jobs
+STT_MAX_WORKERS = int(os.getenv("STT_MAX_WORKERS", "8"))
+STT_MAX_QUEUE = int(os.getenv("STT_MAX_QUEUE", "32"))
+# One SDK client (and its keep-alive pool) per API key
+STT_CLIENT_CACHE_SIZE = int(os.getenv("STT_CLIENT_CACHE_SIZE", "64"))
+STT_CLIENT_TTL = float(os.getenv("STT_CLIENT_TTL", "3600"))
+
+
+class TranscriptionQueueFull(Exception):
+    """Raised when the transcription queue is at its maximum depth."""
+
+
+_transcribers = TTLCache(maxsize=STT_CLIENT_CACHE_SIZE, ttl=STT_CLIENT_TTL, name="stt_clients")
+_transcribers_lock = threading.Lock()
+
+
+def get_transcriber(api_key: str) -> aai.Transcriber:
+    """Transcriber bound to api_key (the global aai.settings.api_key is never modified)."""
+    with _transcribers_lock:
+        transcriber = _transcribers.get(api_key)
+        if transcriber is None:
+            transcriber = aai.Transcriber(client=aai.Client(api_key=api_key), max_workers=1)
+            _transcribers.set(api_key, transcriber)
+        return transcriber
+
+
+def transcribe(audio_bytes: bytes, api_key: str, endpoint: str = "") -> aai.Transcript:
+    """Upload and transcribe audio (blocking), timing each stage.
 
     Attempts to use SDK upload helper when available, otherwise falls back to
     passing raw bytes directly to the transcriber.
     """
-    aai.settings.api_key = api_key
-    transcriber = aai.Transcriber()
+    transcriber = get_transcriber(api_key)
+    source = audio_bytes
+    if hasattr(transcriber, "upload_file"):
+        with STT_SECONDS.time(stage="upload", endpoint=endpoint):
+            source = transcriber.upload_file(audio_bytes)  # type: ignore[attr-defined]
+    with STT_SECONDS.time(stage="transcribe", endpoint=endpoint):
+        return transcriber.transcribe(source)
 
-    try:
-        upload_url = transcriber.upload_file(audio_bytes)  # type: ignore[attr-defined]
-        transcript = transcriber.transcribe(upload_url)
-    except AttributeError:
-        transcript = transcriber.transcribe(audio_bytes)
 
-    return (transcript.text or "").strip()
+def transcribe_audio_bytes(audio_bytes: bytes, api_key: str) -> str:
+    """Transcribe raw audio bytes using AssemblyAI SDK and return the text (blocking)."""
+    return (transcribe(audio_bytes, api_key).text or "").strip()
 
 
+class TranscriptionExecutor:
+    """Runs blocking AssemblyAI upload-and-poll jobs off the event loop.
 
+    - At most max_workers jobs run at once; up to max_queue more wait for a worker
+    - Further submissions fail fast with TranscriptionQueueFull
+    - Time spent queued is recorded as the "queue" stage of voice_stt_seconds
+    """
+
+    def __init__(self, max_workers: int = STT_MAX_WORKERS, max_queue: int = STT_MAX_QUEUE):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stt")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _run(self, audio_bytes: bytes, api_key: str, endpoint: str, queued_at: float) -> aai.Transcript:
+        STT_SECONDS.observe(time.perf_counter() - queued_at, stage="queue", endpoint=endpoint)
+        with self._lock:
+            self.running += 1
+        try:
+            transcript = transcribe(audio_bytes, api_key, endpoint)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.running -= 1
+        with self._lock:
+            self.completed += 1
+        return transcript
+
+    def _done(self, _future) -> None:
+        # Also called for jobs cancelled before they started
+        with self._lock:
+            self.in_flight -= 1
+
+    async def transcribe(self, audio_bytes: bytes, api_key: str, endpoint: str = "") -> aai.Transcript:
+        """Transcribe on the worker pool. Raises TranscriptionQueueFull when the queue is full."""
+        with self._lock:
+            if self.in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise TranscriptionQueueFull(
+                    f"Transcription queue is full ({self.in_flight} jobs, max {self.max_workers + self.max_queue})"
+                )
+            self.in_flight += 1
+            self.submitted += 1
+        queued_at = time.perf_counter()
+        future = None
+        try:
+            # Job time grows with audio length, so only 429s and errors steer the upstream limit
+            async with egress.slot("assemblyai", api_key, measure_latency=False):
+                future = self._pool.submit(self._run, audio_bytes, api_key, endpoint, queued_at)
+                future.add_done_callback(self._done)
+                # Cancelling the awaiting request drops the job if it has not started yet
+                return await asyncio.wrap_future(future)
+        finally:
+            if future is None:
+                self._done(None)  # Gave up waiting for an upstream slot
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "queued": max(0, self.in_flight - self.running),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+            }
+
+
+transcription_executor = TranscriptionExecutor()
+
+
+async def transcribe_audio_bytes_async(audio_bytes: bytes, api_key: str, endpoint: str = "") -> str:
+    """Awaitable transcribe_audio_bytes: runs on the shared executor and returns the text."""
+    transcript = await transcription_executor.transcribe(audio_bytes, api_key, endpoint)
+    return (transcript.text or "").strip()
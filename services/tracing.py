@@ -0,0 +1,384 @@
+import asyncio
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Optional
+
+
+# Per-turn traces: nested spans kept in memory and exported to TRACE_DIR
+TRACING_ENABLED = str(os.getenv("TRACING_ENABLED", "true")).lower() in {"1", "true", "yes", "on"}
+TRACE_DIR = os.getenv("TRACE_DIR", "server/traces")
+# Comma-separated: "jsonl" (one trace per line) and/or "chrome" (chrome://tracing / Perfetto); empty = memory only
+TRACE_EXPORT = [f.strip() for f in os.getenv("TRACE_EXPORT", "jsonl").split(",") if f.strip()]
+TRACE_RECENT = int(os.getenv("TRACE_RECENT", "100"))
+# Bounds per trace, so a long reply cannot grow a trace without limit
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "500"))
+TRACE_MAX_EVENTS = int(os.getenv("TRACE_MAX_EVENTS", "1000"))
+# Traces slower than this are logged with their id
+TRACE_LOG_SLOW_MS = float(os.getenv("TRACE_LOG_SLOW_MS", "3000"))
+
+# perf_counter() is used for timing; this maps it to wall-clock time
+_WALL_OFFSET = time.time() - time.perf_counter()
+
+
+def _wall(t: float) -> float:
+    return _WALL_OFFSET + t
+
+
+def _lane() -> str:
+    """Name of what is running: the asyncio task, or the thread outside the loop."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is None:
+        return threading.current_thread().name
+    name = task.get_name()
+    if ".<locals>." in name:
+        # Tasks named after nested functions (e.g. Starlette's call_next.<locals>.coro): keep the tail
+        parts = name.split(".<locals>.")
+        name = f"{parts[-2].rsplit('.', 1)[-1]}.{parts[-1]}"
+    return name
+
+
+class Span:
+    """A timed stage of a trace, with attributes and instant events."""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start", "end", "attrs", "events", "error", "lane")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], start: float, attrs: Dict[str, object]):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent_id = parent_id
+        self.name = name
+        self.start = start
+        self.end: Optional[float] = None
+        self.attrs = attrs
+        self.events: List[tuple] = []
+        self.error: Optional[str] = None
+        self.lane = _lane()
+
+    def set(self, **attrs: object) -> None:
+        if not self.trace.closed:
+            self.attrs.update(attrs)
+
+    def event(self, name: str, **attrs: object) -> None:
+        """Record an instant event (e.g. one audio chunk) on this span."""
+        if self.trace.closed:
+            return
+        if self.trace.events < TRACE_MAX_EVENTS:
+            self.trace.events += 1
+            self.events.append((name, time.perf_counter(), attrs))
+        else:
+            self.trace.dropped += 1
+
+    def finish(self, error: Optional[BaseException] = None, end: Optional[float] = None) -> None:
+        if self.end is not None:
+            return
+        if error is not None:
+            self.error = "cancelled" if isinstance(error, asyncio.CancelledError) else f"{type(error).__name__}: {error}"
+        self.end = time.perf_counter() if end is None else end
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def to_dict(self) -> Dict[str, object]:
+        base = self.trace.root.start
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "lane": self.lane,
+            "start_ms": round((self.start - base) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3),
+            "attrs": self.attrs,
+            "events": [
+                {"name": name, "at_ms": round((at - base) * 1000, 3), **attrs} for name, at, attrs in self.events
+            ],
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span when nothing is being traced."""
+
+    span_id = None
+
+    def set(self, **attrs: object) -> None:
+        pass
+
+    def event(self, name: str, **attrs: object) -> None:
+        pass
+
+    def finish(self, error: Optional[BaseException] = None, end: Optional[float] = None) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """All spans of one unit of work (a voice turn, an HTTP request)."""
+
+    def __init__(self, name: str, attrs: Dict[str, object], start: Optional[float] = None):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.closed = False
+        self.spans: List[Span] = []
+        self.events = 0
+        self.dropped = 0
+        self.root = Span(self, name, None, time.perf_counter() if start is None else start, attrs)
+        self.spans.append(self.root)
+
+    def add_span(self, name: str, parent: Optional[Span], start: Optional[float], attrs: Dict[str, object]):
+        if self.closed or len(self.spans) >= TRACE_MAX_SPANS:
+            self.dropped += 1
+            return NOOP_SPAN
+        span = Span(self, name, parent.span_id if parent is not None else self.root.span_id,
+                    time.perf_counter() if start is None else start, attrs)
+        self.spans.append(span)
+        return span
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "started_at": round(_wall(self.root.start), 6),
+            "duration_ms": round(self.root.duration * 1000, 3),
+            "attrs": self.root.attrs,
+            "error": self.root.error,
+            "dropped": self.dropped,
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+    def summary(self) -> Dict[str, object]:
+        children = sorted(self.spans[1:], key=lambda s: s.duration, reverse=True)
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "started_at": round(_wall(self.root.start), 3),
+            "duration_ms": round(self.root.duration * 1000, 1),
+            "attrs": self.root.attrs,
+            "error": self.root.error,
+            "spans": len(self.spans),
+            "slowest": [{"name": s.name, "duration_ms": round(s.duration * 1000, 1)} for s in children[:3]],
+        }
+
+    def to_chrome_events(self, pid: int) -> List[Dict[str, object]]:
+        """Trace Event Format: one process per trace, one thread per task/thread lane."""
+        lanes: Dict[str, int] = {}
+        label = " ".join(f"{k}={v}" for k, v in self.root.attrs.items())
+        events: List[Dict[str, object]] = [
+            {"ph": "M", "name": "process_name", "pid": pid, "tid": 0,
+             "args": {"name": f"{self.root.name} {self.trace_id} {label}".strip()}},
+        ]
+        for span in self.spans:
+            tid = lanes.setdefault(span.lane, len(lanes) + 1)
+            args = dict(span.attrs, span_id=span.span_id)
+            if span.error:
+                args["error"] = span.error
+            events.append({
+                "ph": "X", "name": span.name, "cat": span.name.split(".")[0], "pid": pid, "tid": tid,
+                "ts": round(_wall(span.start) * 1e6), "dur": round(span.duration * 1e6), "args": args,
+            })
+            for name, at, attrs in span.events:
+                events.append({"ph": "i", "s": "t", "name": name, "pid": pid, "tid": tid,
+                               "ts": round(_wall(at) * 1e6), "args": attrs})
+        for lane, tid in lanes.items():
+            events.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": lane}})
+        return events
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+class TraceExporter:
+    """Appends finished traces to files from a background thread (never blocks the event loop)."""
+
+    def __init__(self, directory: str = TRACE_DIR, formats: List[str] = TRACE_EXPORT):
+        self.directory = directory
+        self.formats = [f for f in formats if f in ("jsonl", "chrome")]
+        self._queue: "queue.Queue[Optional[Trace]]" = queue.Queue(maxsize=1000)
+        self._thread: Optional[threading.Thread] = None
+        self._chrome_path: Optional[str] = None
+        self._pid = 0
+        self.exported = 0
+        self.dropped = 0
+        self.failures = 0
+
+    @property
+    def paths(self) -> Dict[str, str]:
+        day = time.strftime("%Y%m%d")
+        paths = {}
+        if "jsonl" in self.formats:
+            paths["jsonl"] = os.path.join(self.directory, f"traces-{day}.jsonl")
+        if "chrome" in self.formats:
+            if self._chrome_path is None:
+                # Chrome's JSON array format allows a missing closing bracket,
+                # so one file per process run can be appended to
+                stamp = time.strftime("%Y%m%d-%H%M%S")
+                self._chrome_path = os.path.join(self.directory, f"trace-{stamp}-{os.getpid()}.json")
+            paths["chrome"] = self._chrome_path
+        return paths
+
+    def submit(self, trace: Trace) -> None:
+        if not self.formats:
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            trace = self._queue.get()
+            if trace is None:
+                return
+            try:
+                self._write(trace)
+                self.exported += 1
+            except (OSError, TypeError, ValueError) as exc:
+                self.failures += 1
+                print(f"[TRACE] Export failed: {exc}", flush=True)
+
+    def _write(self, trace: Trace) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        paths = self.paths
+        if "jsonl" in paths:
+            with open(paths["jsonl"], "a", encoding="utf-8") as f:
+                f.write(json.dumps(trace.to_dict(), default=str) + "\n")
+        if "chrome" in paths:
+            self._pid += 1
+            new_file = not os.path.exists(paths["chrome"])
+            with open(paths["chrome"], "a", encoding="utf-8") as f:
+                if new_file:
+                    f.write("[\n")
+                for event in trace.to_chrome_events(self._pid):
+                    f.write(json.dumps(event, default=str) + ",\n")
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write what is queued and stop the thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+
+class Tracer:
+    """Creates traces and spans; the current span follows asyncio tasks through a context variable.
+
+    - trace() starts a trace and makes its root span current
+    - span() opens a child of the current span and makes it current (use in coroutines)
+    - start_span() opens a child without making it current (use in async generators
+      and callbacks; call finish() yourself)
+    Without a current trace, spans are no-ops.
+    """
+
+    def __init__(self, enabled: bool = TRACING_ENABLED, exporter: Optional[TraceExporter] = None, recent: int = TRACE_RECENT):
+        self.enabled = enabled
+        self.exporter = exporter or TraceExporter()
+        self._recent: Deque[Trace] = deque(maxlen=recent)
+        self.traces = 0
+
+    def current_span(self):
+        return _current_span.get() or NOOP_SPAN
+
+    @contextmanager
+    def trace(self, name: str, start: Optional[float] = None, **attrs: object) -> Iterator[object]:
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+        trace = Trace(name, attrs, start)
+        token = _current_span.set(trace.root)
+        try:
+            yield trace.root
+        except BaseException as exc:
+            trace.root.finish(exc)
+            raise
+        finally:
+            _current_span.reset(token)
+            self.finish(trace)
+
+    def finish(self, trace: Trace) -> None:
+        trace.root.finish()
+        for span in trace.spans:
+            if span.end is None:
+                span.attrs["unfinished"] = True
+                span.finish(end=trace.root.end)
+        # Late set()/event() calls are ignored from here on; the exporter thread reads the spans
+        trace.closed = True
+        self.traces += 1
+        self._recent.append(trace)
+        self.exporter.submit(trace)
+        duration_ms = trace.root.duration * 1000
+        if duration_ms >= TRACE_LOG_SLOW_MS:
+            print(f"[TRACE] Slow {trace.root.name}: {duration_ms:.0f} ms (trace {trace.trace_id})", flush=True)
+
+    def start_span(self, name: str, start: Optional[float] = None, **attrs: object):
+        """Child of the current span, not made current. Returns NOOP_SPAN when not tracing."""
+        parent = _current_span.get()
+        if parent is None:
+            return NOOP_SPAN
+        return parent.trace.add_span(name, parent, start, attrs)
+
+    @contextmanager
+    def span(self, name: str, **attrs: object) -> Iterator[object]:
+        span = self.start_span(name, **attrs)
+        if span is NOOP_SPAN:
+            yield span
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.finish(exc)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finish()
+
+    def record_span(self, name: str, start: float, end: float, lane: Optional[str] = None, **attrs: object) -> None:
+        """Add an already finished stage (perf_counter() start/end) under the current span."""
+        span = self.start_span(name, start=start, **attrs)
+        if lane and isinstance(span, Span):
+            span.lane = lane
+        span.finish(end=end)
+
+    def event(self, name: str, **attrs: object) -> None:
+        self.current_span().event(name, **attrs)
+
+    # ---- inspection ----
+    def recent(self, limit: int = 20, slowest: bool = False) -> List[Dict[str, object]]:
+        traces = list(self._recent)
+        traces = sorted(traces, key=lambda t: t.root.duration, reverse=True) if slowest else traces[::-1]
+        return [t.summary() for t in traces[:limit]]
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        for trace in self._recent:
+            if trace.trace_id == trace_id:
+                return trace
+        return None
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "traces": self.traces,
+            "kept": len(self._recent),
+            "export": self.exporter.formats,
+            "files": self.exporter.paths if self.exporter.formats else {},
+            "exported": self.exporter.exported,
+            "export_dropped": self.exporter.dropped,
+            "export_failures": self.exporter.failures,
+        }
+
+
+tracer = Tracer()
@@ -1,16 +1,19 @@
-import requests
+from .egress import egress
+from .upstreams import murf_url
+from .metrics import TTS_REQUEST_SECONDS
 
 
-def generate_tts_murf(text: str, api_key: str, voice_id: str) -> str:
+async def generate_tts_murf(text: str, api_key: str, voice_id: str) -> str:
     """Generate TTS audio via Murf REST API and return the audio file URL.
 
-    Raises requests.RequestException on HTTP errors for callers to handle.
+    Raises httpx.HTTPError on HTTP errors for callers to handle.
     """
-    endpoint = "https://api.murf.ai/v1/speech/generate"
+    endpoint = murf_url("/speech/generate")
     payload = {"text": text, "voiceId": voice_id}
     headers = {"api-key": api_key, "Content-Type": "application/json"}
 
-    response = requests.post(endpoint, json=payload, headers=headers, timeout=60)
+    with TTS_REQUEST_SECONDS.time(transport="rest"):
+        response = await egress.request("murf", api_key, "POST", endpoint, json=payload, headers=headers, timeout=60)
     response.raise_for_status()
     data = response.json()
     return data.get("audioFile", "")
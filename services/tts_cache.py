@@ -0,0 +1,286 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Dict, List, Optional, Set, Tuple
+
+from .cache import TTLCache
+
+
+# Synthesized audio cache: a bounded memory tier in front of an on-disk tier
+TTS_CACHE_ENABLED = str(os.getenv("TTS_CACHE_ENABLED", "true")).lower() in {"1", "true", "yes", "on"}
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "server/tts_cache")
+TTS_CACHE_MEMORY_BYTES = int(os.getenv("TTS_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+TTS_CACHE_DISK_BYTES = int(os.getenv("TTS_CACHE_DISK_BYTES", str(256 * 1024 * 1024)))
+# Longer clips are not worth keeping (and bound the per-reply recording buffer)
+TTS_CACHE_MAX_CLIP_BYTES = int(os.getenv("TTS_CACHE_MAX_CLIP_BYTES", str(2 * 1024 * 1024)))
+# Only short single sentences are cached (plus fixed phrases such as greetings and the
+# fallback), so whole replies and transcripts are never kept
+TTS_CACHE_MAX_TEXT_CHARS = int(os.getenv("TTS_CACHE_MAX_TEXT_CHARS", "120"))
+TTS_CACHE_TTL = float(os.getenv("TTS_CACHE_TTL", str(24 * 3600)))
+TTS_CACHE_PHRASE_TTL = float(os.getenv("TTS_CACHE_PHRASE_TTL", str(30 * 24 * 3600)))
+
+_KEY_RE = re.compile(r"^[0-9a-f]{64}$")
+_QUOTES = str.maketrans({"‘": "'", "’": "'", "“": '"', "”": '"'})
+_SENTENCE_BREAK_RE = re.compile(r"[.!?…]+[\"')\]]*\s+\S")
+
+
+def normalize_sentence(text: str) -> str:
+    """Canonical form of a sentence for cache lookups (Unicode, quotes and whitespace normalized)."""
+    text = unicodedata.normalize("NFKC", text).translate(_QUOTES)
+    return " ".join(text.split())
+
+
+def is_cacheable_sentence(text: str, max_chars: int = TTS_CACHE_MAX_TEXT_CHARS) -> bool:
+    """True for a short single sentence (worth caching); False for longer or multi-sentence text."""
+    text = normalize_sentence(text)
+    return 0 < len(text) <= max_chars and not _SENTENCE_BREAK_RE.search(text)
+
+
+def clip_key(voice_id: str, text: str, variant: str) -> str:
+    """Content address of a clip: hash of (voice id, normalized sentence, audio variant)."""
+    raw = "\0".join((voice_id, normalize_sentence(text), variant))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTSClip:
+    """Audio for one sentence, as the chunks it was received in."""
+
+    __slots__ = ("chunks", "media_type", "size")
+
+    def __init__(self, chunks: List[bytes], media_type: str = "audio/wav"):
+        self.chunks = chunks
+        self.media_type = media_type
+        self.size = sum(len(c) for c in chunks)
+
+    def audio(self) -> bytes:
+        return b"".join(self.chunks)
+
+
+class TTSAudioCache:
+    """Content-addressed cache of synthesized sentences.
+
+    - Keys are clip_key(voice, normalized sentence, variant); the variant names
+      the audio format (e.g. "stream-WAV-44100" for Murf WebSocket chunks,
+      "rest" for files from the REST generate endpoint)
+    - Memory tier: LRU bounded by memory_bytes
+    - Disk tier: one file per clip under directory, oldest-used evicted past disk_bytes;
+      survives restarts so pre-synthesized phrases cost no TTS quota after the first run
+    - Only short single sentences are stored, unless put() is told the text is a fixed
+      phrase; clips expire after ttl (phrase_ttl for fixed phrases) in both tiers, and
+      the disk header holds no text
+    Disk reads and writes run in worker threads (use the async methods on the event loop).
+    """
+
+    def __init__(
+        self,
+        directory: str = TTS_CACHE_DIR,
+        memory_bytes: int = TTS_CACHE_MEMORY_BYTES,
+        disk_bytes: int = TTS_CACHE_DISK_BYTES,
+        max_clip_bytes: int = TTS_CACHE_MAX_CLIP_BYTES,
+        enabled: bool = TTS_CACHE_ENABLED,
+        ttl: float = TTS_CACHE_TTL,
+        phrase_ttl: float = TTS_CACHE_PHRASE_TTL,
+    ):
+        self.enabled = enabled
+        self.directory = directory
+        self.disk_bytes = disk_bytes
+        self.max_clip_bytes = max_clip_bytes
+        self.ttl = ttl
+        self.phrase_ttl = phrase_ttl
+        self.memory = TTLCache(maxsize=100000, ttl=ttl, name="tts_audio", max_bytes=memory_bytes)
+        self._disk_lock = threading.Lock()
+        self._disk_usage: Optional[int] = None
+        # Keys present on disk, so misses never touch the filesystem
+        self._disk_keys: Optional[Set[str]] = None
+        self.disk_hits = 0
+        self.disk_writes = 0
+        self.disk_evictions = 0
+        self.skipped_uncacheable = 0
+
+    # ---- disk tier (blocking; called through asyncio.to_thread) ----
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.clip")
+
+    def _scan_disk(self) -> int:
+        if self._disk_usage is None or self._disk_keys is None:
+            total = 0
+            keys: Set[str] = set()
+            if os.path.isdir(self.directory):
+                now = time.time()
+                for entry in os.scandir(self.directory):
+                    if not entry.name.endswith(".clip"):
+                        continue
+                    if self._disk_expired(entry.path, now):
+                        # Also clears clips written before expiry (and without text) was recorded
+                        try:
+                            os.remove(entry.path)
+                        except OSError:
+                            pass
+                        continue
+                    total += entry.stat().st_size
+                    keys.add(entry.name[:-5])
+            self._disk_usage = total
+            self._disk_keys = keys
+        return self._disk_usage
+
+    @staticmethod
+    def _disk_expired(path: str, now: float) -> bool:
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.readline())
+        except (OSError, ValueError):
+            return True
+        return "text" in header or float(header.get("expires_at", 0)) <= now
+
+    def _read_disk(self, key: str) -> Optional[Tuple[TTSClip, float]]:
+        """Clip and its remaining lifetime in seconds; expired clips are deleted."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.readline())
+                remaining = float(header.get("expires_at", 0)) - time.time()
+                if remaining <= 0:
+                    chunks = None
+                else:
+                    chunks = [f.read(n) for n in header["chunks"]]
+            if chunks is None:
+                self._remove_disk(key)
+                return None
+            os.utime(path)  # mark as recently used for eviction
+        except (OSError, ValueError, KeyError):
+            return None
+        return TTSClip(chunks, header.get("media_type", "audio/wav")), remaining
+
+    def _remove_disk(self, key: str) -> None:
+        with self._disk_lock:
+            path = self._path(key)
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                return
+            if self._disk_keys is not None:
+                self._disk_keys.discard(key)
+            if self._disk_usage is not None:
+                self._disk_usage -= size
+
+    def _write_disk(self, key: str, clip: TTSClip, meta: Dict[str, object]) -> None:
+        header = dict(meta, media_type=clip.media_type, chunks=[len(c) for c in clip.chunks], created_at=time.time())
+        with self._disk_lock:
+            os.makedirs(self.directory, exist_ok=True)
+            usage = self._scan_disk()
+            path = self._path(key)
+            tmp = f"{path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(json.dumps(header).encode("utf-8") + b"\n")
+                for chunk in clip.chunks:
+                    f.write(chunk)
+            size = os.path.getsize(tmp)
+            if os.path.exists(path):
+                usage -= os.path.getsize(path)
+            os.replace(tmp, path)
+            self._disk_keys.add(key)
+            self._disk_usage = usage + size
+            self.disk_writes += 1
+            if self._disk_usage > self.disk_bytes:
+                self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        entries = sorted(
+            (e for e in os.scandir(self.directory) if e.name.endswith(".clip")),
+            key=lambda e: e.stat().st_mtime,
+        )
+        for entry in entries:
+            if self._disk_usage <= self.disk_bytes:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            self._disk_keys.discard(entry.name[:-5])
+            self._disk_usage -= size
+            self.disk_evictions += 1
+
+    # ---- public API ----
+    def get_cached(self, key: str) -> Optional[TTSClip]:
+        """Memory tier only (never blocks, not counted as a lookup)."""
+        if not self.enabled:
+            return None
+        return self.memory.peek(key)
+
+    async def get(self, voice_id: str, text: str, variant: str) -> Optional[TTSClip]:
+        return await self.get_by_key(clip_key(voice_id, text, variant))
+
+    async def get_by_key(self, key: str) -> Optional[TTSClip]:
+        """Look up a clip in memory, then on disk (promoting disk hits into memory)."""
+        if not self.enabled or not _KEY_RE.match(key):
+            return None
+        clip = self.memory.get(key)
+        if clip is not None:
+            return clip
+        if self._disk_keys is None:
+            await asyncio.to_thread(self._scan_disk)
+        if key not in self._disk_keys:
+            return None
+        found = await asyncio.to_thread(self._read_disk, key)
+        if found is None:
+            return None
+        clip, remaining = found
+        self.disk_hits += 1
+        self.memory.set(key, clip, ttl=remaining, size=clip.size)
+        return clip
+
+    async def put(
+        self,
+        voice_id: str,
+        text: str,
+        variant: str,
+        chunks: List[bytes],
+        media_type: str = "audio/wav",
+        phrase: bool = False,
+    ) -> Optional[str]:
+        """Store a clip in both tiers. Returns its key, or None if it was not stored.
+
+        Text that is not a short single sentence is only stored when phrase=True
+        (fixed phrases such as persona greetings and the fallback line).
+        """
+        clip = TTSClip(chunks, media_type)
+        if not self.enabled or not chunks or clip.size > self.max_clip_bytes:
+            return None
+        if not phrase and not is_cacheable_sentence(text):
+            self.skipped_uncacheable += 1
+            return None
+        key = clip_key(voice_id, text, variant)
+        ttl = self.phrase_ttl if phrase else self.ttl
+        self.memory.set(key, clip, ttl=ttl, size=clip.size)
+        # The key is a hash of the text; the text itself is not written to disk
+        meta = {"voice_id": voice_id, "variant": variant, "expires_at": time.time() + ttl}
+        try:
+            await asyncio.to_thread(self._write_disk, key, clip, meta)
+        except OSError as exc:
+            print(f"[TTS_CACHE] Failed to write {key[:12]}: {exc}", flush=True)
+        return key
+
+    def stats(self) -> Dict[str, object]:
+        stats = self.memory.stats()
+        stats.update(
+            enabled=self.enabled,
+            directory=self.directory,
+            disk_bytes=self._disk_usage,
+            max_disk_bytes=self.disk_bytes,
+            disk_hits=self.disk_hits,
+            disk_writes=self.disk_writes,
+            disk_evictions=self.disk_evictions,
+            skipped_uncacheable=self.skipped_uncacheable,
+            phrase_ttl_seconds=self.phrase_ttl,
+        )
+        return stats
+
+
+tts_audio_cache = TTSAudioCache()
@@ -0,0 +1,21 @@
+import os
+
+
+# Base URLs of the upstream APIs. Override them to point the app at local
+# stand-ins (see bench/fake_upstreams.py) instead of the real services.
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta").rstrip("/")
+MURF_BASE_URL = os.getenv("MURF_BASE_URL", "https://api.murf.ai/v1").rstrip("/")
+TAVILY_BASE_URL = os.getenv("TAVILY_BASE_URL", "https://api.tavily.com").rstrip("/")
+ASSEMBLYAI_BASE_URL = os.getenv("ASSEMBLYAI_BASE_URL", "https://api.assemblyai.com").rstrip("/")
+# Host (or ws:// / wss:// URL) for AssemblyAI Universal Streaming
+ASSEMBLYAI_STREAMING_HOST = os.getenv("ASSEMBLYAI_STREAMING_HOST", "streaming.assemblyai.com").rstrip("/")
+
+
+def gemini_url(model: str, method: str = "generateContent") -> str:
+    """Gemini model endpoint, e.g. gemini_url("gemini-1.5-flash", "streamGenerateContent")."""
+    return f"{GEMINI_BASE_URL}/models/{model}:{method}"
+
+
+def murf_url(path: str) -> str:
+    """Murf REST endpoint, e.g. murf_url("/speech/generate")."""
+    return f"{MURF_BASE_URL}/{path.lstrip('/')}"
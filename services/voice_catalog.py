@@ -0,0 +1,259 @@
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from .egress import egress, set_egress_context, PRIORITY_BACKGROUND
+from .http_client import describe_http_error
+from .upstreams import murf_url
+
+
+# Murf voice list: loaded once, refreshed in the background, snapshot kept on disk
+MURF_VOICE_CATALOG_TTL = float(os.getenv("MURF_VOICE_CATALOG_TTL", "21600"))
+MURF_VOICE_CATALOG_RETRY = float(os.getenv("MURF_VOICE_CATALOG_RETRY", "60"))
+MURF_VOICE_CATALOG_TIMEOUT = float(os.getenv("MURF_VOICE_CATALOG_TIMEOUT", "20"))
+MURF_VOICE_CATALOG_SNAPSHOT = os.getenv("MURF_VOICE_CATALOG_SNAPSHOT", "server/murf_voices.json")
+DEFAULT_VOICE_ID = "en-US-terrell"
+
+
+def voice_id_of(voice: Dict[str, object]) -> str:
+    # Voice objects may have 'voiceId' or 'id'
+    for field in ("voiceId", "id"):
+        if isinstance(voice.get(field), str):
+            return str(voice[field])
+    return ""
+
+
+def voice_locale(voice: Dict[str, object]) -> str:
+    return str(voice.get("locale") or voice.get("language") or "").lower()
+
+
+def voice_styles(voice: Dict[str, object]) -> List[str]:
+    styles = voice.get("availableStyles") or voice.get("styles") or []
+    return [str(s) for s in styles] if isinstance(styles, list) else []
+
+
+def parse_voices(data: object) -> List[Dict[str, object]]:
+    """Murf returns a top-level list of voices or {"voices": [...]}."""
+    voices = data.get("voices") if isinstance(data, dict) else data
+    if not isinstance(voices, list):
+        return []
+    return [v for v in voices if isinstance(v, dict) and voice_id_of(v)]
+
+
+class VoiceCatalog:
+    """Murf voice list indexed by id, locale and style.
+
+    - resolve() is a dict lookup (memoized per requested id) and never does IO
+    - The list is fetched by run_refresher() in the background every `ttl`
+      seconds (every `retry_interval` seconds after a failure); a failed
+      refresh keeps the previous voices
+    - The last good list is saved to snapshot_path and loaded at startup,
+      so resolution works before the first fetch completes
+    """
+
+    def __init__(
+        self,
+        ttl: float = MURF_VOICE_CATALOG_TTL,
+        retry_interval: float = MURF_VOICE_CATALOG_RETRY,
+        snapshot_path: str = MURF_VOICE_CATALOG_SNAPSHOT,
+        timeout: float = MURF_VOICE_CATALOG_TIMEOUT,
+    ):
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.snapshot_path = snapshot_path
+        self.timeout = timeout
+        self.by_id: Dict[str, Dict[str, object]] = {}
+        self.by_locale: Dict[str, List[str]] = {}
+        self.by_style: Dict[str, List[str]] = {}
+        self._english_fallback: Optional[str] = None
+        self._resolved: Dict[str, str] = {}
+        self._ready = asyncio.Event()
+        self.loaded_at: Optional[float] = None
+        self.source: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def replace(self, voices: List[Dict[str, object]], source: str, loaded_at: Optional[float] = None) -> None:
+        """Swap in a new voice list; indexes are built first so readers never see a partial one."""
+        by_id: Dict[str, Dict[str, object]] = {}
+        by_locale: Dict[str, List[str]] = {}
+        by_style: Dict[str, List[str]] = {}
+        english_fallback: Optional[str] = None
+        for voice in voices:
+            vid = voice_id_of(voice)
+            if not vid or vid in by_id:
+                continue
+            by_id[vid] = voice
+            locale = voice_locale(voice)
+            by_locale.setdefault(locale, []).append(vid)
+            for style in voice_styles(voice):
+                by_style.setdefault(style.lower(), []).append(vid)
+            if english_fallback is None and ("en-us" in locale or locale.startswith("en")):
+                english_fallback = vid
+        self.by_id, self.by_locale, self.by_style = by_id, by_locale, by_style
+        self._english_fallback = english_fallback
+        self._resolved = {}
+        self.loaded_at = time.time() if loaded_at is None else loaded_at
+        self.source = source
+
+    # ---- lookups (never block) ----
+    def resolve(self, desired_voice_id: str) -> str:
+        """Validate desired voice id against the catalog, falling back to env/default voice.
+
+        Order of resolution:
+          1) If desired_voice_id exists in the catalog → use it
+          2) If MURF_VOICE_ID env exists and valid → use it
+          3) Use 'en-US-terrell' if valid
+          4) Use the first en-US voice if any
+          5) Fall back to desired_voice_id (let API error surface if nothing else works)
+        With no catalog loaded, the env default (or 'en-US-terrell') is used.
+        """
+        resolved = self._resolved.get(desired_voice_id)
+        if resolved is None:
+            resolved = self._resolve(desired_voice_id)
+            self._resolved[desired_voice_id] = resolved
+        return resolved
+
+    def _resolve(self, desired_voice_id: str) -> str:
+        env_default = os.getenv("MURF_VOICE_ID", "")
+        if not self.by_id:
+            fallback = env_default or DEFAULT_VOICE_ID
+            print(f"[MURF] Voices unavailable. Using '{fallback}' for '{desired_voice_id}'.", flush=True)
+            return fallback
+        if desired_voice_id in self.by_id:
+            return desired_voice_id
+        if env_default and env_default in self.by_id:
+            print(f"[MURF] Desired voice '{desired_voice_id}' invalid. Using env default '{env_default}'.", flush=True)
+            return env_default
+        if DEFAULT_VOICE_ID in self.by_id:
+            print(f"[MURF] Desired voice '{desired_voice_id}' invalid. Falling back to '{DEFAULT_VOICE_ID}'.", flush=True)
+            return DEFAULT_VOICE_ID
+        if self._english_fallback:
+            print(f"[MURF] Fallback to first EN voice '{self._english_fallback}'.", flush=True)
+            return self._english_fallback
+        print(f"[MURF] No valid fallback found; using requested id '{desired_voice_id}' (may error).", flush=True)
+        return desired_voice_id
+
+    def style_for(self, voice_id: str, preferred: str = "Conversational") -> str:
+        """preferred if the voice supports it (or its styles are unknown), else the voice's first style."""
+        voice = self.by_id.get(voice_id)
+        styles = voice_styles(voice) if voice else []
+        if not styles or voice_id in self.by_style.get(preferred.lower(), ()):
+            return preferred
+        return styles[0]
+
+    def voices_for_locale(self, locale: str) -> List[str]:
+        return list(self.by_locale.get(locale.lower(), ()))
+
+    def voices_for_style(self, style: str) -> List[str]:
+        return list(self.by_style.get(style.lower(), ()))
+
+    # ---- loading ----
+    def load_snapshot(self) -> bool:
+        """Load the saved voice list (blocking; run in a thread)."""
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return False
+        voices = parse_voices(snapshot.get("voices") if isinstance(snapshot, dict) else None)
+        if not voices:
+            return False
+        self.replace(voices, "snapshot", loaded_at=float(snapshot.get("fetched_at", 0)))
+        print(f"[MURF] Loaded {len(self)} voices from snapshot", flush=True)
+        return True
+
+    def _save_snapshot(self, voices: List[Dict[str, object]]) -> None:
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.snapshot_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": self.loaded_at, "voices": voices}, f)
+        os.replace(tmp, self.snapshot_path)
+
+    async def refresh(self, api_key: Optional[str] = None) -> bool:
+        """Fetch the voice list from Murf. On failure the current voices are kept."""
+        api_key = api_key or os.getenv("MURF_API_KEY")
+        if not api_key:
+            return False
+        try:
+            response = await egress.request(
+                "murf",
+                api_key,
+                "GET",
+                murf_url("/speech/voices"),
+                headers={"api-key": api_key, "Content-Type": "application/json"},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            voices = parse_voices(response.json())
+        except (httpx.HTTPError, ValueError) as exc:
+            self.refresh_failures += 1
+            self.last_error = describe_http_error("Murf", exc) if isinstance(exc, httpx.HTTPError) else str(exc)
+            print(f"[MURF] Failed to fetch voices: {self.last_error}", flush=True)
+            return False
+        if not voices:
+            self.refresh_failures += 1
+            self.last_error = "empty voice list"
+            print("[MURF] Voice list was empty; keeping the previous catalog", flush=True)
+            return False
+        self.replace(voices, "murf")
+        self.refreshes += 1
+        self.last_error = None
+        print(f"[MURF] Voice catalog refreshed ({len(self)} voices)", flush=True)
+        try:
+            await asyncio.to_thread(self._save_snapshot, voices)
+        except OSError as exc:
+            print(f"[MURF] Failed to save voice snapshot: {exc}", flush=True)
+        return True
+
+    async def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the first load attempt (snapshot and/or fetch) has finished."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def run_refresher(self) -> None:
+        """Background task: load the snapshot, then keep the catalog fresh."""
+        set_egress_context(None, PRIORITY_BACKGROUND)
+        try:
+            await asyncio.to_thread(self.load_snapshot)
+            while True:
+                age = time.time() - (self.loaded_at or 0)
+                if age < self.ttl:
+                    self._ready.set()
+                    await asyncio.sleep(self.ttl - age)
+                    continue
+                ok = await self.refresh()
+                self._ready.set()
+                await asyncio.sleep(self.ttl if ok else self.retry_interval)
+        finally:
+            self._ready.set()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "voices": len(self),
+            "locales": len(self.by_locale),
+            "styles": len(self.by_style),
+            "source": self.source,
+            "age_seconds": round(time.time() - self.loaded_at, 1) if self.loaded_at else None,
+            "ttl_seconds": self.ttl,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "last_error": self.last_error,
+            "resolved": dict(self._resolved),
+        }
+
+
+voice_catalog = VoiceCatalog()
@@ -1,19 +1,65 @@
-import requests
+import asyncio
+import os
+import time
 from typing import Dict, Optional
 
+from .cache import TTLCache
+from .http_client import get_http_client
+
+
+# Geocodes rarely change; current conditions go stale within minutes
+WEATHER_GEOCODE_TTL = float(os.getenv("WEATHER_GEOCODE_TTL", "86400"))
+WEATHER_CURRENT_TTL = float(os.getenv("WEATHER_CURRENT_TTL", "300"))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "512"))
+# Nominatim usage policy: at most one request per second
+NOMINATIM_MIN_INTERVAL = float(os.getenv("NOMINATIM_MIN_INTERVAL", "1.0"))
+
+
+def normalize_location(location: str) -> str:
+    """Cache key for a location: case-folded with whitespace collapsed."""
+    return " ".join(location.casefold().split())
+
 
 class WeatherService:
     """Simple weather service powered by Open-Meteo and geocoding via Nominatim.
 
     - Geocodes a location name to coordinates using Nominatim (OpenStreetMap)
     - Fetches current weather from Open-Meteo for those coordinates
+    - Caches geocodes (long TTL) and current conditions (short TTL) in process
     """
 
     def __init__(self):
         self.nominatim_url = "https://nominatim.openstreetmap.org/search"
         self.weather_url = "https://api.open-meteo.com/v1/forecast"
-
-    def geocode(self, location: str) -> Optional[Dict[str, float]]:
+        self.geocode_cache = TTLCache(maxsize=WEATHER_CACHE_SIZE, ttl=WEATHER_GEOCODE_TTL, name="weather_geocode")
+        self.current_cache = TTLCache(maxsize=WEATHER_CACHE_SIZE, ttl=WEATHER_CURRENT_TTL, name="weather_current")
+        self._nominatim_lock = asyncio.Lock()
+        self._last_nominatim_call = 0.0
+
+    async def geocode(self, location: str) -> Optional[Dict[str, float]]:
+        key = normalize_location(location)
+        cached = self.geocode_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Serialize Nominatim calls to respect its rate limit; concurrent lookups
+        # for the same place are answered from the cache once the first completes
+        async with self._nominatim_lock:
+            cached = self.geocode_cache.peek(key)
+            if cached is not None:
+                return cached
+            wait = self._last_nominatim_call + NOMINATIM_MIN_INTERVAL - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                coords = await self._geocode_remote(location)
+            finally:
+                self._last_nominatim_call = time.monotonic()
+        if coords:
+            self.geocode_cache.set(key, coords)
+        return coords
+
+    async def _geocode_remote(self, location: str) -> Optional[Dict[str, float]]:
         try:
             params = {
                 "q": location,
@@ -21,7 +67,7 @@ class WeatherService:
                 "limit": 1,
             }
             headers = {"User-Agent": "30daysofai-weather/1.0"}
-            r = requests.get(self.nominatim_url, params=params, headers=headers, timeout=20)
+            r = await get_http_client().get(self.nominatim_url, params=params, headers=headers, timeout=20)
             r.raise_for_status()
             data = r.json()
             if not data:
@@ -35,14 +81,20 @@ class WeatherService:
         except Exception:
             return None
 
-    def current_weather(self, location: str) -> Dict[str, object]:
+    async def current_weather(self, location: str) -> Dict[str, object]:
         if not location or not location.strip():
             return {"success": False, "error": "Location is required"}
 
-        coords = self.geocode(location)
+        coords = await self.geocode(location)
         if not coords:
             return {"success": False, "error": f"Could not find location: {location}"}
 
+        # Nearby spellings of the same place geocode to the same rounded coordinates
+        weather_key = (round(coords["lat"], 2), round(coords["lon"], 2))
+        cached = self.current_cache.get(weather_key)
+        if cached is not None:
+            return {"success": True, "data": dict(cached, location=coords.get("display_name", location))}
+
         try:
             params = {
                 "latitude": coords["lat"],
@@ -50,7 +102,7 @@ class WeatherService:
                 "current_weather": True,
                 "hourly": "temperature_2m,relative_humidity_2m,apparent_temperature,precipitation,weathercode",
             }
-            r = requests.get(self.weather_url, params=params, timeout=20)
+            r = await get_http_client().get(self.weather_url, params=params, timeout=20)
             r.raise_for_status()
             data = r.json()
 
@@ -93,6 +145,7 @@ class WeatherService:
             if isinstance(code, int) and code in weathercode_map:
                 result["conditions"] = weathercode_map[code]
 
+            self.current_cache.set(weather_key, dict(result))
             return {"success": True, "data": result}
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -118,11 +171,18 @@ class WeatherService:
         return "\n".join(parts)
 
 
+    def cache_stats(self) -> Dict[str, object]:
+        return {
+            "geocode": self.geocode_cache.stats(),
+            "current": self.current_cache.stats(),
+        }
+
+
 weather_service = WeatherService()
 
 
-def get_current_weather(location: str) -> Dict[str, object]:
-    return weather_service.current_weather(location)
+async def get_current_weather(location: str) -> Dict[str, object]:
+    return await weather_service.current_weather(location)
 
 
 def format_weather_for_llm(weather_response: Dict[str, object]) -> str:
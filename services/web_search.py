@@ -1,6 +1,48 @@
+import asyncio
 import os
-import requests
-from typing import List, Dict, Optional
+import re
+import time
+import httpx
+from typing import List, Dict, Optional, Set, Tuple
+
+from .cache import TTLCache
+from .egress import egress
+from .upstreams import TAVILY_BASE_URL
+
+
+# Result cache: fresh for WEB_SEARCH_CACHE_TTL, then served stale (and refreshed
+# in the background) until WEB_SEARCH_CACHE_STALE_TTL more seconds have passed
+WEB_SEARCH_CACHE_TTL = float(os.getenv("WEB_SEARCH_CACHE_TTL", "600"))
+WEB_SEARCH_CACHE_STALE_TTL = float(os.getenv("WEB_SEARCH_CACHE_STALE_TTL", "3600"))
+WEB_SEARCH_CACHE_SIZE = int(os.getenv("WEB_SEARCH_CACHE_SIZE", "512"))
+
+# Politeness and request phrasing that does not change what a search returns.
+# Leading phrases are stripped repeatedly ("please can you tell me ..."); word
+# order, question words and prepositions are kept, since they change the answer.
+SEARCH_FILLER_PREFIXES: Tuple[Tuple[str, ...], ...] = (
+    ("please",), ("hey",), ("ok",), ("okay",),
+    ("can", "you"), ("could", "you"), ("would", "you"),
+    ("tell", "me"), ("show", "me"), ("search", "for"), ("look", "up"), ("find", "me"),
+)
+SEARCH_FILLER_WORDS = {"please"}
+
+
+def normalize_search_query(query: str, max_results: int) -> Tuple[str, int]:
+    """Cache key for a search: lowercased words in their original order, filler removed, plus max_results.
+
+    "Please, tell me: who won the match?" and "who won the match" map to the same key;
+    "flights from paris to london" and "flights from london to paris" do not.
+    """
+    tokens = re.findall(r"\w+", query.lower())
+    stripped = True
+    while stripped:
+        stripped = False
+        for prefix in SEARCH_FILLER_PREFIXES:
+            if len(tokens) > len(prefix) and tuple(tokens[: len(prefix)]) == prefix:
+                tokens = tokens[len(prefix):]
+                stripped = True
+    meaningful = [t for t in tokens if t not in SEARCH_FILLER_WORDS] or tokens
+    return " ".join(meaningful), int(max_results)
 
 
 class WebSearchService:
@@ -10,15 +52,33 @@ class WebSearchService:
         self.api_key = os.getenv("TAVILY_API_KEY")
         if not self.api_key:
             print("[WEB_SEARCH] Warning: TAVILY_API_KEY not configured")
-        self.base_url = "https://api.tavily.com"
+        self.base_url = TAVILY_BASE_URL
+        self.cache = TTLCache(
+            maxsize=WEB_SEARCH_CACHE_SIZE,
+            ttl=WEB_SEARCH_CACHE_TTL + WEB_SEARCH_CACHE_STALE_TTL,
+            name="web_search",
+        )
+        self.stale_hits = 0
+        self.background_refreshes = 0
+        self.refresh_failures = 0
+        self._refreshing: Set[Tuple[str, int]] = set()
+        self._refresh_tasks: Set[asyncio.Task] = set()
     
-    def search(self, query: str, max_results: int = 3, api_key_override: Optional[str] = None) -> Dict[str, object]:
+    async def search(
+        self,
+        query: str,
+        max_results: int = 3,
+        api_key_override: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> Dict[str, object]:
         """
-        Search the web using Tavily API.
+        Search the web using Tavily API, answering repeat queries from the result cache.
         
         Args:
             query: Search query string
             max_results: Maximum number of results to return (default: 3)
+            api_key_override: Per-session Tavily key
+            use_cache: Set False to always hit Tavily
             
         Returns:
             Dictionary with search results or error information
@@ -31,7 +91,47 @@ class WebSearchService:
                 "error": "Tavily API key not configured",
                 "results": []
             }
-        
+
+        if not use_cache:
+            return await self._search_remote(query, max_results, effective_key)
+
+        key = normalize_search_query(query, max_results)
+        cached = self.cache.get(key)
+        if cached is not None:
+            result, stored_at = cached
+            if time.monotonic() - stored_at > WEB_SEARCH_CACHE_TTL:
+                # Stale: answer now, refresh in the background
+                self.stale_hits += 1
+                self._schedule_refresh(key, query, max_results, effective_key)
+            print(f"[WEB_SEARCH] Cache hit for: {query}")
+            return dict(result, query=query)
+
+        result = await self._search_remote(query, max_results, effective_key)
+        if result.get("success"):
+            self.cache.set(key, (result, time.monotonic()))
+        return result
+
+    def _schedule_refresh(self, key: Tuple[str, int], query: str, max_results: int, api_key: str) -> None:
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        task = asyncio.create_task(self._refresh(key, query, max_results, api_key))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _refresh(self, key: Tuple[str, int], query: str, max_results: int, api_key: str) -> None:
+        try:
+            self.background_refreshes += 1
+            result = await self._search_remote(query, max_results, api_key)
+            if result.get("success"):
+                self.cache.set(key, (result, time.monotonic()))
+            else:
+                self.refresh_failures += 1
+        finally:
+            self._refreshing.discard(key)
+
+    async def _search_remote(self, query: str, max_results: int, effective_key: str) -> Dict[str, object]:
+        """Call the Tavily search endpoint."""
         try:
             print(f"[WEB_SEARCH] Searching for: {query}")
             
@@ -45,7 +145,10 @@ class WebSearchService:
                 "include_raw_content": False
             }
             
-            response = requests.post(
+            response = await egress.request(
+                "tavily",
+                effective_key,
+                "POST",
                 f"{self.base_url}/search",
                 json=payload,
                 headers={"Content-Type": "application/json"},
@@ -76,7 +179,7 @@ class WebSearchService:
                 }
             }
             
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             print(f"[WEB_SEARCH] HTTP Error searching: {e}")
             return {
                 "success": False,
@@ -131,13 +234,25 @@ class WebSearchService:
         return formatted
 
 
+    def cache_stats(self) -> Dict[str, object]:
+        stats = self.cache.stats()
+        stats.update({
+            "fresh_ttl_seconds": WEB_SEARCH_CACHE_TTL,
+            "stale_ttl_seconds": WEB_SEARCH_CACHE_STALE_TTL,
+            "stale_hits": self.stale_hits,
+            "background_refreshes": self.background_refreshes,
+            "refresh_failures": self.refresh_failures,
+        })
+        return stats
+
+
 # Global instance for easy access
 web_search_service = WebSearchService()
 
 
-def search_web(query: str, max_results: int = 3) -> Dict[str, object]:
+async def search_web(query: str, max_results: int = 3) -> Dict[str, object]:
     """Convenience function for web search."""
-    return web_search_service.search(query, max_results)
+    return await web_search_service.search(query, max_results)
 
 
 def format_search_for_llm(search_response: Dict[str, object]) -> str:
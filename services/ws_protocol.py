@@ -0,0 +1,108 @@
+import struct
+from typing import Dict, Optional, Tuple, Union
+
+from .audio_frames import encode_frame, decode_frame
+
+
+# WebSocket subprotocol a client offers to use framed messages on /ws/transcribe.
+# Clients that do not offer it get the legacy "kind:payload" text protocol.
+WS_SUBPROTOCOL = "voiceagent.v1"
+
+# Server → client control frames (audio frames use 0x20-0x2F, see audio_frames)
+FRAME_PARTIAL = 0x01          # payload: u16 reused prefix length (UTF-8 bytes) + UTF-8 suffix
+FRAME_FINAL = 0x02
+FRAME_TURN_END = 0x03
+FRAME_ASSISTANT_TEXT = 0x04
+FRAME_ERROR = 0x05
+FRAME_AUDIO_START = 0x06
+FRAME_AUDIO_STATUS = 0x07
+FRAME_AUDIO_COMPLETE = 0x08   # payload: u32 chunk count
+FRAME_AUDIO_ERROR = 0x09
+FRAME_TEXT = 0x0F             # any other legacy message, payload is the full "kind:payload" text
+
+# Client → server frames
+FRAME_CLIENT_AUDIO = 0x40     # payload: PCM16LE 16 kHz mono
+FRAME_CLIENT_DONE = 0x41
+
+MESSAGE_FRAME_TYPES: Dict[str, int] = {
+    "partial": FRAME_PARTIAL,
+    "final": FRAME_FINAL,
+    "turn_end": FRAME_TURN_END,
+    "assistant_text": FRAME_ASSISTANT_TEXT,
+    "error": FRAME_ERROR,
+    "audio_start": FRAME_AUDIO_START,
+    "audio_status": FRAME_AUDIO_STATUS,
+    "audio_complete": FRAME_AUDIO_COMPLETE,
+    "audio_error": FRAME_AUDIO_ERROR,
+}
+
+_PREFIX = struct.Struct("!H")
+_COUNT = struct.Struct("!I")
+
+
+def _common_prefix(a: bytes, b: bytes) -> int:
+    limit = min(len(a), len(b), 0xFFFF)
+    i = 0
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class MessageEncoder:
+    """Encode outgoing /ws/transcribe messages for the negotiated protocol.
+
+    Handlers always produce the legacy vocabulary ("partial:<text>",
+    "audio_complete:<n>", ...) or pre-built binary audio frames. In framed
+    mode each text message becomes a binary frame tagged with its turn id;
+    partial transcripts are delta-encoded against the previous partial.
+    """
+
+    def __init__(self, framed: bool = False):
+        self.framed = framed
+        self._seq = 0
+        self._last_partial = b""
+
+    def encode(self, message: Union[str, bytes], turn_id: int = 0) -> Union[str, bytes]:
+        if isinstance(message, bytes) or not self.framed:
+            return message
+        kind, sep, text = message.partition(":")
+        frame_type = MESSAGE_FRAME_TYPES.get(kind) if sep else None
+        if frame_type is None:
+            frame_type, payload = FRAME_TEXT, message.encode("utf-8")
+        elif frame_type == FRAME_PARTIAL:
+            current = text.encode("utf-8")
+            reused = _common_prefix(self._last_partial, current)
+            payload = _PREFIX.pack(reused) + current[reused:]
+            self._last_partial = current
+        elif frame_type == FRAME_AUDIO_COMPLETE:
+            try:
+                payload = _COUNT.pack(int(text or 0))
+            except ValueError:
+                payload = _COUNT.pack(0)
+        else:
+            if frame_type in (FRAME_FINAL, FRAME_TURN_END):
+                self._last_partial = b""
+            payload = text.encode("utf-8")
+        self._seq += 1
+        return encode_frame(frame_type, payload, seq=self._seq, turn_id=turn_id)
+
+
+def decode_client_message(data: Union[str, bytes], framed: bool) -> Tuple[str, Optional[bytes]]:
+    """Classify an incoming client message as ("audio", pcm), ("done", None) or ("unknown", None).
+
+    Legacy clients send raw PCM bytes and the text "done"; framed clients wrap
+    both in frames. Plain "done" text is accepted in either mode.
+    """
+    if isinstance(data, str):
+        return ("done", None) if data.strip().lower() == "done" else ("unknown", None)
+    if not framed:
+        return "audio", data
+    frame = decode_frame(data)
+    if frame is None:
+        return "unknown", None
+    frame_type, _turn_id, _seq, payload = frame
+    if frame_type == FRAME_CLIENT_AUDIO:
+        return "audio", payload
+    if frame_type == FRAME_CLIENT_DONE:
+        return "done", None
+    return "unknown", None
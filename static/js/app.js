@@ -220,6 +220,11 @@ class App {
                 // Clear chat history when switching personas
                 await this.clearChatHistory();
                 await this.renderChatHistory();
+
+                // Play the persona's pre-synthesized greeting when the server has it cached
+                if (data.greeting_audio_url) {
+                    new Audio(data.greeting_audio_url).play().catch(() => {});
+                }
                 
                 // Show success message
                 const statusEl = document.getElementById('record-status');
@@ -303,6 +308,25 @@ class App {
         let forceHttpPipeline = false; // Day 23: fallback when WS streaming fails (SSL, etc.)
         let fallbackTimerId = null; // Day 23: auto-stop timer for non-streaming path
 
+        // Day 32: Framed binary protocol, negotiated via WebSocket subprotocol (legacy text otherwise)
+        const WS_SUBPROTOCOL = 'voiceagent.v1';
+        const FRAME_CLIENT_AUDIO = 0x40;
+        const FRAME_CLIENT_DONE = 0x41;
+        let clientFrameSeq = 0;
+        const isFramed = () => !!ws && ws.protocol === WS_SUBPROTOCOL;
+        const encodeClientFrame = (frameType, payload) => {
+            const bytes = payload ? new Uint8Array(payload) : new Uint8Array(0);
+            const frame = new Uint8Array(8 + bytes.byteLength);
+            const view = new DataView(frame.buffer);
+            view.setUint8(0, 1);
+            view.setUint8(1, frameType);
+            view.setUint16(2, 0);
+            view.setUint32(4, clientFrameSeq++);
+            frame.set(bytes, 8);
+            return frame.buffer;
+        };
+        const sendDone = () => ws.send(isFramed() ? encodeClientFrame(FRAME_CLIENT_DONE) : 'done');
+
         let isListening = false;
         const appRef = this;
 
@@ -324,8 +348,10 @@ class App {
                 streamRef = await navigator.mediaDevices.getUserMedia({ audio: true });
                 if (useTranscription && !forceHttpPipeline) {
                     // Include session id in WS URL for server-side history persistence
-                    const wsTranscribeSessionUrl = wsTranscribeUrl + `?session=${encodeURIComponent(this.sessionId)}`;
-                    ws = new WebSocket(wsTranscribeSessionUrl);
+                    // Day 31: Ask for TTS audio as binary frames instead of base64 text
+                    const wsTranscribeSessionUrl = wsTranscribeUrl + `?session=${encodeURIComponent(this.sessionId)}&audio=binary`;
+                    ws = new WebSocket(wsTranscribeSessionUrl, [WS_SUBPROTOCOL]);
+                    clientFrameSeq = 0;
                     ws.binaryType = 'arraybuffer';
                 }
 
@@ -348,7 +374,7 @@ class App {
                             const downsampled = downsampleBuffer(input, deviceRate, desiredSampleRate);
                             // Convert to 16-bit PCM
                             const pcm = floatTo16BitPCM(downsampled);
-                            ws.send(pcm.buffer);
+                            ws.send(isFramed() ? encodeClientFrame(FRAME_CLIENT_AUDIO, pcm.buffer) : pcm.buffer);
                         };
 
                         sourceNode.connect(processor);
@@ -403,6 +429,7 @@ class App {
                 // Day 21: Audio streaming variables
                 let audioChunks = [];
                 let audioChunkCount = 0;
+                let audioBytesReceived = 0;
                 
                 // Day 22: Audio playback variables
                 let playbackAudioContext = null;
@@ -437,13 +464,71 @@ class App {
                 
                 // Day 22: Play audio chunk seamlessly
                 const playAudioChunk = async (base64AudioChunk) => {
+                    // Convert base64 to ArrayBuffer
+                    const arrayBuffer = base64ToArrayBuffer(base64AudioChunk);
+                    if (!arrayBuffer) return;
+                    await playAudioBuffer(arrayBuffer);
+                };
+
+                // Day 31: Binary audio frames - 8-byte header (version, type, turn id, sequence) + audio bytes
+                const FRAME_HEADER_SIZE = 8;
+                const FRAME_VERSION = 1;
+                const FRAME_AUDIO_TYPES = { 0x20: 'wav', 0x21: 'mp3', 0x22: 'pcm' };
+                // Day 32: Control frames map back onto the legacy "kind:payload" messages
+                const FRAME_CONTROL_KINDS = {
+                    0x01: 'partial', 0x02: 'final', 0x03: 'turn_end', 0x04: 'assistant_text', 0x05: 'error',
+                    0x06: 'audio_start', 0x07: 'audio_status', 0x08: 'audio_complete', 0x09: 'audio_error',
+                };
+                const FRAME_TEXT = 0x0F;
+                const textDecoder = new TextDecoder();
+                let partialBytes = new Uint8Array(0);
+
+                // Returns the equivalent legacy text message for control frames, null for audio/unknown frames
+                const handleBinaryFrame = (buffer) => {
+                    if (!(buffer instanceof ArrayBuffer) || buffer.byteLength < FRAME_HEADER_SIZE) return null;
+                    const view = new DataView(buffer);
+                    const version = view.getUint8(0);
+                    const frameType = view.getUint8(1);
+                    if (version === FRAME_VERSION && frameType === FRAME_TEXT) {
+                        return textDecoder.decode(new Uint8Array(buffer, FRAME_HEADER_SIZE));
+                    }
+                    if (version === FRAME_VERSION && frameType in FRAME_CONTROL_KINDS) {
+                        const kind = FRAME_CONTROL_KINDS[frameType];
+                        if (kind === 'partial') {
+                            // Delta-encoded: u16 count of bytes reused from the previous partial, then the new suffix
+                            const reused = view.getUint16(FRAME_HEADER_SIZE);
+                            const suffix = new Uint8Array(buffer, FRAME_HEADER_SIZE + 2);
+                            const next = new Uint8Array(reused + suffix.byteLength);
+                            next.set(partialBytes.subarray(0, reused));
+                            next.set(suffix, reused);
+                            partialBytes = next;
+                            return `partial:${textDecoder.decode(next)}`;
+                        }
+                        if (kind === 'audio_complete') {
+                            return `audio_complete:${view.getUint32(FRAME_HEADER_SIZE)}`;
+                        }
+                        if (kind === 'final' || kind === 'turn_end') partialBytes = new Uint8Array(0);
+                        return `${kind}:${textDecoder.decode(new Uint8Array(buffer, FRAME_HEADER_SIZE))}`;
+                    }
+                    if (version !== FRAME_VERSION || !(frameType in FRAME_AUDIO_TYPES)) {
+                        console.warn(`[CLIENT] Ignoring unknown binary frame (version ${version}, type ${frameType})`);
+                        return null;
+                    }
+                    const seq = view.getUint32(4);
+                    const payload = buffer.slice(FRAME_HEADER_SIZE);
+                    audioChunkCount++;
+                    audioBytesReceived += payload.byteLength;
+                    console.log(`[CLIENT] 🎵 Received binary audio frame #${seq} (${payload.byteLength} bytes)`);
+                    // decodeAudioData takes ownership of the buffer, so pass the sliced copy
+                    playAudioBuffer(payload);
+                    statusEl.textContent = `Streaming audio... (${audioChunkCount} chunks received)`;
+                    return null;
+                };
+
+                const playAudioBuffer = async (arrayBuffer) => {
                     try {
                         initializeAudioContext();
                         
-                        // Convert base64 to ArrayBuffer
-                        const arrayBuffer = base64ToArrayBuffer(base64AudioChunk);
-                        if (!arrayBuffer) return;
-                        
                         // Decode audio data
                         const audioBuffer = await playbackAudioContext.decodeAudioData(arrayBuffer);
                         
@@ -486,7 +571,11 @@ class App {
                 };
                 
                 if (useTranscription && !forceHttpPipeline && ws) ws.onmessage = (ev) => {
-                    if (typeof ev.data !== 'string') return;
+                    if (typeof ev.data !== 'string') {
+                        const legacy = handleBinaryFrame(ev.data);
+                        if (legacy === null) return;
+                        ev = { data: legacy };
+                    }
                     if (ev.data.startsWith('saved:')) {
                         const name = ev.data.slice('saved:'.length);
                         statusEl.textContent = `Saved as ${name}`;
@@ -542,6 +631,7 @@ class App {
                         statusEl.textContent = msg;
                         audioChunks = []; // Reset audio chunks array
                         audioChunkCount = 0;
+                        audioBytesReceived = 0;
                         console.log('[CLIENT] 🎵 Audio streaming started');
                     } else if (ev.data.startsWith('audio_status:')) {
                         const msg = ev.data.slice('audio_status:'.length);
@@ -581,13 +671,17 @@ class App {
                         const totalChunks = ev.data.slice('audio_complete:'.length);
                         
                         // Day 21: Final audio processing and acknowledgement
-                        const combinedAudio = audioChunks.join('');
                         console.log('[CLIENT] 🏁 Audio streaming completed!');
                         console.log(`[CLIENT] ✅ Successfully received ${totalChunks} audio chunks`);
-                        console.log(`[CLIENT] 📏 Total combined audio length: ${combinedAudio.length} characters`);
-                        console.log(`[CLIENT] 🎵 COMPLETE BASE64 AUDIO DATA:`);
-                        console.log(`[CLIENT] ${combinedAudio}`);
-                        console.log('[CLIENT] 📸 Audio data streaming acknowledgement complete - ready for LinkedIn screenshot!');
+                        if (audioChunks.length) {
+                            const combinedAudio = audioChunks.join('');
+                            console.log(`[CLIENT] 📏 Total combined audio length: ${combinedAudio.length} characters`);
+                            console.log(`[CLIENT] 🎵 COMPLETE BASE64 AUDIO DATA:`);
+                            console.log(`[CLIENT] ${combinedAudio}`);
+                            console.log('[CLIENT] 📸 Audio data streaming acknowledgement complete - ready for LinkedIn screenshot!');
+                        } else {
+                            console.log(`[CLIENT] 📏 Total binary audio received: ${audioBytesReceived} bytes`);
+                        }
                         
                         // Day 22: Enhanced status with playback info
                         statusEl.textContent = `Audio streaming complete! Playing ${totalChunks} chunks seamlessly...`;
@@ -638,7 +732,7 @@ class App {
                     try {
                         if (ws && ws.readyState === WebSocket.OPEN) {
                             statusEl.textContent = 'Stopping...';
-                            ws.send('done');
+                            sendDone();
                             // Close after short delay to receive final messages
                             setTimeout(() => {
                                 try { if (ws && ws.readyState === WebSocket.OPEN) ws.close(); } catch (_) {}
@@ -663,7 +757,7 @@ class App {
             try { if (processor) processor.disconnect(); } catch (_) {}
             try { if (sourceNode) sourceNode.disconnect(); } catch (_) {}
             try { if (captureAudioContext && captureAudioContext.state !== 'closed') captureAudioContext.close(); } catch (_) {}
-            try { if (ws && ws.readyState === WebSocket.OPEN) ws.send('done'); } catch (_) {}
+            try { if (ws && ws.readyState === WebSocket.OPEN) sendDone(); } catch (_) {}
             try { if (ws) ws.close(); } catch (_) {}
             try { if (fallbackTimerId) clearTimeout(fallbackTimerId); } catch (_) {}
             fallbackTimerId = null;
@@ -777,7 +871,7 @@ class App {
                     let reason = (data.detail && (data.detail.message || data.detail)) || data.message || 'Unknown error';
                     // Speak fallback if provided
                     const fallback = data.fallback_text || "I'm having trouble connecting right now.";
-                    this.speakFallback(fallback);
+                    this.speakFallback(fallback, data.fallback_audio_url);
                 throw new Error(reason);
             }
         } catch (error) {
@@ -922,7 +1016,7 @@ class App {
             } else {
                 let reason = (data.detail && (data.detail.message || data.detail)) || data.message || 'Unknown error';
                 const fallback = data.fallback_text || "I'm having trouble connecting right now.";
-                this.speakFallback(fallback);
+                this.speakFallback(fallback, data.fallback_audio_url);
                 throw new Error(reason);
             }
         } catch (error) {
@@ -932,7 +1026,17 @@ class App {
         }
     }
 
-    speakFallback(text) {
+    speakFallback(text, audioUrl) {
+        // Prefer the server's pre-synthesized fallback audio, then browser speech
+        if (this.fallbackAudio && !this.fallbackAudio.paused) return;
+        if (audioUrl) {
+            this.fallbackAudio = new Audio(audioUrl);
+            this.fallbackAudio.play().catch(() => {
+                this.fallbackAudio = null;
+                this.speakFallback(text);
+            });
+            return;
+        }
         try {
             const synth = window.speechSynthesis;
             if (!synth) return;
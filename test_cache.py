@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test script for the in-process TTL + LRU cache (weather, search, LLM and TTS caches)
+"""
+import time
+
+from services.cache import TTLCache
+
+
+def test_get_and_counters():
+    cache = TTLCache(maxsize=4, ttl=60)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.get("b", "missing") == "missing"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_entries_expire():
+    cache = TTLCache(ttl=0.05)
+    cache.set("short", 1)
+    cache.set("long", 2, ttl=60)
+    time.sleep(0.1)
+    assert cache.peek("short") is None
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+    assert cache.expirations == 1
+    assert len(cache) == 1
+
+
+def test_least_recently_used_is_evicted():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.peek("a") == 1 and cache.peek("b") is None and cache.peek("c") == 3
+    assert cache.evictions == 1
+
+
+def test_peek_leaves_order_and_counters_alone():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.peek("a") == 1
+    cache.set("c", 3)
+    assert cache.peek("a") is None  # peek did not make "a" recent
+    assert cache.hits == 0 and cache.misses == 0
+
+
+def test_byte_budget():
+    cache = TTLCache(maxsize=100, max_bytes=10)
+    assert cache.set("a", b"aaaa", size=4)
+    assert cache.set("b", b"bbbb", size=4)
+    assert cache.set("c", b"cccc", size=4)  # over budget: "a" goes
+    assert cache.peek("a") is None and cache.bytes == 8
+    assert not cache.set("huge", b"x" * 11, size=11)
+    assert cache.peek("huge") is None and cache.bytes == 8
+    cache.set("b", b"bb", size=2)  # replacing an entry releases its old size
+    assert cache.bytes == 6
+    assert cache.pop("c") == b"cccc" and cache.bytes == 2
+    cache.clear()
+    assert cache.bytes == 0 and len(cache) == 0
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            check()
+            print(f"✅ {name}")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Test script for Day 40: per-key upstream lanes with adaptive (AIMD) concurrency
+"""
+import asyncio
+import time
+
+import httpx
+
+from services.egress import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_TEXT,
+    EgressLane,
+    EgressScheduler,
+    key_fingerprint,
+)
+
+
+async def queue_order(lane, requests):
+    """Queue (session, priority) requests behind a full lane; return the order they are served in."""
+    served = []
+
+    async def worker(session_id, priority):
+        await lane.acquire(session_id, priority, timeout=5)
+        served.append((session_id, priority))
+
+    tasks = []
+    for session_id, priority in requests:
+        tasks.append(asyncio.ensure_future(worker(session_id, priority)))
+        await asyncio.sleep(0)
+    while len(served) < len(requests):
+        lane.release("cancelled")
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    return served
+
+
+def test_waiters_served_by_priority():
+    async def run():
+        lane = EgressLane("gemini", "k", initial=1, max_limit=1)
+        await lane.acquire("busy", PRIORITY_TEXT, timeout=1)
+        return await queue_order(lane, [("a", PRIORITY_BACKGROUND), ("b", PRIORITY_TEXT), ("c", PRIORITY_INTERACTIVE)])
+
+    assert [session for session, _ in asyncio.run(run())] == ["c", "b", "a"]
+
+
+def test_sessions_round_robin_within_a_priority():
+    async def run():
+        lane = EgressLane("gemini", "k", initial=1, max_limit=1)
+        await lane.acquire("busy", PRIORITY_TEXT, timeout=1)
+        return await queue_order(lane, [("a", PRIORITY_TEXT)] * 3 + [("b", PRIORITY_TEXT)])
+
+    assert [session for session, _ in asyncio.run(run())] == ["a", "b", "a", "a"]
+
+
+def test_limit_grows_only_while_saturated():
+    async def run():
+        lane = EgressLane("murf", "k", initial=2, max_limit=4)
+        for _ in range(2):
+            await lane.acquire("s", PRIORITY_TEXT, timeout=1)
+        lane.release("ok", time.perf_counter(), latency=0.1)  # saturated: +1/limit
+        after_saturated = lane.limit
+        lane.release("ok", time.perf_counter(), latency=0.1)  # one of two slots in use
+        return after_saturated, lane.limit
+
+    assert asyncio.run(run()) == (2.5, 2.5)
+
+
+def test_burst_of_429s_halves_the_limit_once():
+    async def run():
+        lane = EgressLane("gemini", "k", initial=8, max_limit=16)
+        sent_at = time.perf_counter()
+        for _ in range(4):
+            await lane.acquire("s", PRIORITY_TEXT, timeout=1)
+        for _ in range(4):
+            lane.release("throttled", sent_at)
+        first = lane.limit
+        # A call sent after the cut can cut again
+        await lane.acquire("s", PRIORITY_TEXT, timeout=1)
+        lane.release("throttled", time.perf_counter())
+        return first, lane.limit, lane.throttle_limit, lane.throttled
+
+    assert asyncio.run(run()) == (4.0, 2.0, 4.0, 5)
+
+
+def test_slow_responses_reduce_the_limit():
+    async def run():
+        lane = EgressLane("tavily", "k", initial=10, max_limit=10)
+        for latency in [0.1] + [2.0] * 5:
+            await lane.acquire("s", PRIORITY_TEXT, timeout=1)
+            lane.release("ok", time.perf_counter(), latency=latency)
+        return lane.limit
+
+    assert asyncio.run(run()) < 10
+
+
+def test_errors_and_cancellations_keep_the_limit():
+    async def run():
+        lane = EgressLane("murf", "k", initial=4, max_limit=8)
+        for outcome in ("error", "cancelled"):
+            await lane.acquire("s", PRIORITY_TEXT, timeout=1)
+            lane.release(outcome, time.perf_counter())
+        return lane.limit, lane.errors, lane.in_flight
+
+    assert asyncio.run(run()) == (4.0, 1, 0)
+
+
+def test_retry_after_pauses_dispatch():
+    async def run():
+        lane = EgressLane("gemini", "k", initial=4, max_limit=4)
+        await lane.acquire("s", PRIORITY_TEXT, timeout=1)
+        lane.release("throttled", time.perf_counter(), retry_after=0.2)
+        started = time.monotonic()
+        await lane.acquire("s", PRIORITY_TEXT, timeout=5)
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.15
+
+
+def test_queue_timeout_raises_pool_timeout():
+    async def run():
+        lane = EgressLane("gemini", "k", initial=1, max_limit=1)
+        await lane.acquire("s", PRIORITY_TEXT, timeout=1)
+        try:
+            await lane.acquire("s", PRIORITY_TEXT, timeout=0.05)
+        except httpx.PoolTimeout:
+            return lane.timeouts, lane.stats()["waiting"]
+        return None
+
+    assert asyncio.run(run()) == (1, 0)
+
+
+def test_lanes_are_per_upstream_and_key():
+    scheduler = EgressScheduler()
+    server = scheduler.lane("gemini", "server-key")
+    assert scheduler.lane("gemini", "server-key") is server
+    assert scheduler.lane("gemini", "user-key") is not server
+    assert scheduler.lane("murf", "server-key") is not server
+    assert server.fingerprint == key_fingerprint("server-key") != "server-key"
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            check()
+            print(f"✅ {name}")
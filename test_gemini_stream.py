@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test script for Day 33: incremental decoding of Gemini streamGenerateContent bodies
+"""
+import json
+
+from services.gemini_stream import (
+    FORMAT_JSON,
+    FORMAT_SSE,
+    GeminiStreamDecoder,
+    candidate_text,
+    finish_reason,
+)
+
+
+def response(text, reason=None):
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}}
+    if reason:
+        candidate["finishReason"] = reason
+    return {"candidates": [candidate]}
+
+
+RESPONSES = [
+    response('Hello {there} "friend", '),
+    response("naïve café \\ back\\slash "),
+    response("done.", reason="STOP"),
+]
+
+
+def decode_in_chunks(body, size):
+    decoder = GeminiStreamDecoder()
+    data = body.encode("utf-8")
+    items = []
+    for i in range(0, len(data), size):
+        items.extend(decoder.feed(data[i:i + size]))
+    items.extend(decoder.close())
+    return decoder, items
+
+
+def test_json_array_any_split():
+    body = json.dumps(RESPONSES, indent=2, ensure_ascii=False)
+    for size in (1, 2, 3, 7, 64, len(body.encode("utf-8"))):
+        decoder, items = decode_in_chunks(body, size)
+        assert decoder.format == FORMAT_JSON
+        assert items == RESPONSES, size
+
+
+def test_json_objects_are_released_when_complete():
+    decoder = GeminiStreamDecoder()
+    first = json.dumps(RESPONSES[0])
+    assert decoder.feed("[" + first[:10]) == []
+    assert decoder.feed(first[10:] + ",\n") == [RESPONSES[0]]
+    assert decoder.feed(json.dumps(RESPONSES[1]) + "]") == [RESPONSES[1]]
+    assert decoder.close() == []
+
+
+def test_sse_any_split():
+    body = "".join(f"data: {json.dumps(item, ensure_ascii=False)}\r\n\r\n" for item in RESPONSES)
+    for size in (1, 5, 64, len(body.encode("utf-8"))):
+        decoder, items = decode_in_chunks(body, size)
+        assert decoder.format == FORMAT_SSE
+        assert items == RESPONSES, size
+
+
+def test_sse_ignores_comments_done_and_bad_events():
+    body = (
+        ": keep-alive\n\n"
+        "event: message\n"
+        f"data: {json.dumps(RESPONSES[0])}\n\n"
+        "data: {not json\n\n"
+        "data: [DONE]\n\n"
+        f"data: {json.dumps(RESPONSES[2])}"  # last event without its blank line
+    )
+    decoder, items = decode_in_chunks(body, 9)
+    assert items == [RESPONSES[0], RESPONSES[2]]
+    assert decoder.skipped == 1
+
+
+def test_candidate_helpers():
+    assert "".join(candidate_text(item) for item in RESPONSES) == 'Hello {there} "friend", naïve café \\ back\\slash done.'
+    assert finish_reason(RESPONSES[2]) == "STOP"
+    assert finish_reason(RESPONSES[0]) is None
+    assert candidate_text({"candidates": []}) == ""
+    assert candidate_text({"candidates": [{"content": {"parts": [{"functionCall": {"name": "x"}}]}}]}) == ""
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            check()
+            print(f"✅ {name}")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test script for Day 28: splitting the Gemini token stream into Murf segments
+"""
+from services.sentence_chunker import SentenceChunker
+
+
+def feed_all(chunker, deltas):
+    segments = []
+    for delta in deltas:
+        segments.extend(chunker.feed(delta))
+    tail = chunker.flush()
+    if tail:
+        segments.append(tail)
+    return segments
+
+
+def test_sentences_released_as_they_complete():
+    chunker = SentenceChunker()
+    assert chunker.feed("Hello there, how are you") == []
+    assert chunker.feed(" doing today? I am") == ["Hello there, how are you doing today?"]
+    assert chunker.feed(" fine.") == []  # no whitespace after the terminator yet
+    assert chunker.flush() == "I am fine."
+    assert chunker.flush() is None
+
+
+def test_short_sentences_are_merged():
+    """Segments shorter than min_chars wait for the next sentence."""
+    assert feed_all(SentenceChunker(), ["Hi. ", "Nice to meet you, friend. ", "Bye"]) == [
+        "Hi. Nice to meet you, friend.",
+        "Bye",
+    ]
+
+
+def test_closing_quotes_stay_with_their_sentence():
+    segments = feed_all(SentenceChunker(min_chars=5), ['She said "stop right there." ', "Then she left."])
+    assert segments == ['She said "stop right there."', "Then she left."]
+
+
+def test_first_segment_breaks_early_at_a_clause():
+    chunker = SentenceChunker()
+    assert chunker.feed("This first part is long enough, and then it keeps going") == [
+        "This first part is long enough,"
+    ]
+
+
+def test_run_on_text_is_cut_at_whitespace():
+    chunker = SentenceChunker(max_chars=50)
+    segments = chunker.feed("word " * 30)
+    assert segments
+    assert all(len(segment) <= 50 for segment in segments)
+    assert " ".join(segments + [chunker.flush() or ""]).split() == ["word"] * 30
+
+
+def test_text_without_spaces_is_cut_at_max_chars():
+    assert SentenceChunker(max_chars=100).feed("x" * 250) == ["x" * 100, "x" * 100]
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            check()
+            print(f"✅ {name}")
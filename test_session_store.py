@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test script for Day 28: the bounded session store
+Prompt windowing, eviction, and reads against a shared (SQLite-style) backend
+"""
+import asyncio
+import threading
+import time
+
+from services.session_backend import SessionBackend
+from services.session_store import SessionStore
+
+
+class LoopGuardBackend(SessionBackend):
+    """Shared backend whose load() fails when it runs on the event loop thread."""
+
+    name = "guard"
+    shared = True
+
+    def __init__(self, records=None):
+        self.records = dict(records or {})
+        self.loop_thread = None
+        self.loads_on_loop = 0
+        self.loads = 0
+
+    def load(self, session_id, max_messages):
+        self.loads += 1
+        if threading.get_ident() == self.loop_thread:
+            self.loads_on_loop += 1
+            raise AssertionError(f"load({session_id}) ran on the event loop thread")
+        record = self.records.get(session_id)
+        return dict(record) if record is not None else None
+
+
+def run_handler(backend, handler):
+    async def runner():
+        backend.loop_thread = threading.get_ident()
+        return await handler()
+    return asyncio.run(runner())
+
+
+def test_absent_session_after_ensure():
+    """An unknown session stays absent for accessors called more than 1s after ensure()."""
+    backend = LoopGuardBackend()
+    store = SessionStore(backend=backend, revalidate_seconds=0.05)
+
+    async def handler():
+        await store.ensure("missing")
+        await asyncio.sleep(1.1)
+        assert store.get_history("missing") == []
+        assert store.window("missing") == []
+        assert store.get_persona("missing", default="robot") == "robot"
+        assert store.get_api_keys("missing") == {}
+        store.append_turn("missing", "hello", "hi there")
+        return store.get_history("missing")
+
+    history = run_handler(backend, handler)
+    assert [m["text"] for m in history] == ["hello", "hi there"]
+    assert backend.loads == 1
+    assert backend.loads_on_loop == 0
+
+
+def test_known_session_revalidates_off_loop():
+    """A cached session past its revalidation age is reloaded on a worker thread."""
+    backend = LoopGuardBackend({"s1": {"persona_id": "pirate", "messages": [{"role": "user", "text": "ahoy"}]}})
+    store = SessionStore(backend=backend, revalidate_seconds=0.05)
+
+    async def handler():
+        await store.ensure("s1")
+        await asyncio.sleep(1.1)
+        assert store.get_persona("s1") == "pirate"
+        assert store.history_len("s1") == 1
+        await asyncio.sleep(0.1)  # let the scheduled reload finish
+
+    run_handler(backend, handler)
+    assert backend.loads == 2
+    assert backend.loads_on_loop == 0
+
+
+def test_cold_miss_without_ensure_on_loop():
+    """A handler that skips ensure() gets an empty session instead of a blocking read."""
+    backend = LoopGuardBackend({"s2": {"persona_id": "robot", "messages": []}})
+    store = SessionStore(backend=backend)
+
+    async def handler():
+        return store.get_history("s2")
+
+    assert run_handler(backend, handler) == []
+    assert backend.loads_on_loop == 0
+    # Outside the event loop the backend is read directly
+    backend.loop_thread = None
+    assert store.get_persona("s2", default="none") == "none"  # still marked absent
+    asyncio.run(store.ensure("s2"))
+    assert store.get_persona("s2", default="none") == "robot"
+
+
+def add_turns(store, session_id, count, size=40):
+    for i in range(count):
+        store.append_turn(session_id, f"u{i}".ljust(size, "."), f"m{i}".ljust(size, "."))
+
+
+def test_window_keeps_the_last_turns():
+    store = SessionStore(window_turns=2, window_tokens=0)
+    add_turns(store, "s", 5)
+    assert [m["text"][:2] for m in store.window("s")] == ["u3", "m3", "u4", "m4"]
+    assert store.history_len("s") == 10
+
+
+def test_window_respects_the_token_budget():
+    # Each 40-character message is ~10 tokens
+    store = SessionStore(window_turns=0, window_tokens=25)
+    add_turns(store, "s", 5)
+    assert [m["text"][:2] for m in store.window("s")] == ["u4", "m4"]
+
+
+def test_window_starts_with_a_user_message():
+    store = SessionStore(window_turns=0, window_tokens=35)  # room for m3, u4, m4
+    add_turns(store, "s", 5)
+    assert [m["text"][:2] for m in store.window("s")] == ["u4", "m4"]
+
+
+def test_history_is_capped_per_session():
+    store = SessionStore(max_messages=4)
+    add_turns(store, "s", 3)
+    assert [m["text"][:2] for m in store.get_history("s")] == ["u1", "m1", "u2", "m2"]
+
+
+def test_least_recently_used_session_is_evicted():
+    store = SessionStore(max_sessions=2)
+    store.set_persona("a", "pirate")
+    store.set_persona("b", "robot")
+    store.get_persona("a")  # a is now more recent than b
+    store.set_persona("c", "chef")
+    assert "a" in store and "c" in store and "b" not in store
+    assert store.evicted_capacity == 1
+
+
+def test_idle_sessions_are_evicted():
+    store = SessionStore(idle_ttl=0.05)
+    store.set_persona("idle", "pirate")
+    store.set_persona("active", "robot")
+    time.sleep(0.1)
+    store.get_persona("active")
+    assert store.evict_idle() == 1
+    assert "active" in store and "idle" not in store
+    assert store.evicted_idle == 1
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            start = time.perf_counter()
+            check()
+            print(f"✅ {name} ({time.perf_counter() - start:.1f}s)")
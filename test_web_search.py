@@ -3,20 +3,34 @@
 Test script for Day 25: Web Search Special Skill
 """
 import os
+import asyncio
 from dotenv import load_dotenv
 from services.web_search import web_search_service
 from services.function_calling import function_calling_service
+from services.http_client import close_http_client
 
 # Load environment variables
 load_dotenv()
 
+def run_async(coro):
+    """asyncio.run() that closes the shared HTTP client before the loop goes away.
+
+    The client is bound to the loop it was created on, so each run needs a fresh one.
+    """
+    async def runner():
+        try:
+            return await coro
+        finally:
+            await close_http_client()
+    return asyncio.run(runner())
+
 def test_web_search_service():
     """Test the web search service directly."""
     print("🔍 Testing Web Search Service...")
     
     # Test search
     query = "latest AI developments 2024"
-    result = web_search_service.search(query, max_results=2)
+    result = run_async(web_search_service.search(query, max_results=2))
     
     if result["success"]:
         print(f"✅ Search successful for query: {query}")
@@ -50,9 +64,9 @@ def test_function_calling():
         }
     ]
     
-    result = function_calling_service.call_gemini_with_functions(
+    result = run_async(function_calling_service.call_gemini_with_functions(
         contents, gemini_api_key, "gemini-1.5-flash"
-    )
+    ))
     
     if result["success"]:
         print("✅ Function calling successful")
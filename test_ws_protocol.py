@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test script for Day 32: framed binary protocol for /ws/transcribe
+"""
+import struct
+
+from services.audio_frames import FRAME_AUDIO_WAV, audio_frame_type, decode_frame, encode_frame
+from services.ws_protocol import (
+    FRAME_AUDIO_COMPLETE,
+    FRAME_CLIENT_AUDIO,
+    FRAME_CLIENT_DONE,
+    FRAME_FINAL,
+    FRAME_PARTIAL,
+    FRAME_TEXT,
+    MessageEncoder,
+    decode_client_message,
+)
+
+
+class PartialDecoder:
+    """Client side of the partial delta encoding: u16 reused prefix length + suffix."""
+
+    def __init__(self):
+        self.last = b""
+
+    def apply(self, payload):
+        (reused,) = struct.unpack("!H", payload[:2])
+        self.last = self.last[:reused] + payload[2:]
+        return self.last.decode("utf-8")
+
+
+def test_frame_round_trip():
+    frame = encode_frame(FRAME_AUDIO_WAV, b"RIFF", seq=7, turn_id=3)
+    assert len(frame) == 8 + 4
+    assert decode_frame(frame) == (FRAME_AUDIO_WAV, 3, 7, b"RIFF")
+
+
+def test_header_fields_wrap():
+    assert decode_frame(encode_frame(FRAME_FINAL, b"", seq=2**32 + 5, turn_id=2**16 + 1))[1:3] == (1, 5)
+
+
+def test_invalid_frames_are_rejected():
+    assert decode_frame(b"\x01\x02") is None
+    assert decode_frame(b"\x02" + encode_frame(FRAME_FINAL, b"x")[1:]) is None  # wrong version
+
+
+def test_audio_frame_type_defaults_to_wav():
+    assert audio_frame_type("mp3") != FRAME_AUDIO_WAV
+    assert audio_frame_type("ogg") == FRAME_AUDIO_WAV
+
+
+def test_legacy_mode_passes_messages_through():
+    encoder = MessageEncoder(framed=False)
+    assert encoder.encode("partial:hello") == "partial:hello"
+    assert encoder.encode(b"\x00audio") == b"\x00audio"
+
+
+def test_framed_messages_are_typed_and_sequenced():
+    encoder = MessageEncoder(framed=True)
+    final = decode_frame(encoder.encode("final:Hello world", turn_id=4))
+    other = decode_frame(encoder.encode("session_id:abc", turn_id=4))
+    complete = decode_frame(encoder.encode("audio_complete:12", turn_id=4))
+    assert final == (FRAME_FINAL, 4, 1, b"Hello world")
+    assert other == (FRAME_TEXT, 4, 2, b"session_id:abc")
+    assert complete[0] == FRAME_AUDIO_COMPLETE and struct.unpack("!I", complete[3]) == (12,)
+
+
+def test_partials_are_delta_encoded():
+    encoder = MessageEncoder(framed=True)
+    client = PartialDecoder()
+    partials = ["what", "what is", "what is the wea", "what is the weather", "what's the weather"]
+    payloads = []
+    for text in partials:
+        frame_type, _, _, payload = decode_frame(encoder.encode(f"partial:{text}"))
+        assert frame_type == FRAME_PARTIAL
+        assert client.apply(payload) == text
+        payloads.append(payload)
+    assert payloads[2] == struct.pack("!H", 7) + b" the wea"
+
+
+def test_partials_rebuild_multibyte_text():
+    encoder = MessageEncoder(framed=True)
+    client = PartialDecoder()
+    for text in ["café", "café au lait", "cafés", "naïve café"]:
+        assert client.apply(decode_frame(encoder.encode(f"partial:{text}"))[3]) == text
+
+
+def test_final_resets_the_partial_baseline():
+    encoder = MessageEncoder(framed=True)
+    encoder.encode("partial:hello there")
+    encoder.encode("final:Hello there.")
+    payload = decode_frame(encoder.encode("partial:hello again"))[3]
+    assert payload == struct.pack("!H", 0) + b"hello again"
+
+
+def test_decode_client_messages():
+    pcm = b"\x01\x00" * 4
+    assert decode_client_message(pcm, framed=False) == ("audio", pcm)
+    assert decode_client_message(" DONE ", framed=False) == ("done", None)
+    assert decode_client_message(encode_frame(FRAME_CLIENT_AUDIO, pcm), framed=True) == ("audio", pcm)
+    assert decode_client_message(encode_frame(FRAME_CLIENT_DONE, b""), framed=True) == ("done", None)
+    assert decode_client_message("done", framed=True) == ("done", None)
+    assert decode_client_message(pcm, framed=True) == ("unknown", None)
+    assert decode_client_message(encode_frame(FRAME_FINAL, b"x"), framed=True) == ("unknown", None)
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            check()
+            print(f"✅ {name}")